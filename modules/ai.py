@@ -0,0 +1,244 @@
+"""
+Module for the battle AI.
+Uses Monte Carlo tree search over copies of 'battle.Battle'.
+Doesn't depend on pygame so it can run in other processes.
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from math import log, sqrt
+from multiprocessing import Pool
+
+from . import battle as bt
+
+# Positions cached by a process before the cache is cleared.
+MAX_CACHE = 200000
+# Rollouts averaged for a cached position before it's reused as is.
+CACHE_SAMPLES = 4
+# Cache of pool worker processes, kept between searches.
+worker_cache = {}
+
+
+class SearchNode(object):
+    """Node in the search tree. 'team' is the team that made 'action'."""
+
+    __slots__ = ('battle', 'action', 'team', 'parent', 'children',
+                 'untried', 'visits', 'value')
+
+    def __init__(self, battle, action=None, team=None, parent=None):
+        """Set instance variables."""
+        self.battle = battle
+        self.action = action
+        self.team = team
+        self.parent = parent
+        self.children = []
+        self.untried = [] if battle.finished else battle.legal_actions()
+        self.visits = 0
+        self.value = 0.0
+
+    def select(self, exploration):
+        """Return the child with the best upper confidence bound."""
+        scale = exploration * sqrt(log(self.visits))
+        return max(self.children, key=lambda child: (
+            child.value / child.visits + scale / sqrt(child.visits)))
+
+    def expand(self, rng):
+        """Add a child for a random untried action and return it."""
+        action = self.untried.pop(rng.randrange(len(self.untried)))
+        battle = self.battle.copy()
+        team = battle.active_team
+        battle.apply(action)
+        child = SearchNode(battle, action, team, self)
+        self.children.append(child)
+        return child
+
+
+def evaluate(battle, steps=0, decay=0.99):
+    """
+    Return a dict of scores from 0.0 to 1.0 for each team.
+    Wins that took more 'steps' to reach score lower.
+    """
+    teams = set(battle.team)
+    winner = battle.winner
+    if winner is not None:
+        if winner == -1:
+            return dict.fromkeys(teams, 0.5)
+        return {team : decay ** steps if team == winner else 0.0
+                for team in teams}
+    total = float(sum(battle.hp)) or 1.0
+    return {team : sum(hp for t, hp in zip(battle.team, battle.hp)
+                       if t == team) / total for team in teams}
+
+
+def rollout(battle, rng, depth):
+    """Play up to 'depth' random actions on a copy and evaluate it."""
+    battle = battle.copy()
+    for steps in range(depth):
+        if battle.finished:
+            break
+        battle.apply(rng.choice(battle.legal_actions()))
+    else:
+        steps = depth
+    return evaluate(battle, steps)
+
+
+def search(battle, budget_ms, seed=None, cache=None, exploration=1.4,
+           depth=40):
+    """
+    Search from 'battle' for 'budget_ms' milliseconds.
+    'cache' is a dict of [rollouts, total scores] by 'Battle.key'.
+    Positions are rolled out until they have 'CACHE_SAMPLES' rollouts,
+    then the average score is reused.
+    Return a tuple of (visits by root action, playouts).
+    """
+    rng = random.Random(seed)
+    cache = {} if cache is None else cache
+    if len(cache) > MAX_CACHE:
+        cache.clear()
+    root = SearchNode(battle.copy())
+    deadline = time.time() + budget_ms / 1000.0
+    playouts = 0
+    while playouts == 0 or time.time() < deadline:
+        node = root
+        while not node.untried and node.children:
+            node = node.select(exploration)
+        if node.untried:
+            node = node.expand(rng)
+        key = node.battle.key()
+        entry = cache.get(key)
+        if entry is None:
+            entry = cache[key] = [0, {}]
+        if entry[0] < CACHE_SAMPLES:
+            entry[0] += 1
+            for team, score in rollout(node.battle, rng, depth).items():
+                entry[1][team] = entry[1].get(team, 0.0) + score
+        scores = {team : total / entry[0] for team, total in entry[1].items()}
+        while node is not None:
+            node.visits += 1
+            if node.team is not None:
+                node.value += scores[node.team]
+            node = node.parent
+        playouts += 1
+    visits = {child.action : child.visits for child in root.children}
+    return visits, playouts
+
+
+def search_worker(args):
+    """Run 'search' in a pool process from a tuple of its arguments."""
+    battle, budget_ms, seed = args
+    return search(battle, budget_ms, seed, worker_cache)
+
+
+def best_action(battle, budget_ms, seed=None, pool=None, workers=1,
+                cache=None):
+    """
+    Return a tuple of (best action, playouts) for the active unit.
+    With a process pool each worker searches its own tree from the
+    root and the visit counts are summed. Otherwise 'cache' is used
+    for evaluated positions.
+    """
+    if pool is None:
+        visits, playouts = search(battle, budget_ms, seed, cache)
+    else:
+        jobs = [(battle, budget_ms, None if seed is None else hash((seed, n)))
+                for n in range(workers)]
+        visits, playouts = Counter(), 0
+        for tree_visits, tree_playouts in pool.map(search_worker, jobs):
+            visits.update(tree_visits)
+            playouts += tree_playouts
+    if not visits:
+        return (bt.END,), playouts
+    return max(visits, key=visits.get), playouts
+
+
+class AsyncSearch(object):
+    """Run 'best_action' on a thread so the game keeps running."""
+
+    def __init__(self, battle, budget_ms, seed=None, pool=None, workers=1,
+                 cache=None):
+        """Set instance variables and start the search."""
+        self.action = None
+        self.playouts = 0
+        self.thread = threading.Thread(
+            target=self.run, args=(battle.copy(), budget_ms, seed, pool,
+                                   workers, cache))
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def done(self):
+        """Return True if the search has finished."""
+        return self.action is not None
+
+    def run(self, battle, budget_ms, seed, pool, workers, cache):
+        """
+        Store the result of the search.
+        The turn is ended if the search fails so the battle goes on.
+        """
+        try:
+            action, self.playouts = best_action(
+                battle, budget_ms, seed, pool, workers, cache)
+        except Exception:
+            logging.exception('Battle search failed, ending the turn.')
+            action = (bt.END,)
+        self.action = action
+
+
+def play_against_random(seed, budget_ms, pool=None, workers=1):
+    """
+    Play a battle where team 1 searches and team 0 acts randomly.
+    Return a tuple of (winner, playouts, seconds spent searching).
+    """
+    rng = random.Random(seed)
+    battle = bt.create_encounter(rng)
+    playouts, spent = 0, 0.0
+    while not battle.finished:
+        if battle.active_team == 1:
+            start = time.time()
+            action, count = best_action(
+                battle, budget_ms, rng.random(), pool, workers)
+            spent += time.time() - start
+            playouts += count
+        else:
+            action = rng.choice(battle.legal_actions())
+        battle.apply(action)
+    return battle.winner, playouts, spent
+
+
+def benchmark(battles=10, budget_ms=20, processes=1):
+    """Print playouts per second and the win rate against random play."""
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        results = [play_against_random(seed, budget_ms, pool, processes)
+                   for seed in range(battles)]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    wins = Counter(winner for winner, _, _ in results)
+    playouts = sum(p for _, p, _ in results)
+    spent = sum(s for _, _, s in results) or 1.0
+    print('playouts per second: {:.0f}'.format(playouts / spent))
+    print('win rate against random: {:.1%}'.format(
+        wins[1] / float(battles)))
+    print('draws: {:.1%}'.format(wins[-1] / float(battles)))
+
+
+def main():
+    """Benchmark the AI from the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--battles', type=int, default=10)
+    parser.add_argument('--budget', type=int, default=20,
+                        help='milliseconds per action')
+    parser.add_argument('--processes', type=int, default=1)
+    args = parser.parse_args()
+    benchmark(args.battles, args.budget, args.processes)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
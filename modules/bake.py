@@ -0,0 +1,248 @@
+"""
+Module for baking scaled copies of the images.
+
+'python -m modules.bake' writes each tileset and tile image used by
+'levels' scaled to common tile sizes into 'baked/<size>/'.
+'baked/manifest.json' stores the hash of each source so only changed
+images are baked again. Levels load the tilesets baked at the nearest
+size that isn't smaller than their tile size and scale them down,
+instead of scaling each tile from the source.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from os.path import exists, getmtime, getsize, join, relpath
+
+import pygame as pg
+from pytmx import TiledMap
+from pytmx.util_pygame import handle_transformation, smart_convert
+
+from .path import BAKE_PATH, LEVEL_PATH, PATH
+
+MANIFEST = 'manifest.json'
+# Tile size of tile images that aren't part of a tileset image.
+SOURCE_TILE = 60
+# Hashes of source files by name, size and mtime.
+hashes = {}
+COMMON_RES = ((800, 600), (1024, 768), (1280, 720), (1366, 768),
+              (1440, 900), (1600, 900), (1680, 1050), (1920, 1080),
+              (2560, 1440))
+
+
+def source_name(filename):
+    """Return the manifest name of a source image."""
+    return relpath(os.path.realpath(filename), PATH).replace(os.sep, '/')
+
+
+def file_hash(filename):
+    """Return the sha1 of the contents of 'filename'."""
+    with open(filename, 'rb') as source:
+        return hashlib.sha1(source.read()).hexdigest()
+
+
+def source_hash(filename):
+    """
+    Return the sha1 of 'filename', hashing it again only if its size
+    or mtime changed since the last call.
+    """
+    key = (filename, getsize(filename), getmtime(filename))
+    if key not in hashes:
+        hashes[key] = file_hash(filename)
+    return hashes[key]
+
+
+def scaled_size(size, base, tile_size):
+    """Return 'size' scaled from 'base' to 'tile_size' pixel tiles."""
+    return tuple(int(round(n * tile_size / float(base))) for n in size)
+
+
+def truecolor(image):
+    """Return 'image' in 24 or 32 bits so it can be smoothscaled."""
+    if image.get_bitsize() in (24, 32):
+        return image
+    converted = pg.Surface(image.get_size(), pg.SRCALPHA, 32)
+    converted.blit(image, (0, 0))
+    return converted
+
+
+def find_sources():
+    """
+    Return a dict of the tile size of each image used by the levels by
+    file name. Tilesets use their tile width and tile images use
+    'SOURCE_TILE'. Sprites and the text box aren't tile sized and are
+    scaled when they're loaded instead.
+    """
+    sources = {}
+    for tmx_file in glob(join(LEVEL_PATH, '*.tmx')):
+        tiled_map = TiledMap(tmx_file)
+        folder = os.path.dirname(tmx_file)
+        for tileset in tiled_map.tilesets:
+            if tileset.source is not None:
+                sources[os.path.realpath(join(folder, tileset.source))] = (
+                    tileset.tilewidth)
+        for properties in tiled_map.tile_properties.values():
+            if properties.get('source'):
+                name = os.path.realpath(join(folder, properties['source']))
+                sources.setdefault(name, SOURCE_TILE)
+    return sources
+
+
+def level_tile_sizes():
+    """Return the tile sizes of the levels at common resolutions."""
+    sizes = set()
+    for tmx_file in glob(join(LEVEL_PATH, '*.tmx')):
+        tiled_map = TiledMap(tmx_file)
+        for width, height in COMMON_RES:
+            sizes.add(width // tiled_map.width)
+            sizes.add(height // tiled_map.height)
+    return sorted(size for size in sizes if size > 0)
+
+
+def load_manifest(folder=BAKE_PATH):
+    """Return the manifest in 'folder' or an empty one."""
+    try:
+        with open(join(folder, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except (IOError, OSError, ValueError):
+        return {'files' : {}}
+
+
+def write_manifest(manifest, folder=BAKE_PATH):
+    """Write 'manifest' to a temporary file and rename it."""
+    temp = join(folder, MANIFEST + '.tmp')
+    with open(temp, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(temp, join(folder, MANIFEST))
+
+
+def bake_image(args):
+    """
+    Bake one image from a tuple of (file name, base tile size,
+    tile sizes, output folder). Return the tile sizes written.
+    """
+    filename, base, sizes, folder = args
+    image = truecolor(pg.image.load(filename))
+    name = source_name(filename)
+    for size in sizes:
+        output = join(folder, str(size), name)
+        if not os.path.isdir(os.path.dirname(output)):
+            os.makedirs(os.path.dirname(output))
+        pg.image.save(pg.transform.smoothscale(
+            image, scaled_size(image.get_size(), base, size)), output)
+    return sizes
+
+
+def bake(sizes=None, folder=BAKE_PATH, processes=None, force=False):
+    """
+    Bake every source image at each of 'sizes' in a process pool.
+    Images whose hash and sizes match the manifest are skipped.
+    Return the number of images baked.
+    """
+    sizes = sorted(set(sizes or level_tile_sizes()))
+    manifest = load_manifest(folder)
+    jobs = {}
+    for filename, base in find_sources().items():
+        name = source_name(filename)
+        entry = manifest['files'].get(name, {})
+        sha1 = file_hash(filename)
+        done = [] if force or entry.get('sha1') != sha1 else [
+            size for size in entry['sizes']
+            if exists(join(folder, str(size), name))]
+        missing = [size for size in sizes if size not in done]
+        manifest['files'][name] = dict(sha1=sha1, base=base, sizes=done)
+        if missing:
+            jobs[name] = (filename, base, missing, folder)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    with ProcessPoolExecutor(processes) as pool:
+        for name, baked in zip(jobs, pool.map(bake_image, jobs.values())):
+            logging.info('Baked %s at %s.', name, baked)
+            manifest['files'][name]['sizes'] = sorted(
+                manifest['files'][name]['sizes'] + baked)
+    write_manifest(manifest, folder)
+    return len(jobs)
+
+
+def baked_file(filename, tile_size, manifest, folder=BAKE_PATH):
+    """
+    Return a tuple of the baked copy of 'filename' at the smallest size
+    that isn't smaller than 'tile_size' and that size.
+    Return None if there is none or the source changed.
+    """
+    entry = manifest['files'].get(source_name(filename))
+    if not entry or entry['sha1'] != source_hash(filename):
+        return None
+    sizes = [size for size in entry['sizes'] if size >= tile_size]
+    if sizes:
+        return join(folder, str(min(sizes)), source_name(filename)), min(sizes)
+
+
+def image_loader(tile_size, manifest=None, folder=BAKE_PATH):
+    """
+    Return a pytmx image loader that scales the images baked nearest to
+    'tile_size' down to it, or None if nothing was baked that large.
+    Images that aren't baked are scaled from the source.
+    """
+    if manifest is None:
+        manifest = load_manifest(folder)
+    if not any(size >= tile_size for entry in manifest['files'].values()
+               for size in entry['sizes']):
+        return None
+
+    def loader(filename, colorkey, **kwargs):
+        """Load the baked image and return a function that cuts tiles."""
+        if colorkey:
+            colorkey = pg.Color('#{0}'.format(colorkey))
+        entry = manifest['files'].get(source_name(filename), {})
+        base = entry.get('base', SOURCE_TILE)
+        if kwargs.get('tileset') is not None:
+            base = kwargs['tileset'].tilewidth
+        baked = baked_file(filename, tile_size, manifest, folder)
+        if baked is None:
+            logging.info('%s not baked at %d or larger.', filename, tile_size)
+            image, size = truecolor(pg.image.load(filename)), base
+        else:
+            image, size = pg.image.load(baked[0]), baked[1]
+
+        def load_image(rect=None, flags=None):
+            """Return the tile in 'rect' of the source image."""
+            tile = image
+            if rect:
+                x, y, w, h = rect
+                tile = image.subsurface(scaled_size((x, y), base, size)
+                                        + scaled_size((w, h), base, size))
+            if size != tile_size:
+                tile = pg.transform.smoothscale(
+                    tile, scaled_size(tile.get_size(), size, tile_size))
+            if flags:
+                tile = handle_transformation(tile, flags)
+            return smart_convert(tile, colorkey, True)
+
+        return load_image
+
+    return loader
+
+
+def main():
+    """Bake scaled images from the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help='tile sizes, by default the level tile sizes '
+                             'at common resolutions')
+    parser.add_argument('--output', default=BAKE_PATH)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--force', action='store_true',
+                        help='bake every image again')
+    args = parser.parse_args()
+    count = bake(args.sizes, args.output, args.processes, args.force)
+    print('baked {} images'.format(count))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,251 @@
+"""
+Module for the battle rules.
+Doesn't depend on pygame so battles can be simulated without a display.
+"""
+
+import argparse
+import logging
+import random
+from array import array
+from collections import Counter, deque, namedtuple
+from multiprocessing import Pool
+
+MOVE, SPELL, END = 0, 1, 2
+
+Spell = namedtuple('Spell', ['name', 'cost', 'range', 'damage'])
+SPELLS = (Spell('strike', 0, 1, 2),
+          Spell('bolt', 2, 4, 3))
+
+
+class Battle(object):
+    """
+    Battle on a tile grid.
+    Units are stored in parallel arrays indexed by unit number.
+    Actions are tuples of (MOVE, x, y), (SPELL, spell, target) or (END,).
+    """
+
+    max_rounds = 100
+    max_mp = 6
+
+    def __init__(self, width, height, blocked=None):
+        """Set instance variables."""
+        self.width = width
+        self.height = height
+        self.blocked = bytearray(blocked or width * height)
+        self.team = array('b')
+        self.x = array('h')
+        self.y = array('h')
+        self.hp = array('h')
+        self.mp = array('h')
+        self.speed = array('b')
+        self.turn = 0
+        self.round = 0
+        self.moved = False
+        self.cast = False
+
+    def copy(self):
+        """Return a copy that can be changed independently."""
+        battle = Battle.__new__(Battle)
+        battle.__dict__.update(self.__dict__)
+        for name in ('team', 'x', 'y', 'hp', 'mp', 'speed'):
+            setattr(battle, name, array(getattr(self, name).typecode,
+                                        getattr(self, name)))
+        return battle
+
+    def key(self):
+        """Return bytes that identify the position."""
+        return b''.join((
+            self.team.tobytes(), self.x.tobytes(), self.y.tobytes(),
+            self.hp.tobytes(), self.mp.tobytes(), self.speed.tobytes(),
+            array('h', (self.turn, self.round, self.moved,
+                        self.cast)).tobytes()))
+
+    def add_unit(self, team, pos, hp=10, mp=4, speed=3):
+        """Add a unit to the battle and return its number."""
+        self.team.append(team)
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.hp.append(hp)
+        self.mp.append(mp)
+        self.speed.append(speed)
+        return len(self.team) - 1
+
+    @property
+    def active_team(self):
+        """Return the team of the unit whose turn it is."""
+        return self.team[self.turn]
+
+    @property
+    def winner(self):
+        """
+        Return the team that has units left, -1 for a draw
+        or None if the battle isn't over.
+        """
+        teams = set(t for t, hp in zip(self.team, self.hp) if hp > 0)
+        if len(teams) == 1:
+            return teams.pop()
+        if not teams or self.round >= self.max_rounds:
+            return -1
+        return None
+
+    @property
+    def finished(self):
+        """Return True if the battle is over."""
+        return self.winner is not None
+
+    def unit_at(self, pos):
+        """Return the number of the living unit at 'pos' or None."""
+        for unit, (x, y) in enumerate(zip(self.x, self.y)):
+            if (x, y) == tuple(pos) and self.hp[unit] > 0:
+                return unit
+
+    def reachable(self, unit):
+        """Return the tiles 'unit' can move to this turn."""
+        occupied = set((x, y) for x, y, hp in zip(self.x, self.y, self.hp)
+                       if hp > 0)
+        start = (self.x[unit], self.y[unit])
+        steps = {start : 0}
+        queue = deque([start])
+        while queue:
+            x, y = queue.popleft()
+            if steps[(x, y)] == self.speed[unit]:
+                continue
+            for pos in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if (pos not in steps and 0 <= pos[0] < self.width
+                        and 0 <= pos[1] < self.height
+                        and not self.blocked[pos[1] * self.width + pos[0]]
+                        and pos not in occupied):
+                    steps[pos] = steps[(x, y)] + 1
+                    queue.append(pos)
+        del steps[start]
+        return list(steps)
+
+    def targets(self, unit, spell):
+        """Return the enemies of 'unit' that 'spell' can hit."""
+        spell = SPELLS[spell]
+        if self.mp[unit] < spell.cost:
+            return []
+        return [
+            target for target in range(len(self.team))
+            if self.team[target] != self.team[unit] and self.hp[target] > 0
+            and abs(self.x[target] - self.x[unit])
+            + abs(self.y[target] - self.y[unit]) <= spell.range]
+
+    def legal_actions(self):
+        """Return a list of the actions the active unit can take."""
+        actions = []
+        if not self.moved:
+            actions.extend((MOVE, x, y) for x, y in self.reachable(self.turn))
+        if not self.cast:
+            for spell in range(len(SPELLS)):
+                actions.extend((SPELL, spell, target)
+                               for target in self.targets(self.turn, spell))
+        actions.append((END,))
+        return actions
+
+    def apply(self, action):
+        """Apply a legal action for the active unit."""
+        if action[0] == MOVE:
+            self.x[self.turn], self.y[self.turn] = action[1], action[2]
+            self.moved = True
+        elif action[0] == SPELL:
+            spell = SPELLS[action[1]]
+            self.mp[self.turn] -= spell.cost
+            self.hp[action[2]] = max(0, self.hp[action[2]] - spell.damage)
+            self.cast = True
+        else:
+            self.end_turn()
+
+    def end_turn(self):
+        """Give the turn to the next living unit."""
+        self.moved = self.cast = False
+        for _ in range(len(self.team)):
+            self.turn += 1
+            if self.turn == len(self.team):
+                self.turn = 0
+                self.round += 1
+            if self.hp[self.turn] > 0:
+                break
+        self.mp[self.turn] = min(self.max_mp, self.mp[self.turn] + 1)
+
+
+def create_encounter(rng, width=10, height=8, units=(3, 3), blocked=None):
+    """
+    Return a battle with 'units' placed randomly on opposite sides.
+    'blocked' has a byte for each tile by row, units aren't placed on
+    blocked tiles and move further in if a side has no room.
+    """
+    battle = Battle(width, height, blocked)
+    for team, count in enumerate(units):
+        for depth in range(2, width + 1):
+            columns = (range(depth) if team == 0
+                       else range(width - depth, width))
+            tiles = [(x, y) for x in columns for y in range(height)
+                     if not battle.blocked[y * width + x]
+                     and battle.unit_at((x, y)) is None]
+            if len(tiles) >= count:
+                break
+        for pos in rng.sample(tiles, min(count, len(tiles))):
+            battle.add_unit(team, pos)
+    return battle
+
+
+def play_random(battle, rng):
+    """Play 'battle' to the end with random actions and return the winner."""
+    while not battle.finished:
+        battle.apply(rng.choice(battle.legal_actions()))
+    return battle.winner
+
+
+def simulate(args):
+    """
+    Simulate one battle from a tuple of (seed, encounter kwargs).
+    Return a tuple of (seed, winner, rounds).
+    """
+    seed, encounter = args
+    rng = random.Random(seed)
+    battle = create_encounter(rng, **encounter)
+    winner = play_random(battle, rng)
+    return seed, winner, battle.round
+
+
+def run_batch(seeds, encounter=None, processes=None, chunksize=32):
+    """
+    Simulate a battle for each seed in a process pool.
+    Return the results of 'simulate' in the order of 'seeds'.
+    """
+    jobs = [(seed, encounter or {}) for seed in seeds]
+    if processes == 1:
+        return [simulate(job) for job in jobs]
+    pool = Pool(processes)
+    try:
+        return pool.map(simulate, jobs, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main():
+    """Simulate battles from the command line and print the results."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--battles', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--units', type=int, nargs=2, default=(3, 3))
+    parser.add_argument('--size', type=int, nargs=2, default=(10, 8))
+    args = parser.parse_args()
+    encounter = dict(width=args.size[0], height=args.size[1],
+                     units=tuple(args.units))
+    seeds = range(args.seed, args.seed + args.battles)
+    results = run_batch(seeds, encounter, args.processes)
+    wins = Counter(winner for _, winner, _ in results)
+    rounds = sum(r for _, _, r in results) / float(len(results))
+    for team in sorted(wins):
+        name = 'draw' if team == -1 else 'team {}'.format(team)
+        print('{}: {:.1%}'.format(name, wins[team] / float(len(results))))
+    print('average rounds: {:.1f}'.format(rounds))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,223 @@
+"""
+Module for playtesting the world with scripted bots.
+
+Each instance runs the real game states in its own process with the
+dummy video driver and a fixed timestep. Nothing is presented, so an
+instance runs as fast as the states can update. A bot walks to the
+active nodes, pages through their text and plays the battles until
+no node is left to finish.
+"""
+
+import argparse
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+import multiprocessing
+
+import pygame as pg
+
+from . import battle
+from . import scheduler
+from . import screen as sc
+from .game import Game
+from .state import BattleState, WorldState
+
+# Seconds to wait for an enemy search before the instance counts as stuck.
+SEARCH_TIMEOUT = 10.0
+
+
+class Bot(object):
+    """Scripted player that clicks like a person would."""
+
+    # Frames the bot waits between clicks.
+    delay = (5, 30)
+
+    def __init__(self, seed):
+        """Set instance variables."""
+        self.rng = random.Random(seed)
+        self.wait = 0
+        self.clicks = 0
+
+    def finished(self, state):
+        """Check if no node in the world is left to finish."""
+        return (isinstance(state, WorldState) and not self.targets(state)
+                and not any(node.text.active for node in state.nodes
+                            if node.text))
+
+    def targets(self, state):
+        """Return the active nodes of a world that progress it."""
+        return [node for node in state.nodes if node.active == '1'
+                and node.action in ('text', 'battle')]
+
+    def act(self, state):
+        """Return the screen position to click this frame or None."""
+        if self.wait > 0:
+            self.wait -= 1
+            return None
+        if isinstance(state, WorldState):
+            pos = self.world_click(state)
+        elif isinstance(state, BattleState):
+            pos = self.battle_click(state)
+        else:
+            pos = None
+        if pos is not None:
+            self.wait = self.rng.randint(*self.delay)
+            self.clicks += 1
+        return pos
+
+    def world_click(self, state):
+        """Page through text or walk to the closest node."""
+        if any(node.text.active for node in state.nodes if node.text):
+            return (0, 0)
+        player = state.player
+        if player.x_vel or player.y_vel:
+            return None
+        targets = self.targets(state)
+        if not targets:
+            return None
+        x, y = player.rect.center
+        node = min(targets, key=lambda n: (n.x_pos - x) ** 2
+                   + (n.y_pos - y) ** 2)
+        offset = node.radius // 2
+        return (node.x_pos + self.rng.randint(-offset, offset),
+                node.y_pos - state.scroll + self.rng.randint(-offset, offset))
+
+    def battle_click(self, state):
+        """
+        Cast the strongest spell, move towards the closest enemy
+        or end the turn by clicking the active unit.
+        """
+        b = state.battle
+        if b.finished or b.active_team != 0:
+            return None
+        actions = b.legal_actions()
+        spells = [a for a in actions if a[0] == battle.SPELL]
+        moves = [a for a in actions if a[0] == battle.MOVE]
+        enemies = [unit for unit in range(len(b.team))
+                   if b.team[unit] != 0 and b.hp[unit] > 0]
+        if spells:
+            target = spells[-1][2]
+            tile = (b.x[target], b.y[target])
+        elif moves and enemies:
+
+            def distance(move):
+                return min(abs(move[1] - b.x[unit]) + abs(move[2] - b.y[unit])
+                           for unit in enemies)
+
+            tile = min(moves, key=distance)[1:]
+        else:
+            tile = (b.x[b.turn], b.y[b.turn])
+        w, h = state.level.tile_size
+        return (tile[0] * w + w // 2, tile[1] * h + h // 2)
+
+
+def init_worker(res):
+    """Use the dummy video driver in a worker process."""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    sc.init(res)
+
+
+def run_instance(args):
+    """
+    Play one game from a tuple of (seed, max frames, timestep in
+    milliseconds, AI budget in milliseconds, draw).
+    Return a dict with the seed, frames simulated, seconds taken,
+    clicks and if the bot finished the world.
+    """
+    seed, max_frames, timestep, ai_budget, draw = args
+    WorldState.autosave_file = None
+    BattleState.ai_budget = ai_budget
+    # Pool processes can't start processes of their own.
+    BattleState.ai_workers = 0
+    Game.stack = []
+    Game.suspended = OrderedDict()
+    Game.pending_resize = None
+    Game.running = True
+    start = time.perf_counter()
+    Game.state = WorldState(*WorldState.start_args())
+    bot = Bot(seed)
+    frames = 0
+    finished = False
+    while frames < max_frames and Game.running:
+        events = pg.event.get()
+        pos = bot.act(Game.state)
+        if pos is not None:
+            events.append(pg.event.Event(
+                pg.MOUSEBUTTONDOWN, {'pos' : pos, 'button' : 1}))
+        Game.update(timestep, events)
+        # Jobs run to the end so they don't depend on wall clock time.
+        scheduler.jobs.run_all()
+        search = getattr(Game.state, 'search', None)
+        if search is not None:
+            # The search runs on wall clock time, wait for it so
+            # the enemies act after the same number of frames.
+            search.thread.join(SEARCH_TIMEOUT)
+            if not search.done:
+                logging.warning('Search of seed %d failed.', seed)
+                break
+        if draw:
+            sc.draw_from_queue(sc.draw_queue)
+        else:
+            del sc.draw_queue[:]
+        frames += 1
+        if (bot.finished(Game.state) and not Game.stack
+                and not pg.event.peek(pg.USEREVENT)):
+            finished = True
+            break
+    return dict(seed=seed, frames=frames, clicks=bot.clicks,
+                seconds=time.perf_counter() - start, finished=finished)
+
+
+def run_batch(seeds, max_frames=20000, timestep=1000 / 60.0, ai_budget=20,
+              draw=True, res=(1280, 720), processes=None):
+    """
+    Run an instance for each seed in a process pool.
+    Each instance gets a new process so no state leaks between them.
+    Processes are spawned since SDL and the threads started by levels
+    and searches don't survive a fork.
+    Return the results of 'run_instance' in the order of 'seeds'.
+    """
+    jobs = [(seed, max_frames, timestep, ai_budget, draw) for seed in seeds]
+    pool = multiprocessing.get_context('spawn').Pool(
+        processes, init_worker, (res,), maxtasksperchild=1)
+    try:
+        return pool.map(run_instance, jobs, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main():
+    """Playtest the world with bots from the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--instances', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--max-frames', type=int, default=20000)
+    parser.add_argument('--timestep', type=float, default=1000 / 60.0,
+                        help='milliseconds simulated each frame')
+    parser.add_argument('--ai-budget', type=int, default=20,
+                        help='milliseconds the enemies think per action')
+    parser.add_argument('--res', type=int, nargs=2, default=(1280, 720))
+    parser.add_argument('--no-draw', action='store_true',
+                        help='skip drawing the draw queue')
+    args = parser.parse_args()
+    seeds = range(args.seed, args.seed + args.instances)
+    start = time.perf_counter()
+    results = run_batch(seeds, args.max_frames, args.timestep, args.ai_budget,
+                        not args.no_draw, tuple(args.res), args.processes)
+    spent = time.perf_counter() - start
+    for result in results:
+        print('seed {seed}: {frames} frames, {clicks} clicks, {seconds:.2f} s, '
+              '{0}'.format('finished' if result['finished'] else 'stuck',
+                           **result))
+    finished = sum(result['finished'] for result in results)
+    print('finished: {}/{}'.format(finished, len(results)))
+    print('instances per hour: {:.0f}'.format(len(results) * 3600 / spent))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
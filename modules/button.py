@@ -4,6 +4,7 @@ import logging
 
 import pygame as pg
 
+from . import memory
 from . import screen as sc
 
 
@@ -52,24 +53,24 @@ class ButtonSet(object):
             else:
                 button.draw(scroll)
 
-    def press(self):
-        """Press button that check returns or reset highlighted id."""
-        button = self.check()
+    def press(self, pos):
+        """Press the button at 'pos' or reset highlighted id."""
+        button = self.check(pos)
         if button is not None:
             self.buttons[button].press()
         else:
             self.highlighted_id = None
 
-    def highlight(self):
-        """Highlight the button under the cursor."""
-        button = self.check()
+    def highlight(self, pos):
+        """Highlight the button at 'pos'."""
+        button = self.check(pos)
         if button is not None:
             self.highlighted_id = button
 
-    def check(self):
-        """Return button that collides with mouse position."""
+    def check(self, pos):
+        """Return the id of the button that collides with 'pos'."""
         for button in [b for b in self.buttons if b.active]:
-            if button.check(pg.mouse.get_pos()):
+            if button.check(pos):
                 return button.id
 
     def clear(self):
@@ -105,7 +106,7 @@ class Button(object):
             self.text, 0, self.text_color, self.bg_color)
         text_pos = (self.rect.width/2 - text_surf.get_width()/2,
                     self.rect.height/2 - text_surf.get_height()/2)
-        self.surf = pg.Surface(self.rect.size)
+        self.surf = memory.track(pg.Surface(self.rect.size), 'buttons')
         self.surf.fill(self.bg_color)
         #self.surf.set_colorkey(self.bg_color)
         self.surf.blit(text_surf, text_pos)
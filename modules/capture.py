@@ -0,0 +1,127 @@
+"""
+Module for capturing gameplay to image files.
+
+The main thread only copies the areas that changed each frame to a
+staging surface taken from a small pool. A background thread applies
+them to its own copy of the frame and writes it as a PNG or appends it
+to a raw RGB video file. When every staging surface is still in use the
+frame is dropped and its areas are copied with the next captured frame,
+so the game never waits for the writer.
+"""
+
+import logging
+import os
+import queue
+import threading
+
+import pygame as pg
+
+# Dropped frames keep their changed areas until there are this many,
+# then the next captured frame copies the whole screen instead.
+MAX_RECTS = 256
+
+
+class Capture(object):
+    """Capture frames from their changed areas on a background thread."""
+
+    formats = ('png', 'raw')
+
+    def __init__(self, path, fmt='png', buffers=3):
+        """
+        Start the writer thread. 'path' is the folder of the PNG files
+        or the start of the file name of raw video, which gets the size
+        of the frames appended as in 'capture_1280x720.rgb'.
+        'buffers' is the number of frames that can wait for the writer.
+        """
+        if fmt not in self.formats:
+            raise ValueError('Unknown capture format {}.'.format(fmt))
+        self.path = path
+        self.format = fmt
+        self.buffers = buffers
+        self.size = None
+        self.dirty = []
+        self.frame = 0
+        self.captured = 0
+        self.dropped = 0
+        self.free = queue.Queue()
+        self.frames = queue.Queue()
+        if fmt == 'png':
+            os.makedirs(path, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def take(self):
+        """Return a free staging surface of the current size or None."""
+        while True:
+            try:
+                staging = self.free.get_nowait()
+            except queue.Empty:
+                return None
+            if staging.get_size() == self.size:
+                return staging
+
+    def add(self, surface, rects):
+        """
+        Capture the frame on 'surface' where the areas in 'rects'
+        changed. Should be called after drawing each frame.
+        """
+        self.frame += 1
+        bounds = surface.get_rect()
+        if bounds.size != self.size:
+            self.size = bounds.size
+            for _ in range(self.buffers):
+                self.free.put(pg.Surface(self.size, 0, surface))
+            self.dirty = [bounds]
+        else:
+            self.dirty.extend(rects)
+        staging = self.take()
+        if staging is None:
+            self.dropped += 1
+            if len(self.dirty) > MAX_RECTS:
+                self.dirty = [bounds]
+            return
+        rects = [rect for rect in (bounds.clip(rect) for rect in self.dirty)
+                 if rect]
+        self.dirty = []
+        for rect in rects:
+            staging.blit(surface, rect, rect)
+        self.frames.put((self.frame, staging, rects))
+
+    def run(self):
+        """Write the queued frames until None is queued."""
+        frame = None
+        output = None
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            number, staging, rects = item
+            if frame is None or frame.get_size() != staging.get_size():
+                frame = pg.Surface(staging.get_size(), 0, staging)
+                if output is not None:
+                    output.close()
+                    output = None
+            for rect in rects:
+                frame.blit(staging, rect, rect)
+            self.free.put(staging)
+            try:
+                if self.format == 'png':
+                    pg.image.save(frame, os.path.join(
+                        self.path, 'frame_{:06d}.png'.format(number)))
+                else:
+                    if output is None:
+                        output = open('{}_{}x{}.rgb'.format(
+                            self.path, *frame.get_size()), 'ab')
+                    output.write(pg.image.tobytes(frame, 'RGB'))
+            except (OSError, pg.error) as e:
+                logging.warning('Capturing frame %d failed: %s', number, e)
+            self.captured += 1
+        if output is not None:
+            output.close()
+
+    def close(self):
+        """Write the frames still queued and stop the writer thread."""
+        self.frames.put(None)
+        self.thread.join()
+        logging.info('Captured %d frames, dropped %d.',
+                     self.captured, self.dropped)
@@ -0,0 +1,78 @@
+"""
+Module for collisions between sprites.
+
+'SweepAndPrune' keeps the sprites sorted by the left edge of their rects.
+Sprites only move a little each frame, so the order is restored with an
+insertion sort that is close to linear when few of them pass each other.
+Only sprites whose rects overlap on the x axis are compared on the y axis,
+so crowds don't cost a check for every pair.
+"""
+
+
+class SweepAndPrune(object):
+    """Broad phase that finds the pairs of sprites with overlapping rects."""
+
+    def __init__(self, sprites=()):
+        """Set instance variables."""
+        self.sprites = list(sprites)
+
+    def add(self, sprite):
+        """Add 'sprite'. It's moved into order by the next 'sort'."""
+        self.sprites.append(sprite)
+
+    def remove(self, sprite):
+        """Remove 'sprite'."""
+        self.sprites.remove(sprite)
+
+    def sort(self):
+        """Restore the order after sprites moved with an insertion sort."""
+        sprites = self.sprites
+        for num in range(1, len(sprites)):
+            sprite = sprites[num]
+            left = sprite.rect.left
+            other = num - 1
+            while other >= 0 and sprites[other].rect.left > left:
+                sprites[other + 1] = sprites[other]
+                other -= 1
+            sprites[other + 1] = sprite
+
+    def pairs(self):
+        """Return each pair of solid sprites whose rects overlap."""
+        self.sort()
+        pairs = []
+        active = []
+        for sprite in self.sprites:
+            if not getattr(sprite, 'solid', True):
+                continue
+            rect = sprite.rect
+            active = [other for other in active
+                      if other.rect.right > rect.left]
+            for other in active:
+                if (other.rect.top < rect.bottom
+                        and rect.top < other.rect.bottom):
+                    pairs.append((other, sprite))
+            active.append(sprite)
+        return pairs
+
+
+def separate(first, second):
+    """
+    Push two overlapping sprites apart on the axis they overlap least,
+    each half the way. Sprites are moved with their 'push' method.
+    Return the rects of both sprites before and after.
+    """
+    before = [first.rect.copy(), second.rect.copy()]
+    clip = first.rect.clip(second.rect)
+    if not clip:
+        return []
+    if clip.width < clip.height:
+        shift = (clip.width + 1) // 2
+        sign = -1 if first.rect.centerx <= second.rect.centerx else 1
+        first.push(sign * shift, 0)
+        second.push(-sign * shift, 0)
+    else:
+        shift = (clip.height + 1) // 2
+        sign = -1 if first.rect.centery <= second.rect.centery else 1
+        first.push(0, sign * shift)
+        second.push(0, -sign * shift)
+    return before + [first.rect, second.rect]
@@ -0,0 +1,75 @@
+"""
+Module for the fog of war.
+
+The tiles the player has seen are kept as a bitmap with a boolean for
+each tile. Revealing returns only the tiles that were hidden before, so
+the level can lighten just those tiles of its background instead of
+drawing an overlay over the whole screen every frame. The bitmap is
+saved as packed bits, one bit per tile.
+"""
+
+import numpy as np
+
+# Hidden tiles are multiplied by this color.
+COLOR = (45, 45, 60)
+
+
+class Fog(object):
+    """Tiles of a level that have been seen."""
+
+    def __init__(self, width, height, radius=3.0):
+        """Set instance variables. 'radius' is in tiles."""
+        self.width = width
+        self.height = height
+        self.radius = radius
+        self.revealed = np.zeros((height, width), bool)
+        self.last = None
+
+    def hidden(self, x, y):
+        """Check if the tile at 'x', 'y' hasn't been seen."""
+        return not self.revealed[y, x]
+
+    def reveal(self, pos):
+        """
+        Reveal the tiles within 'radius' of 'pos' in tiles.
+        Return a list of the (x, y) of the tiles that were hidden.
+        """
+        tile = (int(pos[0]), int(pos[1]))
+        if tile == self.last:
+            return []
+        self.last = tile
+        reach = int(self.radius)
+        left, top = max(0, tile[0] - reach), max(0, tile[1] - reach)
+        right = min(self.width, tile[0] + reach + 1)
+        bottom = min(self.height, tile[1] + reach + 1)
+        if left >= right or top >= bottom:
+            return []
+        ys, xs = np.mgrid[top:bottom, left:right]
+        near = (xs - tile[0]) ** 2 + (ys - tile[1]) ** 2 <= self.radius ** 2
+        area = self.revealed[top:bottom, left:right]
+        new = near & ~area
+        area |= new
+        return list(zip(xs[new].tolist(), ys[new].tolist()))
+
+    def hidden_tiles(self, left, top, right, bottom):
+        """Return the (x, y) of the hidden tiles in the columns and rows."""
+        left, top = max(0, left), max(0, top)
+        ys, xs = np.nonzero(~self.revealed[top:bottom, left:right])
+        return list(zip((xs + left).tolist(), (ys + top).tolist()))
+
+    def to_bytes(self):
+        """Return the bitmap packed to a bit per tile."""
+        return np.packbits(self.revealed, axis=None).tobytes()
+
+    def load_bytes(self, data):
+        """
+        Set the bitmap from the bytes of 'to_bytes'.
+        Raise ValueError if 'data' is for a map of another size.
+        """
+        if len(data) != (self.width * self.height + 7) // 8:
+            raise ValueError('Fog data of {} bytes for {}x{} tiles.'.format(
+                len(data), self.width, self.height))
+        bits = np.unpackbits(np.frombuffer(data, np.uint8),
+                             count=self.width * self.height)
+        self.revealed = bits.reshape(self.height, self.width).astype(bool)
+        self.last = None
@@ -4,10 +4,17 @@ import logging
 logging.basicConfig(
     format='%(levelname)s [%(asctime)s] %(message)s', level=logging.WARNING)
 
+import marshal
+from collections import OrderedDict
+
 import pygame as pg
 
+from . import capture
+from . import journal
+from . import memory
+from . import scheduler
 from . import screen as sc
-from .state import MenuState, WorldState, BattleState
+from .state import STATES, State, MenuState, WorldState, BattleState
 
 
 class Game(object):
@@ -17,22 +24,173 @@ class Game(object):
     clock = pg.time.Clock()
     caption = 'The Game, FPS:{}'
     running = True
-    state = MenuState(MenuState.create_main_menu())
+    # Created by 'init'.
+    state = None
     average_fps = []
+    # Milliseconds without resize events before the state is rescaled.
+    resize_delay = 250
+    pending_resize = None
+    # States below the active one and suspended states that can be reused.
+    stack = []
+    suspended = OrderedDict()
+    # Suspended states release their surfaces above this many bytes
+    # and the oldest ones exit when there are more than 'max_suspended'.
+    suspended_budget = 256 * 1024 ** 2
+    max_suspended = 8
+    # Journal.Recorder or journal.Player when recording or replaying.
+    recorder = None
+    player = None
+    realtime = False
+    # capture.Capture when capturing frames.
+    capture = None
+    # Surface report toggled by F3, rendered again every 'memory_interval'
+    # frames. F4 writes it to 'memory_file'.
+    memory_overlay = None
+    memory_interval = 30
+    memory_file = 'memory.json'
+    # Only the latest event of these types is kept each frame.
+    coalesced = (pg.MOUSEMOTION, pg.VIDEORESIZE)
+
+    @classmethod
+    def init(cls):
+        """Open the display and create the menu unless already done."""
+        if cls.state is None:
+            sc.init()
+            cls.state = MenuState(MenuState.create_main_menu())
 
     @classmethod
     def main_loop(cls):
         """Call game functions in a loop until user quits."""
         logging.info('Game starting.')
+        cls.init()
+        cls.filter_events()
         while cls.running:
-            cls.clock.tick(cls.max_fps)
-            cls.event_loop()
-            cls.state.update(cls.clock.get_time())
+            elapsed, events = cls.next_frame()
+            cls.update(elapsed, events)
+            scheduler.jobs.run()
+            if cls.memory_overlay is not None:
+                cls.draw_memory_report()
             rect_list = sc.draw_from_queue(sc.draw_queue)
+            if cls.capture is not None:
+                cls.capture.add(sc.screen, rect_list)
             pg.display.update(rect_list)
             cls.update_fps()
+        if cls.recorder is not None:
+            cls.recorder.close()
+        if cls.capture is not None:
+            cls.capture.close()
+        BattleState.close_ai_pool()
         logging.info('Game quitting.')
 
+    @classmethod
+    def update(cls, elapsed, events):
+        """Handle 'events' and update the state by 'elapsed' milliseconds."""
+        cls.event_loop(events)
+        if cls.pending_resize:
+            # The state keeps running at its old scale until it settles.
+            cls.update_resize(elapsed)
+        cls.state.update(elapsed)
+
+    @classmethod
+    def next_frame(cls):
+        """
+        Wait for the next frame and return a tuple of (elapsed, events).
+        Frames come from the journal when replaying and are written to
+        it when recording.
+        """
+        if cls.player is None:
+            cls.clock.tick(cls.max_fps)
+            elapsed = cls.clock.get_time()
+            events = cls.coalesce(pg.event.get())
+            if cls.recorder is not None:
+                if cls.recorder.needs_keyframe:
+                    cls.recorder.write_keyframe(cls.snapshot())
+                cls.recorder.write_frame(elapsed, [
+                    e for e in events if e.type != pg.USEREVENT])
+            return elapsed, events
+        frame = cls.player.next_frame()
+        if frame is None:
+            logging.info('Replay finished.')
+            cls.running = False
+            return 0, []
+        elapsed, events = frame
+        cls.clock.tick(1000.0 / max(1, elapsed) if cls.realtime else 0)
+        # Events posted by the game itself aren't recorded.
+        live = [e for e in pg.event.get()
+                if e.type in (pg.USEREVENT, pg.QUIT)]
+        return elapsed, live + events
+
+    @classmethod
+    def start_recording(cls, filename, keyframe_interval=300):
+        """Record input to the journal 'filename'."""
+        cls.recorder = journal.Recorder(filename, sc.res, keyframe_interval)
+
+    @classmethod
+    def start_capture(cls, path, fmt='png'):
+        """
+        Capture each frame to PNG files in the folder 'path'
+        or to a raw RGB video file if 'fmt' is 'raw'.
+        """
+        cls.capture = capture.Capture(path, fmt)
+
+    @classmethod
+    def start_replay(cls, filename, realtime=False, frame=0):
+        """
+        Replay the journal 'filename' from 'frame'.
+        If 'realtime' is false frames are replayed as fast as possible.
+        """
+        cls.player = journal.Player(filename)
+        cls.realtime = realtime
+        if tuple(sc.res) != cls.player.res:
+            cls.resize(cls.player.res)
+        cls.seek(frame)
+
+    @classmethod
+    def seek(cls, frame):
+        """
+        Restore the last keyframe before 'frame' and simulate the frames
+        after it without drawing them.
+        """
+        keyframe = cls.player.seek(frame)
+        if keyframe is None:
+            logging.warning('No keyframe before frame %d.', frame)
+            return
+        start, snapshot = keyframe
+        cls.restore(snapshot)
+        for _ in range(frame - start):
+            next_frame = cls.player.next_frame()
+            if next_frame is None:
+                break
+            elapsed, events = next_frame
+            cls.update(elapsed, events + pg.event.get(pg.USEREVENT))
+            del sc.draw_queue[:]
+        cls.state.resume()
+
+    @classmethod
+    def snapshot(cls):
+        """Return a marshallable snapshot of the active state."""
+        args = cls.state.key[1] if cls.state.key is not None else None
+        try:
+            marshal.dumps(args)
+        except ValueError:
+            args = None
+        return dict(state=type(cls.state).__name__, args=args,
+                    data=cls.state.snapshot(),
+                    input=(State.mouse_pos, sorted(State.pressed)))
+
+    @classmethod
+    def restore(cls, snapshot):
+        """Restore the active state from 'snapshot'."""
+        if type(cls.state).__name__ != snapshot['state']:
+            if snapshot['args'] is None:
+                logging.warning('Can\'t restore %s.', snapshot['state'])
+                return
+            cls.change_state(STATES[snapshot['state']], snapshot['args'])
+        cls.state.restore(snapshot['data'])
+        if 'input' in snapshot:
+            State.mouse_pos = tuple(snapshot['input'][0])
+            State.pressed = set(snapshot['input'][1])
+
     @classmethod
     def update_fps(cls):
         """Update the average fps and the window caption."""
@@ -43,35 +201,194 @@ class Game(object):
             cls.average_fps = list()
 
     @classmethod
-    def event_loop(cls):
+    def toggle_memory_report(cls):
+        """Show or hide the surface report."""
+        if cls.memory_overlay is None:
+            cls.memory_overlay = dict(frames=0, surf=None)
+        else:
+            cls.memory_overlay = None
+            cls.state.resume()
+
+    @classmethod
+    def draw_memory_report(cls):
+        """Add the surface report to the draw queue."""
+        overlay = cls.memory_overlay
+        if overlay['frames'] % cls.memory_interval == 0:
+            font = pg.font.Font(None, max(12, sc.screen.get_height() // 40))
+            lines = [font.render(line, True, (255, 255, 255), (0, 0, 0))
+                     for line in memory.report_lines()]
+            overlay['surf'] = pg.Surface(
+                (max(line.get_width() for line in lines),
+                 sum(line.get_height() for line in lines)))
+            y = 0
+            for line in lines:
+                overlay['surf'].blit(line, (0, y))
+                y += line.get_height()
+        overlay['frames'] += 1
+        sc.draw_queue.append(dict(layer=30, surf=overlay['surf'], pos=(0, 0)))
+
+    @classmethod
+    def filter_events(cls):
+        """Block the event types that neither the game nor a state handles."""
+        allowed = set((pg.QUIT, pg.KEYDOWN, pg.USEREVENT, pg.VIDEORESIZE))
+        allowed.update(State.tracked)
+        for state in STATES.values():
+            allowed.update(state.handlers)
+        pg.event.set_blocked(None)
+        pg.event.set_allowed(sorted(allowed))
+
+    @classmethod
+    def coalesce(cls, events):
+        """Return 'events' with only the last one of each coalesced type."""
+        last = dict((event.type, num) for num, event in enumerate(events)
+                    if event.type in cls.coalesced)
+        return [event for num, event in enumerate(events)
+                if last.get(event.type, num) == num]
+
+    @classmethod
+    def event_loop(cls, events=None):
         """
-        Loop through all the events.
+        Loop through all the events or 'events' if given.
         Should be called every frame.
         """
-        for event in pg.event.get():
+        if events is None:
+            events = cls.coalesce(pg.event.get())
+        for event in events:
+            State.track_input(event)
             if event.type == pg.QUIT:
                 cls.running = False
-            elif event.type == pg.KEYDOWN and (
-                    pg.key.name(event.key) == 'escape'):
+            elif event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE:
                 cls.running = False
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                cls.toggle_memory_report()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F4:
+                memory.dump(cls.memory_file)
             elif event.type == pg.VIDEORESIZE:
-                if hasattr(event, 'flags'):
-                    cls.resize(event.size, event.flags)
-                else:
-                    cls.resize(event.size)
+                cls.queue_resize(
+                    event.size, getattr(event, 'flags', pg.RESIZABLE))
             elif event.type == pg.USEREVENT:
                 if hasattr(event, 'state'):
-                    cls.state.exit()
-                    cls.state = event.state(*event.args)
+                    if cls.pending_resize:
+                        cls.update_resize(force=True)
+                    cls.change_state(event.state, event.args,
+                                     getattr(event, 'mode', 'change'))
             else:
                 cls.state.on_event(event)
 
     @classmethod
-    def resize(cls, res=sc.DEFAULT_RES, flags=pg.RESIZABLE):
-        """Scale the game objects to 'res'."""
+    def resize(cls, res=None, flags=pg.RESIZABLE):
+        """Scale the game objects to 'res', the desktop size by default."""
+        res = res or sc.default_res()
         multiplier = float(res[0]) / sc.res[0]
         logging.info('Scaling game to %f scale.', multiplier)
         sc.res, sc.screen = sc.set_display(res, flags)
         cls.state.scale(multiplier)
 
+    @classmethod
+    def queue_resize(cls, res, flags=pg.RESIZABLE):
+        """
+        Resize the display and show a scaled preview of the last frame.
+        The state is only scaled once no resize events have arrived
+        for 'resize_delay' milliseconds.
+        """
+        if cls.pending_resize is None:
+            cls.pending_resize = dict(
+                old_res=sc.res, preview=sc.screen.copy())
+        cls.pending_resize.update(res=res, flags=flags, waited=0)
+        sc.res, sc.screen = sc.set_display(res, flags)
+        preview = pg.transform.scale(cls.pending_resize['preview'], res)
+        sc.draw_queue.append(dict(layer=0, surf=preview, pos=(0, 0)))
+
+    @classmethod
+    def update_resize(cls, elapsed=0, force=False):
+        """
+        Scale the state if the pending resize has settled.
+        Should be called every frame while a resize is pending with the
+        frame time so replays scale on the same frame.
+        """
+        cls.pending_resize['waited'] += elapsed
+        if force or cls.pending_resize['waited'] >= cls.resize_delay:
+            pending, cls.pending_resize = cls.pending_resize, None
+            multiplier = float(pending['res'][0]) / pending['old_res'][0]
+            logging.info('Scaling game to %f scale.', multiplier)
+            cls.state.scale(multiplier)
 
+    @classmethod
+    def change_state(cls, state, args=(), mode='change'):
+        """
+        Make an instance of 'state' the active state.
+        'mode' is 'change' to replace the active state, 'push' to keep it
+        on the stack below the new one or 'pop' to return to the state
+        below the active one.
+        """
+        if mode == 'pop':
+            if not cls.stack:
+                logging.warning('No state to return to.')
+                return
+            cls.suspend_state(cls.state)
+            cls.state = cls.stack.pop()
+            cls.resume_state(cls.state)
+        else:
+            if mode == 'push':
+                cls.state.suspended_res = sc.res
+                cls.state.suspend()
+                cls.stack.append(cls.state)
+            else:
+                cls.suspend_state(cls.state)
+            cls.state = cls.get_state(state, args)
+        cls.trim_suspended()
+
+    @classmethod
+    def get_state(cls, state, args):
+        """Return a suspended instance of 'state' or create a new one."""
+        try:
+            key = (state, tuple(args))
+            instance = cls.suspended.pop(key, None)
+        except TypeError:
+            # Arguments that can't be hashed can't be reused either.
+            key, instance = None, None
+        if instance is not None:
+            cls.resume_state(instance)
+            return instance
+        instance = state(*args)
+        instance.key = key
+        return instance
+
+    @classmethod
+    def suspend_state(cls, state):
+        """Suspend 'state' so it can be reused or exit it."""
+        if state.key is None or not state.reusable():
+            state.exit()
+            return
+        state.suspended_res = sc.res
+        state.suspend()
+        old_state = cls.suspended.pop(state.key, None)
+        if old_state is not None and old_state is not state:
+            old_state.exit()
+        cls.suspended[state.key] = state
+
+    @classmethod
+    def resume_state(cls, state):
+        """Scale 'state' to the current resolution and resume it."""
+        if state.suspended_res != sc.res:
+            state.scale(float(sc.res[0]) / state.suspended_res[0])
+        state.resume()
+
+    @classmethod
+    def trim_suspended(cls):
+        """
+        Exit the oldest suspended states over 'max_suspended' and
+        release the surfaces of the rest until under budget.
+        """
+        while len(cls.suspended) > cls.max_suspended:
+            key, state = cls.suspended.popitem(last=False)
+            logging.info('Exiting suspended %s.', state)
+            state.exit()
+        states = list(cls.suspended.values()) + cls.stack
+        total = sum(state.surface_bytes() for state in states)
+        for state in states:
+            if total <= cls.suspended_budget:
+                break
+            total -= state.surface_bytes()
+            logging.info('Releasing surfaces of %s.', state)
+            state.release()
@@ -0,0 +1,173 @@
+"""
+Module for recording and replaying input.
+
+A journal starts with a header and is followed by frame and keyframe
+records. Frames store the elapsed time and the events of one frame.
+Keyframes store a state snapshot so a replay can seek to any frame.
+An index of the keyframes is written when the journal is closed.
+"""
+
+import logging
+import marshal
+import struct
+
+import pygame as pg
+
+MAGIC = b'GJNL'
+END_MAGIC = b'GJNE'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH')
+FRAME = struct.Struct('<IHH')
+EVENT = struct.Struct('<HH')
+KEYFRAME = struct.Struct('<II')
+INDEX_ITEM = struct.Struct('<IQ')
+FOOTER = struct.Struct('<Q4s')
+
+
+def encode_event(event):
+    """Return the type and attributes of 'event' as bytes."""
+    attributes = {}
+    for name, value in event.dict.items():
+        try:
+            marshal.dumps(value)
+        except ValueError:
+            continue
+        attributes[name] = value
+    payload = marshal.dumps(attributes)
+    return EVENT.pack(event.type, len(payload)) + payload
+
+
+class Recorder(object):
+    """Write frames and keyframes to a journal file."""
+
+    def __init__(self, filename, res, keyframe_interval=300):
+        """Open the file and write the header."""
+        self.file = open(filename, 'wb')
+        self.keyframe_interval = keyframe_interval
+        self.frame = 0
+        self.index = []
+        self.file.write(HEADER.pack(MAGIC, VERSION, keyframe_interval,
+                                    res[0], res[1]))
+
+    @property
+    def needs_keyframe(self):
+        """Return True if a keyframe should be written before this frame."""
+        return self.frame % self.keyframe_interval == 0
+
+    def write_keyframe(self, snapshot):
+        """Write 'snapshot' as the keyframe of the current frame."""
+        self.index.append((self.frame, self.file.tell()))
+        payload = marshal.dumps(snapshot)
+        self.file.write(b'K' + KEYFRAME.pack(self.frame, len(payload)))
+        self.file.write(payload)
+
+    def write_frame(self, elapsed, events):
+        """Write the elapsed time and the events of the current frame."""
+        events = [encode_event(event) for event in events]
+        self.file.write(b'F' + FRAME.pack(
+            self.frame, min(elapsed, 0xFFFF), len(events)))
+        self.file.write(b''.join(events))
+        self.frame += 1
+
+    def close(self):
+        """Write the keyframe index and close the file."""
+        index_pos = self.file.tell()
+        self.file.write(b'I' + struct.pack('<I', len(self.index)))
+        for item in self.index:
+            self.file.write(INDEX_ITEM.pack(*item))
+        self.file.write(FOOTER.pack(index_pos, END_MAGIC))
+        self.file.close()
+
+
+class Player(object):
+    """Read frames from a journal file."""
+
+    def __init__(self, filename):
+        """Open the file, read the header and the keyframe index."""
+        self.file = open(filename, 'rb')
+        magic, version, self.keyframe_interval, w, h = HEADER.unpack(
+            self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a journal.'.format(filename))
+        self.res = (w, h)
+        self.start = self.file.tell()
+        self.index = self.read_index()
+        self.file.seek(self.start)
+
+    def read_index(self):
+        """
+        Return a list of (frame, offset) for each keyframe.
+        Journals that weren't closed are scanned for keyframes instead.
+        """
+        magic = None
+        if self.file.seek(0, 2) - self.start >= FOOTER.size:
+            self.file.seek(-FOOTER.size, 2)
+            index_pos, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+        if magic == END_MAGIC:
+            self.file.seek(index_pos + 1)
+            count, = struct.unpack('<I', self.file.read(4))
+            return [INDEX_ITEM.unpack(self.file.read(INDEX_ITEM.size))
+                    for _ in range(count)]
+        logging.warning('Journal wasn\'t closed, scanning for keyframes.')
+        self.file.seek(self.start)
+        index = []
+        while True:
+            pos = self.file.tell()
+            record = self.read_record()
+            if record is None:
+                return index
+            if record[0] == b'K':
+                index.append((record[1], pos))
+
+    def read_record(self):
+        """
+        Return the next record as a tuple of (tag, frame, data)
+        or None at the end of the journal.
+        """
+        try:
+            return self.read_record_data(self.file.read(1))
+        except (struct.error, EOFError, ValueError):
+            logging.warning('Journal ends with an incomplete record.')
+
+    def read_record_data(self, tag):
+        """Return the data of the record with 'tag' as for 'read_record'."""
+        if tag == b'F':
+            frame, elapsed, count = FRAME.unpack(self.file.read(FRAME.size))
+            events = []
+            for _ in range(count):
+                event_type, size = EVENT.unpack(self.file.read(EVENT.size))
+                attributes = marshal.loads(self.file.read(size))
+                events.append(pg.event.Event(event_type, attributes))
+            return tag, frame, (elapsed, events)
+        elif tag == b'K':
+            frame, size = KEYFRAME.unpack(self.file.read(KEYFRAME.size))
+            return tag, frame, marshal.loads(self.file.read(size))
+
+    def next_frame(self):
+        """
+        Return a tuple of (elapsed, events) for the next frame
+        or None at the end of the journal.
+        """
+        while True:
+            record = self.read_record()
+            if record is None:
+                return None
+            if record[0] == b'F':
+                return record[2]
+
+    def seek(self, frame):
+        """
+        Move to the last keyframe at or before 'frame'.
+        Return a tuple of (keyframe frame, snapshot) or None if there
+        is no such keyframe.
+        """
+        keyframes = [item for item in self.index if item[0] <= frame]
+        if not keyframes:
+            return None
+        self.file.seek(keyframes[-1][1])
+        _, keyframe, snapshot = self.read_record()
+        return keyframe, snapshot
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
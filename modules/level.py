@@ -1,33 +1,74 @@
 """Module for the level, node and node group classes."""
 
 import logging
+import os
 from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from os.path import join
 from math import hypot, ceil
 
 import pygame as pg
 from pytmx.util_pygame import load_pygame
 
+from . import bake
+from . import fog
+from . import lighting
+from . import memory
 from . import screen as sc
+from . import viewport
 from .path import LEVEL_PATH
 
 class Level(object):
     """Class for levels."""
 
-    def __init__(self, tmx_file):
-        """Set instance variables."""
-        self.level = load_pygame(join(LEVEL_PATH, tmx_file))
+    # Rows of tiles composed by each task of 'reload_steps'.
+    band_rows = 4
+    pool = None
+
+    def __init__(self, tmx_file, tiled_map=None, build=True):
+        """
+        Set instance variables.
+        'tiled_map' can be an already loaded pytmx TiledMap. Unless
+        'build' is True the surfaces are made later by 'reload_steps'.
+        """
+        if tiled_map is None:
+            tiled_map = load_pygame(join(LEVEL_PATH, tmx_file))
+        self.level = tiled_map
+        self.source_images = list(tiled_map.images)
+        self.images_size = None
+        self.generation = 0
+        # Tile width the surfaces were built at, None before they are.
+        self.width = None
+        self.tiles = {}
+        self.animated_tiles = []
+        self.cells = {}
+        self.bg = None
+        self.fog_tile = None
+        self.viewport = None
         self.tile_obj = namedtuple('tile_obj', ['x', 'y', 'layer'])
         self.zoomed = False
-        self.reload()
+        self.lighting = lighting.Lighting.from_level(tiled_map)
+        # fog.Fog of the tiles that have been seen or None.
+        self.fog = None
+        if build:
+            self.reload()
 
     @property
     def tile_width(self):
+        """
+        Return the tile width the level is built at.
+        Until it's built, the one it will be built at.
+        """
+        if self.width is None:
+            return self.target_width()
+        return self.width
+
+    def target_width(self):
         """Return tile width based on screen size."""
         if self.zoomed:
             return int(
-                pg.display.get_surface().get_height() / self.level.height)
-        return int(pg.display.get_surface().get_width() / self.level.width)
+                sc.screen.get_height() / self.level.height)
+        return int(sc.screen.get_width() / self.level.width)
 
     @property
     def tile_height(self):
@@ -42,109 +83,481 @@ class Level(object):
         """Return tile size based on screen size."""
         return self.tile_width, self.tile_height
 
+    def load_images(self, width):
+        """
+        Use the tilesets baked at 'width' if there are any.
+        Otherwise the tiles are scaled from the source images.
+        """
+        if self.images_size == width:
+            return
+        self.images_size = width
+        loader = bake.image_loader(width)
+        if loader is None:
+            self.level.images = list(self.source_images)
+        else:
+            logging.info('Using tiles baked at %d.', width)
+            self.level.image_loader = loader
+            self.level.reload_images()
+        for image in self.level.images:
+            if image is not None:
+                memory.track(image, 'tiles')
+
+    @staticmethod
+    def scale_tile(image, size):
+        """Return 'image' in 'size'."""
+        if image.get_size() == size:
+            return image
+        return pg.transform.scale(image, size)
+
     def reload(self):
-        """Reload level in the right scale."""
-        self.tiles = {}
-        self.bg = pg.Surface((self.level.width * self.tile_width,
-                              self.level.height * self.tile_height))
-        self.bg.convert()
+        """Rebuild the level in the current scale before returning."""
+        for _ in self.reload_steps():
+            pass
+
+    def reload_steps(self):
+        """
+        Generator that rebuilds the level in the current scale a step at
+        a time, for 'scheduler.jobs'. The tiles are scaled and the
+        background composed in bands on the thread pool while it yields.
+        The level keeps its old scale until everything is done, then
+        the new surfaces replace the old ones at once. Stops if the level
+        is reloaded or released meanwhile.
+        """
+        self.generation += 1
+        generation = self.generation
+        width = self.target_width()
+        size = (width, width)
+        self.load_images(width)
+        tiles = {}
         for num, layer in enumerate(self.level.visible_layers):
-            self.load_tiles(num, layer)
+            yield
+            if self.generation != generation:
+                return
+            self.load_tiles(num, layer, tiles)
+        pool = self.get_pool()
+        scaled = dict((gid, pool.submit(
+            self.scale_tile, self.level.images[gid], size))
+                      for gid in self.tile_gids(tiles))
+        while not all(future.done() for future in scaled.values()):
+            yield
+            if self.generation != generation:
+                return
+            wait(scaled.values(), 0.001, FIRST_COMPLETED)
+        self.add_images(tiles, dict(
+            (gid, memory.track(future.result(), 'tiles'))
+            for gid, future in scaled.items()))
+        # In the pixel format of the display, like a converted surface.
+        bg = memory.track(pg.Surface(
+            (self.level.width * width, self.level.height * width), 0,
+            sc.screen), 'level')
+        pending = [(pool.submit(self.compose_band,
+                                pg.Surface(rect.size, 0, bg), band_tiles,
+                                rect.y, size), rect)
+                   for rect, band_tiles in self.bands(tiles, size)]
+        while pending:
+            yield
+            if self.generation != generation:
+                return
+            wait([future for future, _ in pending], 0.001, FIRST_COMPLETED)
+            for item in [item for item in pending if item[0].done()]:
+                pending.remove(item)
+                bg.blit(item[0].result(), item[1])
+        self.set_tiles(tiles, bg, width)
+
+    @classmethod
+    def get_pool(cls):
+        """Return the thread pool shared by all levels."""
+        if cls.pool is None:
+            cls.pool = ThreadPoolExecutor(os.cpu_count())
+        return cls.pool
+
+    def tile_gids(self, tiles):
+        """Return the gid of each image used by 'tiles'."""
+        return sorted(set(gid for tile in tiles.values()
+                          for gid in tile['gids']))
+
+    def add_images(self, tiles, images):
+        """Give each of 'tiles' its scaled 'images' by gid."""
+        frames = {}
+        for tile in tiles.values():
+            if tile.get('frames'):
+                for gid in tile['gids']:
+                    if gid not in frames:
+                        frames[gid] = memory.track(
+                            images[gid].copy(), 'tiles')
+                        frames[gid].set_colorkey((0, 0, 0))
+                tile['images'] = [frames[gid] for gid in tile['gids']]
+            else:
+                tile['images'] = [images[gid] for gid in tile['gids']]
+
+    def set_tiles(self, tiles, bg, width):
+        """Use 'tiles' and their background 'bg' built at 'width'."""
+        self.width = width
+        self.lighting.reload(self.tile_size)
+        self.tiles = tiles
         # self.tiles is a dict while self.animated_tiles is a list
         self.animated_tiles = list(
             tile for tile in self.tiles.values() if tile.get('frames'))
+        self.load_cells()
+        self.bg = bg
+        # Tile of the fog color, blitted instead of a slower fill.
+        self.fog_tile = memory.track(
+            pg.Surface(self.tile_size, 0, bg), 'level')
+        self.fog_tile.fill(fog.COLOR)
+        self.viewport = None
+        self.relight()
+
+    def bands(self, tiles, size):
+        """
+        Return a list of the rect and the tiles of each band of
+        'band_rows' rows of 'tiles' in tiles of 'size'.
+        """
+        rows = {}
+        for (x, y, layer), tile in sorted(
+                tiles.items(), key=lambda item: item[0][2]):
+            rows.setdefault(y, []).append(tile)
+        bands = []
+        for row in range(0, self.level.height, self.band_rows):
+            rect = pg.Rect(0, row * size[1], self.level.width * size[0],
+                           min(self.band_rows, self.level.height - row)
+                           * size[1])
+            bands.append((rect, [tile for y in range(row, row + self.band_rows)
+                                 for tile in rows.get(y, [])]))
+        return bands
+
+    def compose_band(self, band, tiles, top, size):
+        """Blit the first image of each tile of 'size' to 'band'."""
+        band.blits([(tile['images'][0],
+                     (tile['pos'].x * size[0], tile['pos'].y * size[1] - top))
+                    for tile in tiles], False)
+        return band
+
+    def relight(self, area=None):
+        """
+        Light 'area' of the background again where the viewport holds it.
+        The whole viewport is relit if 'area' is None.
+        """
+        if not self.shaded:
+            self.viewport = None
+            return
+        if self.viewport is None:
+            # Rows are lit once 'scroll_to' moves the viewport to them.
+            self.viewport = viewport.Viewport(
+                (self.bg.get_width(),
+                 min(sc.screen.get_height(), self.bg.get_height())), self.bg)
+            return
+        self.light(self.viewport.rect() if area is None else area)
+
+    def light(self, area):
+        """Copy 'area' of the background to the viewport and shade it."""
+        for level_rect, rect in self.viewport.parts(area):
+            self.viewport.surface.blit(self.bg, rect, level_rect)
+            self.shade(self.viewport.surface, level_rect,
+                       (0, level_rect.y - rect.y))
+
+    def scroll_to(self, scroll):
+        """Move the viewport to 'scroll' and light the rows that came in."""
+        if self.viewport is None:
+            return
+        top = int(max(0, min(scroll,
+                             self.bg.get_height() - self.viewport.height)))
+        for area in self.viewport.move(top):
+            self.light(area)
+
+    @property
+    def shaded(self):
+        """Check if the level is drawn from a lit viewport."""
+        return self.lighting.ambient != lighting.DAY or self.fog is not None
+
+    def shade(self, surface, area, offset=(0, 0)):
+        """
+        Multiply 'area' in level pixels of 'surface' by the lightmap and
+        darken the tiles hidden by the fog.
+        'offset' is the position of the level on 'surface'.
+        Return the changed area of 'surface'.
+        """
+        changed = self.lighting.multiply(surface, area, offset)
+        if self.fog is not None:
+            w, h = self.tile_size
+            for x, y in self.fog.hidden_tiles(
+                    area.left // w, area.top // h,
+                    (area.right - 1) // w + 1, (area.bottom - 1) // h + 1):
+                rect = pg.Rect(x * w, y * h, w, h).clip(area)
+                surface.blit(self.fog_tile, (rect.x - offset[0],
+                                             rect.y - offset[1]),
+                             pg.Rect((0, 0), rect.size), pg.BLEND_RGB_MULT)
+        return changed
+
+    def reveal(self, tiles):
+        """
+        Lighten the background of 'tiles', a list of (x, y) that the fog
+        no longer hides. Return the rect of each tile.
+        """
+        w, h = self.tile_size
+        rects = [pg.Rect(x * w, y * h, w, h) for x, y in tiles]
+        if self.bg is not None:
+            for rect in rects:
+                self.relight(rect)
+        return rects
+
+    def load_cells(self):
+        """
+        Find the tile stack of each cell with animated tiles.
+        The stacks are composited into one surface per combination of
+        frames by 'cell_image' so each animation step is a single blit.
+        """
+        self.cells = {}
+        for tile in self.animated_tiles:
+            pos = (tile['pos'].x, tile['pos'].y)
+            if pos not in self.cells:
+                self.cells[pos] = {'tiles' : [], 'animated' : [],
+                                   'images' : {}}
+            self.cells[pos]['animated'].append(tile)
+        for pos, cell in self.cells.items():
+            cell['tiles'] = sorted(
+                (tile for (x, y, _), tile in self.tiles.items()
+                 if (x, y) == pos), key=lambda tile: tile['pos'].layer)
 
-    def load_tiles(self, layer_num, layer):
-        """Load tiles each tile in the layer."""
-        for tile in layer.tiles():
+    def blocked(self):
+        """
+        Return a byte for each tile by row that is 1 if the top tile
+        has the 'collision' property.
+        """
+        width = self.level.width
+        top = [0] * (width * self.level.height)
+        for layer in self.level.visible_layers:
+            if hasattr(layer, 'iter_data'):
+                for x, y, gid in layer.iter_data():
+                    if gid:
+                        top[y * width + x] = gid
+        collision = {}
+        for gid in set(top):
+            properties = gid and self.level.get_tile_properties_by_gid(gid)
+            collision[gid] = int(bool(
+                properties and int(properties.get('collision', 0))))
+        return bytearray(collision[gid] for gid in top)
+
+    def release(self):
+        """Free the scaled surfaces. 'reload' rebuilds them."""
+        self.generation += 1
+        self.tiles = {}
+        self.animated_tiles = []
+        self.cells = {}
+        self.bg = None
+        self.fog_tile = None
+        self.viewport = None
+        self.level.images = list(self.source_images)
+        self.images_size = None
+        self.lighting.reload(None)
+
+    def surface_bytes(self):
+        """Return the number of bytes used by the scaled surfaces."""
+        surfaces = [image for tile in self.tiles.values()
+                    for image in tile['images']]
+        surfaces.extend(image for cell in self.cells.values()
+                        for image in cell['images'].values())
+        if self.bg is not None:
+            surfaces.append(self.bg)
+        if self.viewport is not None:
+            surfaces.append(self.viewport.surface)
+        surfaces = dict((id(surf), surf) for surf in surfaces).values()
+        return self.lighting.surface_bytes() + sum(
+            surf.get_bytesize() * surf.get_width() * surf.get_height()
+            for surf in surfaces)
+
+    def load_tiles(self, layer_num, layer, tiles):
+        """
+        Add each tile in the layer to the dict 'tiles'.
+        The images are added by 'set_tiles'.
+        """
+        for x, y, gid in layer.iter_data():
+            if not gid or self.level.images[gid] is None:
+                continue
             tile_dict = {
-                'pos' : self.tile_obj(tile[0], tile[1], layer_num),
-                'images' : [pg.transform.scale(tile[2], self.tile_size)],
+                'pos' : self.tile_obj(x, y, layer_num),
+                'gids' : [gid],
                 'index' : 0}
-            properties = self.level.get_tile_properties(
-                tile[0], tile[1], layer_num)
+            properties = self.level.get_tile_properties(x, y, layer_num)
             if properties and properties.get('frames'):
-                tile_dict.update({'images' : [],
-                                  'timer' : -100,
-                                  'frames' : properties['frames']})
-                for frame in tile_dict['frames']:
-                    image = self.level.get_tile_image_by_gid(frame.gid)
-                    image = pg.transform.scale(image, self.tile_size)
-                    image.set_colorkey((0, 0, 0))
-                    tile_dict['images'].append(image)
-            self.tiles[(tile[0], tile[1], layer_num)] = tile_dict
-
-            pos = (tile_dict['pos'].x * self.tile_width,
-                   tile_dict['pos'].y * self.tile_height)
-            sc.draw_queue.append(
-                {'layer' : 1 if tile_dict['pos'].layer == 0 else 2,
-                 'func' : self.bg.blit,
-                 'args' : (tile_dict['images'][0], pos)})
+                tile_dict.update({'timer' : -100,
+                                  'frames' : properties['frames'],
+                                  'gids' : [frame.gid for frame
+                                            in properties['frames']]})
+            tiles[(x, y, layer_num)] = tile_dict
 
     def draw_area(self, area, scroll):
         """Draw specific area of the level."""
-        sc.draw_queue.append({'layer' : 11, 'surf' : self.bg,
-                              'pos' : (area.x, area.y - scroll),
-                              'area' : area})
+        sc.draw_queue.append({'layer' : 11, 'func' : self.blit_area,
+                              'args' : (sc.screen, area, scroll)})
+
+    def blit_area(self, surface, area, scroll):
+        """
+        Blit 'area' of the lit level to 'surface', from the viewport at
+        'scroll' if the level is shaded. Return the changed area.
+        """
+        pos = (area.x, area.y - scroll)
+        if self.viewport is None:
+            return surface.blit(self.bg, pos, area)
+        self.scroll_to(scroll)
+        self.viewport.blit_to(surface, area, pos)
+        return area.move(0, -scroll)
+
+    def draw_frame_area(self, area, scroll):
+        """
+        Draw specific area of the level with the current frame of each
+        animated tile in it.
+        """
+        sc.draw_queue.append({'layer' : 11, 'func' : self.blit_frame_area,
+                              'args' : (sc.screen, area, scroll),
+                              'rect' : area.move(0, -scroll)})
+
+    def blit_frame_area(self, surface, area, scroll):
+        """
+        Blit 'area' of the level to 'surface' and the part of each
+        animated cell in it. The cells are lit here instead of on the
+        lighting layer so a cell drawn by 'draw_cell' in the same frame
+        isn't lit twice.
+        """
+        self.blit_area(surface, area, scroll)
+        for x in range(area.left // self.tile_width,
+                       (area.right - 1) // self.tile_width + 1):
+            for y in range(area.top // self.tile_height,
+                           (area.bottom - 1) // self.tile_height + 1):
+                if (x, y) not in self.cells:
+                    continue
+                rect = pg.Rect((x * self.tile_width, y * self.tile_height),
+                               self.tile_size)
+                clip = rect.clip(area)
+                surface.blit(self.cell_image((x, y)), (clip.x, clip.y - scroll),
+                             clip.move(-rect.x, -rect.y))
+                self.shade(surface, clip, (0, scroll))
 
     def draw(self, scroll):
         """Draw the whole level."""
         area = pg.Rect((0, scroll), sc.screen.get_size())
-        sc.draw_queue.append({'layer' : 3, 'surf' : self.bg,
-                              'pos' : (0, 0), 'area' : area})
+        sc.draw_queue.append({'layer' : 3, 'func' : self.blit_area,
+                              'args' : (sc.screen, area, scroll)})
+
+    def will_animate(self, elapsed_time):
+        """
+        Check if any tile changes frame or the lighting changes
+        after 'elapsed_time'.
+        """
+        return self.lighting.will_change(elapsed_time) or any(
+            tile['timer'] + elapsed_time
+            >= tile['frames'][tile['index']].duration
+            for tile in self.animated_tiles)
 
     def animate(self, elapsed_time, scroll):
         """
         Update and draw each animated tile.
         Should be called every frame.
         """
+        changed = set()
         for tile in self.animated_tiles:
             tile['timer'] += elapsed_time
             if tile['timer'] >= tile['frames'][tile['index']].duration:
-                self.draw_tile(scroll, tile)
                 tile['timer'] -= tile['frames'][tile['index']].duration
                 tile['index'] = (tile['index'] + 1) % len(tile['frames'])
+                changed.add((tile['pos'].x, tile['pos'].y))
+        light_change = self.lighting.update(elapsed_time)
+        if light_change == 'ambient':
+            self.relight()
+            self.draw(scroll)
+            changed.update(self.cells)
+        elif light_change == 'flicker':
+            screen_rect = pg.Rect((0, scroll), sc.screen.get_size())
+            for rect in self.lighting.lit_rects():
+                self.relight(rect)
+                if rect.colliderect(screen_rect):
+                    self.draw_area(rect.clip(screen_rect), scroll)
+                    changed.update(
+                        pos for pos in self.cells if rect.collidepoint(
+                            pos[0] * self.tile_width,
+                            pos[1] * self.tile_height))
+        for pos in changed:
+            self.draw_cell(scroll, pos)
 
-    def draw_tile(self, scroll, tile):
+    def cell_image(self, pos):
         """
-        Draw 'tile' and the one above or below it.
-        Can't animate two tiles in the same pos.
+        Return the composite of every layer in the cell at 'pos'
+        with the current frame of each animated tile.
         """
-        tile_2 = self.tiles.get((tile['pos'].x, tile['pos'].y,
-                                 1 if tile['pos'].layer == 0 else 0))
-        pos = (tile['pos'].x * self.tile_width,
-               tile['pos'].y * self.tile_height - scroll)
-        if tile_2:
-            sc.draw_queue.append(
-                {'layer' : 10 if tile_2['pos'].layer == 0 else 11,
-                 'func' : sc.screen.blit, 'args' : (tile_2['images'][0], pos)})
+        cell = self.cells[pos]
+        key = tuple(tile['index'] for tile in cell['animated'])
+        image = cell['images'].get(key)
+        if image is None:
+            image = memory.track(
+                pg.Surface(self.tile_size).convert(), 'tiles')
+            for tile in cell['tiles']:
+                image.blit(tile['images'][tile['index']], (0, 0))
+            cell['images'][key] = image
+        return image
+
+    def draw_cell(self, scroll, pos):
+        """Draw the cell at 'pos' with one blit and light it."""
+        rect = pg.Rect((pos[0] * self.tile_width, pos[1] * self.tile_height),
+                       self.tile_size)
+        sc.draw_queue.append(
+            {'layer' : 11, 'func' : sc.screen.blit,
+             'args' : (self.cell_image(pos), (rect.x, rect.y - scroll))})
         sc.draw_queue.append(
-            {'layer' : 10 if tile['pos'].layer == 0 else 11,
-             'func' : sc.screen.blit,
-             'args' : (tile['images'][tile['index']], pos)})
+            {'layer' : 12, 'func' : self.shade,
+             'args' : (sc.screen, rect, (0, scroll))})
 
 
 class Node(object):
     """Nodes activate when the player gets within the radius."""
 
-    def __init__(self, radius, pos, name, node_id, properties, text=None):
-        """Initialize instance variables."""
+    def __init__(self, radius, pos, name, node_id, properties, text=None,
+                 store=None):
+        """
+        Initialize instance variables.
+        The text is 'text' or else the entry named like the node in the
+        text.TextStore 'store', which is made when it's first shown.
+        """
         self.x_pos, self.y_pos = pos
         self.name = name
         self.id = node_id
         self.radius = radius
-        self.text = text
-        self.active = properties['active']
-        self.next_node = properties['next_node']
-        self.action = properties['action']
+        self.own_text = text
+        self.store = store
+        self.properties = properties
+        self.active = properties.get('active', '1')
+        self.initial_active = self.active
+        self.next_node = properties.get('next_node')
+        self.action = properties.get('action')
 
     def scale(self, multiplier):
         """Scale radius."""
         self.radius = int(self.radius * multiplier)
         self.x_pos = int(self.x_pos * multiplier)
         self.y_pos = int(self.y_pos * multiplier)
-        if self.text:
-            self.text.scale(multiplier)
+        if self.own_text:
+            self.own_text.scale(multiplier)
+
+    @property
+    def text(self):
+        """Return the text or None if it hasn't been made yet."""
+        if self.own_text is not None or self.store is None:
+            return self.own_text
+        return self.store.texts.get(self.name)
+
+    def has_text(self):
+        """Check if the node has text, made yet or not."""
+        return self.own_text is not None or (
+            self.store is not None and self.name in self.store)
+
+    def open_text(self):
+        """Return the text, making it on first use."""
+        if self.own_text is not None or self.store is None:
+            return self.own_text
+        return self.store.get(self.name)
+
+    def restore_text(self, progress):
+        """Show the text as it was after 'progress' calls to 'next'."""
+        if self.text is not None or (progress and self.has_text()):
+            self.open_text().restore(progress)
 
     def collides(self, pos):
         """Check if pos collides with text."""
@@ -160,35 +573,31 @@ class Node(object):
 
     def update_text(self):
         """Update and draw text."""
-        self.text.next()
-        if self.text.active:
-            self.text.draw()
+        text = self.open_text()
+        text.next()
+        if text.active:
+            text.draw()
 
 
 class NodeGroup(object):
     """Convenience class for a group of node objects."""
 
     @classmethod
-    def from_level(cls, level, text_dict):
-        """Return a NodeGroup from a pytmx TiledMap and text."""
-        radius = pg.display.get_surface().get_width() // level.width // 2
+    def from_level(cls, level, store):
+        """Return a NodeGroup from a pytmx TiledMap and text.TextStore."""
+        radius = sc.screen.get_width() // level.width // 2
         nodes = list()
         for obj in level.objects:
-            obj.x *= sc.screen.get_width() / 1680.0
-            obj.y *= sc.screen.get_height() / 1050.0
-            for name, text in zip(text_dict.keys(), text_dict.values()):
-                if name == obj.name:
-                    nodes.append(Node(radius, (obj.x, obj.y), obj.name, obj.id,
-                                      obj.properties, text=text))
-                    break
-            else:
-                nodes.append(Node(radius, (obj.x, obj.y), obj.name, obj.id,
-                                  obj.properties))
-        return NodeGroup(nodes)
+            pos = (obj.x * sc.screen.get_width() / 1680.0,
+                   obj.y * sc.screen.get_height() / 1050.0)
+            nodes.append(Node(radius, pos, obj.name, obj.id, obj.properties,
+                              store=store))
+        return NodeGroup(nodes, store)
 
-    def __init__(self, nodes):
+    def __init__(self, nodes, store=None):
         """Set instance variables."""
         self.nodes = nodes
+        self.store = store
 
     def __iter__(self):
         """Yield each node."""
@@ -199,12 +608,19 @@ class NodeGroup(object):
         """Scale each node."""
         for node in self.nodes:
             node.scale(multiplier)
+        if self.store is not None:
+            self.store.scale(multiplier)
+
+    def text_names(self):
+        """Return the names of the nodes that can still show text."""
+        return {node.name for node in self.nodes if node.active is not False}
 
     def draw(self, scroll):
         """Add each active node to the draw queue."""
-        for node in [n for n in self.nodes if n.active == '1']:
+        for node in [n for n in self.nodes
+                     if n.active == '1' and n.action != 'portal']:
             screen_rect = pg.Rect(
-                (0, scroll), pg.display.get_surface().get_size())
+                (0, scroll), sc.screen.get_size())
             if screen_rect.collidepoint((node.x_pos, node.y_pos)):
                 node.draw(scroll)
 
@@ -213,7 +629,7 @@ class NodeGroup(object):
         pos = player.rect.center
         for node in self.nodes:
             if node.active == '1' and node.collides(pos):
-                if node.text:
+                if node.has_text():
                     node.update_text()
                     player.stop()
 
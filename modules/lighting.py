@@ -0,0 +1,266 @@
+"""
+Module for the lighting layer of levels.
+
+The level is divided into chunks of tiles. The glow of a chunk is
+composed with NumPy from the falloff of each light inside it and cached
+until the tile size or a light in the chunk changes. The lightmap that
+is multiplied onto the level background is the ambient color of the
+time of day plus the glow, which only takes a fill and a blit, so
+the ambient color can change without composing the glow again.
+Lights flicker by cycling through a few cached variants.
+
+Lights are placed by the 'light' property of TMX objects or tiles,
+which is the radius in tiles.
+"""
+
+import random
+from math import cos, pi
+
+import numpy as np
+import pygame as pg
+
+from . import memory
+
+NIGHT = (60, 70, 120)
+DAY = (255, 255, 255)
+
+
+class Light(object):
+    """Light at a position in tiles."""
+
+    def __init__(self, pos, radius, color=(255, 190, 120), flicker=()):
+        """
+        Set instance variables.
+        'flicker' is the intensity of each variant from 0.0 to 1.0.
+        """
+        self.x, self.y = pos
+        self.radius = radius
+        self.color = color
+        self.flicker = flicker
+        self.on = True
+
+
+class Lighting(object):
+    """Lightmaps for a level, cached per chunk."""
+
+    chunk_tiles = 4
+    variants = 4
+    flicker_time = 120
+    # Milliseconds in a day and the number of ambient colors in a day.
+    day_length = 600000
+    ambient_steps = 48
+
+    def __init__(self, lights, size, hour=16.0):
+        """Set instance variables. 'size' is the level size in tiles."""
+        self.lights = lights
+        self.size = size
+        self.hour = hour
+        self.tile_size = None
+        self.variant = 0
+        self.flicker_timer = 0
+        rng = random.Random(0)
+        for light in self.lights:
+            if not light.flicker:
+                light.flicker = [rng.uniform(0.75, 1.0)
+                                 for _ in range(self.variants)]
+        self.chunks = {}
+        for light in self.lights:
+            for chunk in self.chunks_near(light):
+                self.chunks.setdefault(chunk, []).append(light)
+        self.falloffs = {}
+        # Glow and lightmap of each chunk by flicker variant. The
+        # lightmaps are filled again when the ambient color changes.
+        self.glows = {}
+        self.cache = {}
+        # A chunk of the ambient color, blitted to chunks without lights.
+        self.solid = None
+        self.solid_color = None
+        self.ambient = self.ambient_color()
+
+    @classmethod
+    def from_level(cls, tiled_map, **kwargs):
+        """Return the lighting for the 'light' properties of a TiledMap."""
+        lights = []
+        for layer in tiled_map.visible_layers:
+            if not hasattr(layer, 'iter_data'):
+                continue
+            for x, y, gid in layer.iter_data():
+                properties = gid and tiled_map.get_tile_properties_by_gid(gid)
+                if properties and properties.get('light'):
+                    lights.append(Light((x + 0.5, y + 0.5),
+                                        float(properties['light'])))
+        for obj in tiled_map.objects:
+            if obj.properties.get('light'):
+                lights.append(Light(
+                    ((obj.x + obj.width / 2.0) / tiled_map.tilewidth,
+                     (obj.y + obj.height / 2.0) / tiled_map.tileheight),
+                    float(obj.properties['light'])))
+        return cls(lights, (tiled_map.width, tiled_map.height), **kwargs)
+
+    def chunks_near(self, light):
+        """Return the chunks that 'light' reaches."""
+        size = self.chunk_tiles
+        left = max(0, int((light.x - light.radius) // size))
+        top = max(0, int((light.y - light.radius) // size))
+        right = min(self.size[0] - 1, int(light.x + light.radius)) // size
+        bottom = min(self.size[1] - 1, int(light.y + light.radius)) // size
+        return [(x, y) for x in range(left, right + 1)
+                for y in range(top, bottom + 1)]
+
+    def ambient_color(self):
+        """Return the ambient color of the current hour."""
+        step = int(self.hour / 24.0 * self.ambient_steps)
+        day = 0.5 - 0.5 * cos(2 * pi * step / self.ambient_steps)
+        return tuple(int(n + (d - n) * day) for n, d in zip(NIGHT, DAY))
+
+    def reload(self, tile_size):
+        """Forget the lightmaps composed for another tile size."""
+        if tile_size != self.tile_size:
+            self.tile_size = tile_size
+            self.falloffs = {}
+            self.glows = {}
+            self.cache = {}
+            self.solid = None
+
+    def set_light(self, light, on):
+        """Turn 'light' on or off and recompose the chunks it reaches."""
+        light.on = on
+        for chunk in self.chunks_near(light):
+            self.glows.pop(chunk, None)
+            self.cache.pop(chunk, None)
+
+    def update(self, elapsed):
+        """
+        Advance the time of day and the flicker.
+        Return 'ambient' if everything must be redrawn, 'flicker' if the
+        lit chunks must be redrawn or None.
+        """
+        self.hour = (self.hour + elapsed * 24.0 / self.day_length) % 24
+        ambient = self.ambient_color()
+        if ambient != self.ambient:
+            self.ambient = ambient
+            return 'ambient'
+        self.flicker_timer += elapsed
+        if self.flicker_timer >= self.flicker_time:
+            self.flicker_timer %= self.flicker_time
+            self.variant = (self.variant + 1) % self.variants
+            if self.ambient != DAY:
+                return 'flicker'
+
+    def will_change(self, elapsed):
+        """Check if 'update' would return something after 'elapsed'."""
+        hour = (self.hour + elapsed * 24.0 / self.day_length) % 24
+        return (int(hour / 24.0 * self.ambient_steps)
+                != int(self.hour / 24.0 * self.ambient_steps)
+                or (self.ambient != DAY and self.flicker_timer + elapsed
+                    >= self.flicker_time))
+
+    def chunk_rect(self, chunk):
+        """Return the rect of 'chunk' in level pixels."""
+        w = self.chunk_tiles * self.tile_size[0]
+        h = self.chunk_tiles * self.tile_size[1]
+        return pg.Rect(chunk[0] * w, chunk[1] * h, w, h)
+
+    def lit_rects(self):
+        """Return the rects of the chunks with lights."""
+        return [self.chunk_rect(chunk) for chunk in self.chunks]
+
+    def falloff(self, radius):
+        """Return the falloff of a light with 'radius' pixels."""
+        if radius not in self.falloffs:
+            span = np.arange(-radius, radius, dtype=np.float32) + 0.5
+            distance = np.hypot(span[:, None], span[None, :]) / radius
+            self.falloffs[radius] = np.clip(1.0 - distance, 0.0, 1.0) ** 2
+        return self.falloffs[radius]
+
+    def compose(self, chunk, variant):
+        """Return the glow of the lights in 'chunk' for a flicker variant."""
+        rect = self.chunk_rect(chunk)
+        light_map = np.zeros((rect.width, rect.height, 3), np.float32)
+        for light in [l for l in self.chunks[chunk] if l.on]:
+            radius = int(light.radius * self.tile_size[0])
+            falloff = self.falloff(radius)
+            left = int(light.x * self.tile_size[0]) - radius - rect.x
+            top = int(light.y * self.tile_size[1]) - radius - rect.y
+            area = pg.Rect(left, top, radius * 2, radius * 2).clip(
+                (0, 0) + rect.size)
+            if not area:
+                continue
+            glow = falloff[area.x - left:area.right - left,
+                           area.y - top:area.bottom - top, None]
+            light_map[area.x:area.right, area.y:area.bottom] += (
+                glow * np.array(light.color, np.float32)
+                * light.flicker[variant])
+        np.clip(light_map, 0, 255, out=light_map)
+        return memory.track(pg.surfarray.make_surface(
+            light_map.astype(np.uint8)).convert(), 'lighting')
+
+    def chunk_image(self, chunk):
+        """
+        Return the lightmap of 'chunk' for the current variant and
+        ambient color. It's made from the cached glow if the ambient
+        color changed since it was last used.
+        """
+        glows = self.glows.setdefault(chunk, {})
+        if self.variant not in glows:
+            glows[self.variant] = self.compose(chunk, self.variant)
+        images = self.cache.setdefault(chunk, {})
+        ambient, image = images.get(self.variant, (None, None))
+        if image is None:
+            image = memory.track(glows[self.variant].copy(), 'lighting')
+        elif ambient == self.ambient:
+            return image
+        image.fill(self.ambient)
+        image.blit(glows[self.variant], (0, 0), None, pg.BLEND_RGB_ADD)
+        images[self.variant] = (self.ambient, image)
+        return image
+
+    def ambient_image(self):
+        """
+        Return a chunk filled with the ambient color.
+        Blitting it with BLEND_RGB_MULT is much faster than a fill.
+        """
+        if self.solid is None:
+            self.solid = memory.track(pg.Surface(
+                self.chunk_rect((0, 0)).size).convert(), 'lighting')
+            self.solid_color = None
+        if self.solid_color != self.ambient:
+            self.solid.fill(self.ambient)
+            self.solid_color = self.ambient
+        return self.solid
+
+    def multiply(self, surface, area, offset=(0, 0)):
+        """
+        Multiply 'area' in level pixels of 'surface' by the lightmap.
+        'offset' is the position of the level on 'surface'.
+        Chunks without lights are multiplied by the ambient color.
+        Return the changed area of 'surface'.
+        """
+        if self.ambient == DAY:
+            return area.move(-offset[0], -offset[1])
+        w = self.chunk_tiles * self.tile_size[0]
+        h = self.chunk_tiles * self.tile_size[1]
+        for x in range(area.left // w, (area.right - 1) // w + 1):
+            for y in range(area.top // h, (area.bottom - 1) // h + 1):
+                chunk_rect = self.chunk_rect((x, y))
+                clip = chunk_rect.clip(area)
+                if not clip:
+                    continue
+                pos = (clip.x - offset[0], clip.y - offset[1])
+                if (x, y) in self.chunks:
+                    surface.blit(self.chunk_image((x, y)), pos,
+                                 clip.move(-chunk_rect.x, -chunk_rect.y),
+                                 pg.BLEND_RGB_MULT)
+                else:
+                    surface.blit(self.ambient_image(), pos,
+                                 pg.Rect((0, 0), clip.size), pg.BLEND_RGB_MULT)
+        return area.move(-offset[0], -offset[1])
+
+    def surface_bytes(self):
+        """Return the number of bytes used by the cached glows and lightmaps."""
+        images = [image for glows in self.glows.values()
+                  for image in glows.values()]
+        images.extend(image for lightmaps in self.cache.values()
+                      for _, image in lightmaps.values())
+        return sum(image.get_bytesize() * image.get_width()
+                   * image.get_height() for image in images)
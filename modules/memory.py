@@ -0,0 +1,139 @@
+"""
+Module for accounting the memory used by surfaces.
+
+Subsystems tag the surfaces they keep with 'track'. Surfaces are held by
+weak references so each one counts until it's freed. A subsurface counts
+as the surface that owns its pixels, so pixels are only counted once.
+A warning is logged when a subsystem goes over its entry in 'budgets'.
+
+Surfaces can be freed by the garbage collector at any point, even while
+the registry is being read, so freed surfaces are only queued by their
+weak reference callback and are removed by 'collect'.
+"""
+
+import json
+import logging
+import threading
+import weakref
+
+import pygame as pg
+
+# Bytes each subsystem may use before a warning is logged.
+# The key 'total' is the budget of all subsystems together.
+budgets = {}
+# Tracked surfaces by id as (weak reference, subsystem, bytes).
+surfaces = {}
+totals = {}
+freed = []
+over_budget = set()
+# Surfaces are tracked from the loading threads too.
+lock = threading.RLock()
+
+
+def track(surface, subsystem):
+    """Count 'surface' towards 'subsystem' until it's freed. Return it."""
+    owner = surface.get_abs_parent()
+    key = id(owner)
+    with lock:
+        # The id of a freed surface can already be reused by 'owner'.
+        collect()
+        if key in surfaces and surfaces[key][0]() is owner:
+            return surface
+        size = owner.get_pitch() * owner.get_height()
+        ref = weakref.ref(owner, lambda ref, key=key: forget(key, ref))
+        surfaces[key] = (ref, subsystem, size)
+        totals[subsystem] = totals.get(subsystem, 0) + size
+        check(subsystem)
+    return surface
+
+
+def forget(key, ref):
+    """Queue a freed surface to be removed by 'collect'."""
+    freed.append((key, ref))
+
+
+def collect():
+    """Stop counting the surfaces freed since the last call."""
+    with lock:
+        while freed:
+            key, ref = freed.pop()
+            item = surfaces.get(key)
+            if item is None or item[0] is not ref:
+                continue
+            del surfaces[key]
+            totals[item[1]] -= item[2]
+            check(item[1])
+
+
+def used(subsystem=None):
+    """Return the bytes used by 'subsystem' or by every subsystem."""
+    with lock:
+        collect()
+        if subsystem is None:
+            return sum(totals.values())
+        return totals.get(subsystem, 0)
+
+
+def check(subsystem):
+    """Log a warning when 'subsystem' or the total goes over budget."""
+    for name, size in ((subsystem, totals.get(subsystem, 0)),
+                       ('total', sum(totals.values()))):
+        budget = budgets.get(name)
+        if budget is None or size <= budget:
+            over_budget.discard(name)
+        elif name not in over_budget:
+            over_budget.add(name)
+            logging.warning('Surfaces of %s use %.1f MiB, the budget is '
+                            '%.1f MiB.', name, size / 1024.0 ** 2,
+                            budget / 1024.0 ** 2)
+
+
+def report():
+    """
+    Return a dict by subsystem of the number of surfaces, their bytes,
+    the budget and the bytes by pixel format and by size.
+    """
+    with lock:
+        collect()
+        items = [(ref(), subsystem, size)
+                 for ref, subsystem, size in list(surfaces.values())]
+    result = {}
+    for surface, subsystem, size in items:
+        if surface is None:
+            continue
+        entry = result.setdefault(subsystem, dict(
+            count=0, bytes=0, budget=budgets.get(subsystem),
+            formats={}, sizes={}))
+        entry['count'] += 1
+        entry['bytes'] += size
+        pixel_format = '{} bit{}'.format(
+            surface.get_bitsize(),
+            ' alpha' if surface.get_flags() & pg.SRCALPHA else '')
+        entry['formats'][pixel_format] = (
+            entry['formats'].get(pixel_format, 0) + size)
+        dimensions = '{}x{}'.format(*surface.get_size())
+        entry['sizes'][dimensions] = entry['sizes'].get(dimensions, 0) + 1
+    return result
+
+
+def report_lines():
+    """Return the report as lines of text, largest subsystem first."""
+    entries = sorted(report().items(), key=lambda item: -item[1]['bytes'])
+    lines = ['{:<10} {:>6} {:>10}'.format('surfaces', 'count', 'MiB')]
+    for subsystem, entry in entries:
+        line = '{:<10} {:>6} {:>10.1f}'.format(
+            subsystem, entry['count'], entry['bytes'] / 1024.0 ** 2)
+        if entry['budget'] is not None:
+            line += ' / {:.1f}'.format(entry['budget'] / 1024.0 ** 2)
+        lines.append(line)
+    lines.append('{:<10} {:>6} {:>10.1f}'.format(
+        'total', sum(entry['count'] for _, entry in entries),
+        sum(entry['bytes'] for _, entry in entries) / 1024.0 ** 2))
+    return lines
+
+
+def dump(filename):
+    """Write the report to 'filename' as JSON."""
+    with open(filename, 'w') as report_file:
+        json.dump(report(), report_file, indent=1, sort_keys=True)
+    logging.info('Wrote the surface report to %s.', filename)
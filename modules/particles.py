@@ -0,0 +1,293 @@
+"""
+Module for particle effects.
+
+Particles are stored in preallocated NumPy arrays and are updated and
+drawn without a Python loop per particle. Positions are in tiles so
+particles don't need rescaling when the screen is resized.
+
+Emitters are placed by the 'emitter' property of TMX objects or tiles.
+The value is a comma separated list of names from 'PRESETS'.
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pygame as pg
+
+from . import screen as sc
+
+# Velocities are in tiles per second and times in milliseconds.
+# 'origin' is where particles start in the tile, 'extent' is how far
+# they can get from it as (left, up, right, down) in tiles.
+PRESETS = {
+    'flame' : dict(rate=60.0, life=(300, 700), jitter=0.12,
+                   origin=(0.5, 0.35), vx=(-0.25, 0.25), vy=(-1.0, -0.5),
+                   gravity=-0.6, extent=(0.4, 1.2, 0.4, 0.2),
+                   colors=((255, 230, 120), (255, 150, 40), (200, 60, 20))),
+    'spark' : dict(rate=6.0, life=(500, 1000), jitter=0.05,
+                   origin=(0.5, 0.3), vx=(-0.8, 0.8), vy=(-2.0, -1.0),
+                   gravity=3.0, extent=(0.9, 1.3, 0.9, 1.0),
+                   colors=((255, 255, 200), (255, 200, 60))),
+    'spray' : dict(rate=4.0, life=(300, 600), jitter=0.4,
+                   origin=(0.5, 0.5), vx=(-0.5, 0.5), vy=(-1.0, -0.4),
+                   gravity=3.0, extent=(0.8, 0.7, 0.8, 0.6),
+                   colors=((255, 255, 255), (200, 230, 255),
+                           (150, 200, 255))),
+}
+
+
+class Emitter(object):
+    """Spawns particles of a preset at a tile."""
+
+    def __init__(self, preset, pos):
+        """Set instance variables. 'pos' is the top left of the tile."""
+        self.preset = PRESETS[preset]
+        self.x = pos[0] + self.preset['origin'][0]
+        self.y = pos[1] + self.preset['origin'][1]
+        self.timer = 0.0
+
+    def area(self, tile_size, scroll):
+        """Return the screen rect particles of this emitter can reach."""
+        left, up, right, down = self.preset['extent']
+        w, h = tile_size
+        return pg.Rect(
+            int((self.x - left) * w), int((self.y - up) * h - scroll),
+            int((left + right) * w) + 2, int((up + down) * h) + 2)
+
+
+class ParticleSystem(object):
+    """
+    Particles in preallocated arrays.
+    Live particles are kept packed at the start of the arrays.
+    """
+
+    def __init__(self, capacity=16384, seed=None):
+        """Set instance variables and allocate the arrays."""
+        self.capacity = capacity
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.gravity = np.zeros(capacity, np.float32)
+        self.age = np.zeros(capacity, np.float32)
+        self.life = np.ones(capacity, np.float32)
+        self.palette = np.zeros(capacity, np.int16)
+        self.source = np.zeros(capacity, np.int32)
+        self.palettes = []
+        self.palette_ids = {}
+        self.emitters = []
+        # Areas in level pixels the particles were drawn over last frame.
+        self.drawn = []
+
+    @classmethod
+    def from_level(cls, tiled_map, **kwargs):
+        """Return a particle system with the emitters of a TiledMap."""
+        system = cls(**kwargs)
+        system.emitters = emitters_from_level(tiled_map)
+        return system
+
+    def palette_id(self, colors):
+        """Return the number of the palette 'colors'."""
+        if colors not in self.palette_ids:
+            self.palette_ids[colors] = len(self.palettes)
+            self.palettes.append(colors)
+        return self.palette_ids[colors]
+
+    def emit(self, emitter, amount, source=0):
+        """
+        Add 'amount' particles from 'emitter' if there is room.
+        'source' is the number of the emitter in 'emitters'.
+        """
+        amount = min(amount, self.capacity - self.count)
+        if amount <= 0:
+            return
+        preset = emitter.preset
+        new = slice(self.count, self.count + amount)
+        rand = self.rng.random((5, amount), np.float32)
+        jitter = preset['jitter']
+        self.x[new] = emitter.x + (rand[0] - 0.5) * jitter
+        self.y[new] = emitter.y + (rand[1] - 0.5) * jitter * 0.5
+        low, high = preset['vx']
+        self.vx[new] = low + rand[2] * (high - low)
+        low, high = preset['vy']
+        self.vy[new] = low + rand[3] * (high - low)
+        low, high = preset['life']
+        self.life[new] = low + rand[4] * (high - low)
+        self.age[new] = 0.0
+        self.gravity[new] = preset['gravity']
+        self.palette[new] = self.palette_id(preset['colors'])
+        self.source[new] = source
+        self.count += amount
+
+    def update(self, elapsed):
+        """Emit, move and remove particles after 'elapsed' milliseconds."""
+        for num, emitter in enumerate(self.emitters):
+            emitter.timer += elapsed * emitter.preset['rate'] / 1000.0
+            amount = int(emitter.timer)
+            emitter.timer -= amount
+            self.emit(emitter, amount, num)
+        live = slice(0, self.count)
+        seconds = elapsed / 1000.0
+        self.age[live] += elapsed
+        self.vy[live] += self.gravity[live] * seconds
+        self.x[live] += self.vx[live] * seconds
+        self.y[live] += self.vy[live] * seconds
+        keep = self.age[live] < self.life[live]
+        count = int(np.count_nonzero(keep))
+        if count != self.count:
+            for array in (self.x, self.y, self.vx, self.vy, self.gravity,
+                          self.age, self.life, self.palette, self.source):
+                array[:count] = array[live][keep]
+            self.count = count
+
+    def colors(self, surface):
+        """Return the mapped color of each particle from its age."""
+        steps = max(len(colors) for colors in self.palettes)
+        table = np.zeros((len(self.palettes), steps), np.uint32)
+        for num, colors in enumerate(self.palettes):
+            mapped = [surface.map_rgb(color) for color in colors]
+            table[num] = [mapped[int(step * len(colors) / steps)]
+                          for step in range(steps)]
+        live = slice(0, self.count)
+        step = (self.age[live] / self.life[live] * steps).astype(np.intp)
+        return table[self.palette[live], np.minimum(step, steps - 1)]
+
+    def draw_to(self, surface, tile_size, scroll, size=1):
+        """Write each particle as a 'size' pixel square to 'surface'."""
+        if not self.count:
+            return
+        live = slice(0, self.count)
+        xs = (self.x[live] * tile_size[0]).astype(np.intp)
+        ys = (self.y[live] * tile_size[1] - scroll).astype(np.intp)
+        width, height = surface.get_size()
+        visible = ((xs >= 0) & (ys >= 0) & (xs < width - size + 1)
+                   & (ys < height - size + 1))
+        xs, ys = xs[visible], ys[visible]
+        colors = self.colors(surface)[visible]
+        if surface.get_bytesize() == 4:
+            pixels = pg.surfarray.pixels2d(surface)
+            for dx in range(size):
+                for dy in range(size):
+                    pixels[xs + dx, ys + dy] = colors
+            del pixels
+        else:
+            square = pg.Surface((size, size))
+            images = {}
+            colors = colors.tolist()
+            for color in set(colors):
+                images[color] = square.copy()
+                images[color].fill(surface.unmap_rgb(color))
+            surface.blits(zip([images[color] for color in colors],
+                              zip(xs.tolist(), ys.tolist())), False)
+
+    def bounds(self, tile_size, size):
+        """
+        Return a rect in level pixels around the particles of each
+        emitter that has any.
+        """
+        if not self.count:
+            return []
+        live = slice(0, self.count)
+        xs = (self.x[live] * tile_size[0]).astype(np.intp)
+        ys = (self.y[live] * tile_size[1]).astype(np.intp)
+        source = self.source[live]
+        edges = []
+        for values, reduce, start in (
+                (xs, np.minimum, np.iinfo(np.intp).max),
+                (ys, np.minimum, np.iinfo(np.intp).max),
+                (xs, np.maximum, np.iinfo(np.intp).min),
+                (ys, np.maximum, np.iinfo(np.intp).min)):
+            edge = np.full(len(self.emitters), start, np.intp)
+            reduce.at(edge, source, values)
+            edges.append(edge.tolist())
+        return [pg.Rect(left, top, right - left + size, bottom - top + size)
+                for left, top, right, bottom in zip(*edges) if left <= right]
+
+    def draw(self, level, scroll):
+        """
+        Add the particles to the draw queue and restore the level
+        under the particles of the last frame with the current frame
+        of its animated tiles.
+        Return the areas in level pixels that are redrawn.
+        """
+        visible = pg.Rect((0, scroll), sc.screen.get_size())
+        restored = [area.clip(visible) for area in self.drawn
+                    if area.colliderect(visible)]
+        for area in restored:
+            level.draw_frame_area(area, scroll)
+        size = max(1, level.tile_width // 24)
+        self.drawn = [area for area in self.bounds(level.tile_size, size)
+                      if area.colliderect(visible)]
+        if self.drawn:
+            sc.draw_queue.append(dict(
+                layer=16, func=self.draw_to,
+                args=(sc.screen, level.tile_size, scroll, size),
+                rect=self.drawn[0].unionall(self.drawn[1:]).clip(
+                    visible).move(0, -scroll)))
+        return restored + self.drawn
+
+
+def emitters_from_level(tiled_map):
+    """Return an emitter for each emitter property in a TiledMap."""
+    emitters = []
+    for num, layer in enumerate(tiled_map.visible_layers):
+        if not hasattr(layer, 'iter_data'):
+            continue
+        for x, y, gid in layer.iter_data():
+            properties = gid and tiled_map.get_tile_properties_by_gid(gid)
+            if properties and properties.get('emitter'):
+                emitters.extend(Emitter(name.strip(), (x, y)) for name
+                                in properties['emitter'].split(','))
+    for obj in tiled_map.objects:
+        if obj.properties.get('emitter'):
+            pos = (obj.x / tiled_map.tilewidth, obj.y / tiled_map.tileheight)
+            emitters.extend(Emitter(name.strip(), pos) for name
+                            in obj.properties['emitter'].split(','))
+    return emitters
+
+
+def benchmark(particles=10000, frames=600, res=(1920, 1080), tile=96):
+    """
+    Update and draw 'particles' particles for 'frames' frames at 60 FPS.
+    Return a dict with the number of live particles and the average
+    milliseconds per frame.
+    """
+    system = ParticleSystem(capacity=particles)
+    columns = 16
+    for num in range(64):
+        system.emitters.append(Emitter(
+            'flame', (num % columns + 2, num // columns * 2 + 2)))
+    # Emit enough to replace the particles that live half a second.
+    for emitter in system.emitters:
+        emitter.preset = dict(emitter.preset,
+                              rate=particles * 2.0 / len(system.emitters))
+    surface = pg.Surface(res, 0, 32)
+    for _ in range(60):
+        system.update(1000 / 60.0)
+    start = time.time()
+    for _ in range(frames):
+        system.update(1000 / 60.0)
+        system.draw_to(surface, (tile, tile), 0, 2)
+    spent = (time.time() - start) * 1000.0 / frames
+    return dict(particles=system.count, ms=spent)
+
+
+def main():
+    """Benchmark the particle system from the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--particles', type=int, default=10000)
+    parser.add_argument('--frames', type=int, default=600)
+    args = parser.parse_args()
+    result = benchmark(args.particles, args.frames)
+    print('particles: {}'.format(result['particles']))
+    print('ms per frame: {:.2f} ({:.0f} FPS)'.format(
+        result['ms'], 1000.0 / result['ms']))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
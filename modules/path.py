@@ -7,4 +7,6 @@ PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 IMAGE_PATH = os.path.join(PATH, 'images')
 LEVEL_PATH = os.path.join(PATH, 'levels')
 TEXT_PATH = os.path.join(PATH, 'text')
+SAVE_PATH = os.path.join(PATH, 'saves')
+BAKE_PATH = os.path.join(PATH, 'baked')
 
@@ -0,0 +1,108 @@
+"""Module for loading state data on a worker thread."""
+
+import logging
+import threading
+from os.path import join
+
+import pygame as pg
+from pytmx import TiledMap
+from pytmx.util_pygame import handle_transformation, smart_convert
+
+from .path import IMAGE_PATH, LEVEL_PATH
+from .text import TextStore
+
+
+class Preloader(object):
+    """
+    Load level, image and text data without touching the display.
+    Surfaces are decoded on the worker thread and converted to the
+    display format on the main thread by 'finish'.
+    """
+
+    def __init__(self, level_name, images):
+        """Set instance variables and create the worker thread."""
+        self.level_name = level_name
+        self.image_names = list(images)
+        self.steps = len(self.image_names) + 2
+        self.completed = 0
+        self.error = None
+        self.level = None
+        self.images = {}
+        self.text = None
+        self.colorkeys = {}
+        self.result = None
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    @property
+    def progress(self):
+        """Return how much of the data has been loaded from 0.0 to 1.0."""
+        return float(self.completed) / self.steps
+
+    @property
+    def done(self):
+        """Return True if the worker thread has finished."""
+        return self.completed == self.steps or self.error is not None
+
+    def matches(self, level_name, images):
+        """Check if the preloader is loading 'level_name' and 'images'."""
+        return (level_name == self.level_name
+                and sorted(images) == sorted(self.image_names))
+
+    def start(self):
+        """Start the worker thread and return self."""
+        self.thread.start()
+        return self
+
+    def run(self):
+        """Load everything that doesn't need the display."""
+        try:
+            self.level = TiledMap(join(LEVEL_PATH, self.level_name),
+                                  image_loader=self.image_loader)
+            self.completed += 1
+            for name in self.image_names:
+                self.images[name] = pg.image.load(join(IMAGE_PATH, name))
+                self.completed += 1
+            self.text = TextStore.load()
+            self.completed += 1
+        except Exception as error:
+            logging.exception('Preloading %s failed.', self.level_name)
+            self.error = error
+
+    def image_loader(self, filename, colorkey, **kwargs):
+        """
+        Image loader for pytmx that decodes but doesn't convert images.
+        The colorkey of each tile is stored for 'finish'.
+        """
+        if colorkey:
+            colorkey = pg.Color('#{0}'.format(colorkey))
+        image = pg.image.load(filename)
+
+        def load_image(rect=None, flags=None):
+            """Return an unconverted tile from the decoded image."""
+            tile = image.subsurface(rect) if rect else image.copy()
+            if flags:
+                tile = handle_transformation(tile, flags)
+            self.colorkeys[id(tile)] = colorkey
+            return tile
+
+        return load_image
+
+    def finish(self):
+        """
+        Wait for the worker, convert the surfaces and return a dict
+        with the keys 'level', 'images' and 'text'.
+        Return None if loading failed.
+        """
+        self.thread.join()
+        if self.error is not None:
+            return None
+        if self.result is not None:
+            return self.result
+        self.level.images = [
+            smart_convert(image, self.colorkeys[id(image)], True)
+            if image is not None else None for image in self.level.images]
+        images = {name : image.convert_alpha()
+                  for name, image in self.images.items()}
+        self.result = dict(level=self.level, images=images, text=self.text)
+        return self.result
@@ -0,0 +1,153 @@
+"""
+Module for saving and loading the world.
+
+A save starts with a header and the level name, followed by the player
+position in tiles and the nodes that differ from the level file:
+    header: magic, version, level name length
+    player: x, y
+    nodes: count, then id, active and text progress for each node
+    fog: length, then a bit for each tile the player has seen
+Version 1 saves have no fog.
+"""
+
+import logging
+import os
+import struct
+import threading
+
+MAGIC = b'GSAV'
+VERSION = 2
+VERSIONS = (1, 2)
+HEADER = struct.Struct('<4sHH')
+PLAYER = struct.Struct('<ff')
+COUNT = struct.Struct('<H')
+NODE = struct.Struct('<HBH')
+FOG = struct.Struct('<I')
+# Node.active is '0' or '1' in the level file and False once finished.
+ACTIVE_CODES = {'0' : 0, '1' : 1, False : 2}
+ACTIVE_VALUES = {code : value for value, code in ACTIVE_CODES.items()}
+# Errors raised by truncated or corrupt saves.
+LOAD_ERRORS = (ValueError, EOFError, struct.error, TypeError, KeyError,
+               IOError, OSError)
+
+
+def active_code(active):
+    """Return the code of a Node.active value, True is the same as '1'."""
+    if active is True:
+        active = '1'
+    elif active is not False:
+        active = str(active)
+    return ACTIVE_CODES[active]
+
+
+def encode(data):
+    """Return the save data dict as bytes."""
+    level = data['level'].encode('utf-8')
+    parts = [HEADER.pack(MAGIC, VERSION, len(level)), level,
+             PLAYER.pack(*data['player']), COUNT.pack(len(data['nodes']))]
+    parts.extend(NODE.pack(node_id, active_code(active), progress)
+                 for node_id, active, progress in data['nodes'])
+    fog = data.get('fog') or b''
+    parts.extend((FOG.pack(len(fog)), fog))
+    return b''.join(parts)
+
+
+def decode(raw):
+    """Return the save data dict from bytes."""
+    magic, version, length = HEADER.unpack_from(raw)
+    if magic != MAGIC or version not in VERSIONS:
+        raise ValueError('Unsupported save format.')
+    offset = HEADER.size
+    level = raw[offset:offset + length].decode('utf-8')
+    offset += length
+    player = PLAYER.unpack_from(raw, offset)
+    offset += PLAYER.size
+    count, = COUNT.unpack_from(raw, offset)
+    offset += COUNT.size
+    nodes = []
+    for _ in range(count):
+        node_id, active, progress = NODE.unpack_from(raw, offset)
+        nodes.append((node_id, ACTIVE_VALUES[active], progress))
+        offset += NODE.size
+    fog = None
+    if version >= 2:
+        length, = FOG.unpack_from(raw, offset)
+        offset += FOG.size
+        fog = raw[offset:offset + length]
+        if len(fog) != length:
+            raise EOFError('Truncated fog.')
+        fog = fog or None
+    return dict(level=level, player=player, nodes=nodes, fog=fog)
+
+
+def write(filename, data):
+    """Write 'data' to a temporary file and rename it to 'filename'."""
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    temp = filename + '.tmp'
+    with open(temp, 'wb') as save_file:
+        save_file.write(encode(data))
+        save_file.flush()
+        os.fsync(save_file.fileno())
+    os.replace(temp, filename)
+
+
+def load(filename):
+    """Return the save data from 'filename' or None if it can't be read."""
+    try:
+        with open(filename, 'rb') as save_file:
+            return decode(save_file.read())
+    except LOAD_ERRORS as error:
+        logging.warning('Can\'t load save %s: %r', filename, error)
+        return None
+
+
+class Autosaver(object):
+    """
+    Write saves on a worker thread.
+    Only the newest data is written if saves arrive faster than they
+    can be written.
+    """
+
+    def __init__(self, filename):
+        """Set instance variables and start the worker thread."""
+        self.filename = filename
+        self.pending = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def save(self, data):
+        """
+        Queue 'data' to be written.
+        'data' must not be changed afterwards.
+        """
+        with self.lock:
+            self.pending = data
+            self.idle.clear()
+        self.wake.set()
+
+    def flush(self, timeout=None):
+        """Wait until queued data has been written."""
+        return self.idle.wait(timeout)
+
+    def run(self):
+        """Write queued data until the program exits."""
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                data, self.pending = self.pending, None
+            if data is not None:
+                try:
+                    write(self.filename, data)
+                except (IOError, OSError):
+                    logging.exception('Autosave failed.')
+            with self.lock:
+                if self.pending is None:
+                    self.idle.set()
@@ -0,0 +1,108 @@
+"""
+Module for spreading work over frames.
+
+A job is a generator that does a little work between each yield. The
+scheduler runs the steps of its jobs each frame until the frame's budget
+of milliseconds is spent, so loading doesn't stop the game from drawing.
+Jobs with a higher priority run first. A job submitted with the key of
+an unfinished job replaces it, like a newer resize replacing an older one.
+"""
+
+import logging
+import time
+
+
+class Job(object):
+    """A generator of steps and what to call once it's finished."""
+
+    def __init__(self, steps, priority, key, callback, number):
+        """Set instance variables."""
+        self.steps = steps
+        self.priority = priority
+        self.key = key
+        self.callback = callback
+        self.number = number
+        self.done = False
+        self.cancelled = False
+        self.failed = False
+
+
+class Scheduler(object):
+    """Runs jobs a step at a time within a budget each frame."""
+
+    def __init__(self, budget=4.0):
+        """Set instance variables. 'budget' is in milliseconds."""
+        self.budget = budget
+        self.jobs = []
+        self.submitted = 0
+
+    def submit(self, steps, priority=0, key=None, callback=None):
+        """
+        Add the generator 'steps' as a job and return it.
+        An unfinished job with the same 'key' is cancelled.
+        'callback' is called without arguments once the job finishes.
+        """
+        if key is not None:
+            self.cancel(key)
+        job = Job(steps, priority, key, callback, self.submitted)
+        self.submitted += 1
+        self.jobs.append(job)
+        self.jobs.sort(key=lambda job: (-job.priority, job.number))
+        return job
+
+    def cancel(self, key):
+        """Stop the unfinished jobs with 'key'."""
+        for job in [job for job in self.jobs if job.key == key]:
+            self.jobs.remove(job)
+            job.cancelled = True
+            job.steps.close()
+
+    def pending(self, key):
+        """Check if a job with 'key' is unfinished."""
+        return any(job.key == key for job in self.jobs)
+
+    def run(self, budget=None):
+        """
+        Run steps of the jobs until 'budget' milliseconds have passed,
+        the scheduler's budget by default. At least one step runs so
+        every job finishes eventually. Return the number of steps run.
+        """
+        budget = self.budget if budget is None else budget
+        start = time.perf_counter()
+        steps = 0
+        while self.jobs:
+            job = self.jobs[0]
+            try:
+                next(job.steps)
+            except StopIteration:
+                self.finish(job)
+            except Exception:
+                logging.exception('Job %s failed.', job.key)
+                self.jobs.remove(job)
+                job.failed = True
+            steps += 1
+            if (time.perf_counter() - start) * 1000 >= budget:
+                break
+        return steps
+
+    def finish(self, job):
+        """
+        Remove the finished 'job' and call its callback.
+        A failing callback is logged so the other jobs keep running.
+        """
+        self.jobs.remove(job)
+        job.done = True
+        if job.callback is not None:
+            try:
+                job.callback()
+            except Exception:
+                logging.exception('Callback of job %s failed.', job.key)
+
+    def run_all(self):
+        """Run every job to the end."""
+        while self.jobs:
+            self.run(float('inf'))
+
+
+# The scheduler run by the game loop.
+jobs = Scheduler()
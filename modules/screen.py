@@ -1,23 +1,50 @@
-"""Module for things related to the screen."""
+"""
+Module for things related to the screen.
+The display is opened by 'init' or on first use of 'screen' or 'res'.
+"""
 
 import os
 import logging
 
 import pygame as pg
 
-info = pg.display.Info()
-DEFAULT_RES = info.current_w, info.current_h
+from . import memory
+
 os.environ['SDL_VIDEO_CENTERED'] = 'True'
 
-def set_display(size=DEFAULT_RES, flags=pg.RESIZABLE):
+def default_res():
+    """Return the resolution of the desktop."""
+    if not pg.display.get_init():
+        pg.init()
+    info = pg.display.Info()
+    return info.current_w, info.current_h
+
+def init(size=None, flags=pg.RESIZABLE):
+    """Initialize pygame and open the display unless it's open."""
+    global res, screen
+    if 'screen' not in globals():
+        pg.init()
+        res, screen = set_display(size, flags)
+
+def __getattr__(name):
+    """Open the display on first use of 'screen' or 'res'."""
+    if name in ('screen', 'res'):
+        init()
+        return globals()[name]
+    if name == 'DEFAULT_RES':
+        return default_res()
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+def set_display(size=None, flags=pg.RESIZABLE):
     """
     Return 'size' and a new display surface of 'size' with 'flags'.
     """
-    display = pg.display.set_mode(size, flags)
+    size = size or default_res()
+    display = memory.track(pg.display.set_mode(size, flags), 'screen')
     logging.info('Screen is now at %s resolution.', size)
     return size, display
 
-res, screen = set_display()
 draw_queue = []
 
 def draw_from_queue(queue):
@@ -28,6 +55,7 @@ def draw_from_queue(queue):
     If the queue isn't cleared things might lag.
     Return list of areas that need to be updated.
     """
+    init()
     blit_rects = list()
     queue.sort(key=lambda i: i['layer'])
     while queue:
@@ -42,4 +70,3 @@ def draw_from_queue(queue):
             r = screen.blit(item['surf'], item['pos'], item.get('area'))
             blit_rects.append(r)
     return blit_rects
-
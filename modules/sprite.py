@@ -7,12 +7,39 @@ from itertools import cycle
 
 import pygame as pg
 
+from . import collision
+from . import memory
 from . import screen as sc
 from .path import IMAGE_PATH
 
 class Group(pg.sprite.Group):
     """Class to extend the pygame group class."""
 
+    def __init__(self, *sprites):
+        """Create the broad phase before sprites are added."""
+        self.broad_phase = collision.SweepAndPrune()
+        pg.sprite.Group.__init__(self, *sprites)
+
+    def add_internal(self, sprite, layer=None):
+        """Add 'sprite' to the group and the broad phase."""
+        pg.sprite.Group.add_internal(self, sprite, layer)
+        self.broad_phase.add(sprite)
+
+    def remove_internal(self, sprite):
+        """Remove 'sprite' from the group and the broad phase."""
+        pg.sprite.Group.remove_internal(self, sprite)
+        self.broad_phase.remove(sprite)
+
+    def collide(self):
+        """
+        Push apart the sprites that overlap.
+        Return the areas the pushed sprites covered before and after.
+        """
+        areas = []
+        for first, second in self.broad_phase.pairs():
+            areas.extend(collision.separate(first, second))
+        return areas
+
     def draw_health(self):
         """
         Draw each sprites health above it.
@@ -21,12 +48,15 @@ class Group(pg.sprite.Group):
         for sprite in self.sprites():
             pass
 
-    def draw(self, level_height):
+    def draw(self, level_height, areas=None):
         """
         Draw each sprite to the surf at the correct position.
+        Only sprites over a rect in 'areas' are drawn if it's given.
         """
         screen_height = sc.screen.get_height()
         for sprite in self.sprites():
+            if areas is not None and sprite.rect.collidelist(areas) < 0:
+                continue
             if level_height - sprite.rect.y < screen_height/2:
                 real_y = screen_height - (level_height - sprite.rect.y)
             else:
@@ -35,24 +65,29 @@ class Group(pg.sprite.Group):
                                       pos=(sprite.rect.x, real_y)))
 
 
-main_group = Group()
-
 
 class Sprite(pg.sprite.Sprite):
     """Class to extend the pygame sprite class."""
 
-    def __init__(self, pos, still, moving):
-        """Set instance variables and load sprite frames."""
-        self.groups = [main_group]
-        pg.sprite.Sprite.__init__(self, self.groups)
+    # Solid sprites are pushed apart when they overlap.
+    solid = True
+
+    def __init__(self, pos, still, moving, images=None, groups=()):
+        """
+        Set instance variables and load sprite frames.
+        'images' can be a dict of already loaded frames by file name.
+        """
+        self.images = images or {}
+        pg.sprite.Sprite.__init__(self, *groups)
         self.x_pos, self.y_pos = pos
         self.x_vel, self.y_vel = 0.0, 0.0
         self.steps = 0.0
-        self.max_speed = pg.display.get_surface().get_height() / 240.0
+        self.max_speed = sc.screen.get_height() / 240.0
 
         still = self.load_frames(still)
         moving = self.load_frames(moving)
-        flipped = (pg.transform.flip(frame, True, False) for frame in moving)
+        flipped = (memory.track(pg.transform.flip(frame, True, False),
+                                'sprites') for frame in moving)
         self.frames = {'still' : cycle(still),
                        'moving_right' : cycle(moving),
                        'moving_left' : cycle(flipped),
@@ -61,13 +96,16 @@ class Sprite(pg.sprite.Sprite):
         width = sc.screen.get_width() * 0.04
         height = width * (self.image.get_height() / self.image.get_width())
         self.size = [int(width), int(height)]
-        self.image = pg.transform.scale(self.image, self.size)
+        self.image = memory.track(
+            pg.transform.scale(self.image, self.size), 'sprites')
         self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
         self.state = 'still'
 
     def load_frames(self, frames):
         """Load frames from an iterable of strings."""
-        return [pg.image.load(join(IMAGE_PATH, frame)) for frame in frames]
+        return [memory.track(self.images[frame] if frame in self.images
+                             else pg.image.load(join(IMAGE_PATH, frame)),
+                             'sprites') for frame in frames]
 
     def scale(self, multiplier):
         """Scale sprite by 'multiplier'."""
@@ -76,6 +114,12 @@ class Sprite(pg.sprite.Sprite):
         self.max_speed *= multiplier
         self.size = [int(num * multiplier) for num in self.size]
 
+    def push(self, x, y):
+        """Move sprite by 'x' and 'y' without changing its path."""
+        self.x_pos += x
+        self.y_pos += y
+        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+
     def stop(self):
         """Stop and update sprite."""
         self.steps = 0
@@ -85,7 +129,7 @@ class Sprite(pg.sprite.Sprite):
 
     def move(self, pos, level_height):
         """Move sprite towards 'pos'."""
-        screen_height = pg.display.get_surface().get_height()
+        screen_height = sc.screen.get_height()
         if level_height - self.y_pos < screen_height/2:
             real_y = screen_height - (level_height - self.y_pos)
         else:
@@ -109,8 +153,9 @@ class Sprite(pg.sprite.Sprite):
         if self.frames['time'] >= frame_duration:
             self.frames['time'] -= frame_duration
             self.image = next(self.frames[self.state])
-        if self.image.get_size() != self.size:
-            self.image = pg.transform.scale(self.image, self.size)
+        if self.image.get_size() != tuple(self.size):
+            self.image = memory.track(
+                pg.transform.scale(self.image, self.size), 'sprites')
 
     def update(self, elapsed_time):
         """Update sprite position. Should be called every frame."""
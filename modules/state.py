@@ -1,42 +1,155 @@
 """Module for states."""
 
 import logging
+import multiprocessing
+import os
+import random
+from math import hypot
+from os.path import exists, join
 
 import pygame as pg
 
+from . import ai
+from . import battle
+from . import fog
 from . import level
+from . import particles
+from . import save
+from . import scheduler
 from . import screen as sc
 from .button import Button, ButtonSet
-from .sprite import Sprite, main_group
+from .path import SAVE_PATH
+from .preload import Preloader
+from .sprite import Group, Sprite
 from . import text
+from . import world
 
 
 class State(object):
     """Base class for states."""
 
+    # Set by the game to identify suspended states that can be reused.
+    key = None
+    suspended_res = None
+    # Name of the method called with each event by event type.
+    # Other event types are blocked unless another state handles them.
+    handlers = {}
+    # Input tracked from events so replays don't depend on live input.
+    tracked = (pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.KEYDOWN, pg.KEYUP)
+    mouse_pos = (-1, -1)
+    pressed = set()
+
+    @classmethod
+    def track_input(cls, event):
+        """Update the mouse position and the pressed keys from 'event'."""
+        if event.type in (pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN):
+            State.mouse_pos = tuple(event.pos)
+        elif event.type == pg.KEYDOWN:
+            State.pressed.add(event.key)
+        elif event.type == pg.KEYUP:
+            State.pressed.discard(event.key)
+
     @classmethod
     def change_state(cls, state, args=()):
         """Post event to change state."""
         event = pg.event.Event(pg.USEREVENT, {'state' : state, 'args' : args})
         pg.event.post(event)
 
+    @classmethod
+    def push_state(cls, state, args=()):
+        """Post event to suspend the current state and put 'state' on top."""
+        event = pg.event.Event(
+            pg.USEREVENT, {'state' : state, 'args' : args, 'mode' : 'push'})
+        pg.event.post(event)
+
+    @classmethod
+    def pop_state(cls):
+        """Post event to return to the state below the current one."""
+        event = pg.event.Event(
+            pg.USEREVENT, {'state' : None, 'args' : (), 'mode' : 'pop'})
+        pg.event.post(event)
+
+    def on_event(self, event):
+        """Call the method in 'handlers' for the event type."""
+        handler = self.handlers.get(event.type)
+        if handler is not None:
+            getattr(self, handler)(event)
+
     def exit(self):
         """Called when exiting a state. Can be overridden."""
 
+    def suspend(self):
+        """Called when the state stops being active. Can be overridden."""
+
+    def resume(self):
+        """
+        Called when a suspended state becomes active again.
+        Can be overridden.
+        """
+
+    def release(self):
+        """
+        Free surfaces that can be rebuilt in 'resume'.
+        Called on suspended states under memory pressure.
+        Can be overridden.
+        """
+
+    def surface_bytes(self):
+        """Return how many bytes 'release' would free. Can be overridden."""
+        return 0
+
+    def snapshot(self):
+        """
+        Return a marshallable snapshot for 'restore'.
+        Can be overridden.
+        """
+
+    def restore(self, snapshot):
+        """Restore the state from 'snapshot'. Can be overridden."""
+
+    def reusable(self):
+        """
+        Check if the state can be suspended to be reused later.
+        Can be overridden.
+        """
+        return True
+
 
 class MenuState(State):
     """State for the menu."""
 
+    handlers = {pg.MOUSEBUTTONDOWN : 'on_mouse_down',
+                pg.KEYDOWN : 'on_key_down'}
+    keys = {pg.K_UP : 'up', pg.K_DOWN : 'down', pg.K_LEFT : 'left',
+            pg.K_RIGHT : 'right', pg.K_RETURN : 'return'}
+
     def __init__(self, button_set):
         """Create menu."""
         logging.info('Menu is active')
         sc.draw_queue.append(dict(layer=1, func=sc.screen.fill,
                                   args=((255, 255, 255),)))
         self.button_set = button_set
+        self.loading_progress = None
+        self.start_preload()
+
+    def start_preload(self):
+        """
+        Start preloading a new world unless it's already preloading.
+        The world takes the preloader, so each visit to the menu
+        starts a new one.
+        """
+        if WorldState.preloader is None:
+            WorldState.preload(*WorldState.start_args())
 
     def scale(self, multiplier):
         """Resize the button set and clear the background."""
         self.button_set.scale(multiplier)
+        self.resume()
+
+    def resume(self):
+        """Clear the background so the menu is redrawn and preload."""
+        self.loading_progress = None
+        self.start_preload()
         sc.draw_queue.append(dict(layer=1, func=sc.screen.fill,
                                   args=((255, 255, 255),)))
 
@@ -46,26 +159,52 @@ class MenuState(State):
         Should be called every frame.
         """
         self.button_set.clear()
-        self.button_set.highlight()
+        self.button_set.highlight(self.mouse_pos)
         sc.draw_queue.append(
             dict(layer=25, func=self.button_set.draw, args=(0,)))
+        self.draw_loading_bar()
 
-    def on_event(self, event):
-        """Call function depending on event."""
-        if event.type == pg.MOUSEBUTTONDOWN:
-            self.on_click()
-        elif event.type == pg.KEYDOWN:
-            if pg.key.name(event.key) in ('up', 'down', 'left', 'right'):
-                self.on_arrow_key(pg.key.name(event.key))
-            elif pg.key.name(event.key) == 'return':
-                self.on_return()
+    def draw_loading_bar(self):
+        """
+        Draw the progress of the world preloader if it has changed.
+        The bar is cleared once loading is done.
+        """
+        preloader = WorldState.preloader
+        progress = None
+        if preloader is not None and not preloader.done:
+            progress = preloader.progress
+        if progress == self.loading_progress:
+            return
+        self.loading_progress = progress
+        width, height = sc.screen.get_size()
+        bar_rect = pg.Rect(0, height - height // 100, width, height // 100)
+        sc.draw_queue.append(dict(
+            layer=2, func=pg.draw.rect,
+            args=(sc.screen, (255, 255, 255), bar_rect)))
+        if progress is not None:
+            bar_rect.width = int(width * progress)
+            sc.draw_queue.append(dict(
+                layer=3, func=pg.draw.rect,
+                args=(sc.screen, (0, 0, 255), bar_rect)))
 
-    def on_click(self):
+    def on_mouse_down(self, event):
+        """Activate the button under the mouse."""
+        self.on_click(event.pos)
+
+    def on_key_down(self, event):
+        """Select or activate a button depending on the key."""
+        key_name = self.keys.get(event.key)
+        if key_name == 'return':
+            self.on_return()
+        elif key_name is not None:
+            self.on_arrow_key(key_name)
+
+    def on_click(self, pos):
         """
-        If mouse is above a button activate it.
+        If 'pos' is on a button activate it.
         Should be called from the event loop.
         """
-        self.button_set.press()
+        self.button_set.press(pos)
 
     def on_arrow_key(self, key_name):
         """Select a button depending on which key was pressed."""
@@ -78,8 +217,19 @@ class MenuState(State):
             self.button_set.highlighted_id = 0
 
     def on_return(self):
-        """Press the highlighted button."""
-        self.button_set.highlighted_button.press()
+        """Press the highlighted button or the one under the mouse."""
+        if self.button_set.highlighted_id is None:
+            self.button_set.press(self.mouse_pos)
+        else:
+            self.button_set.highlighted_button.press()
+
+    def snapshot(self):
+        """Return the highlighted button."""
+        return dict(highlighted=self.button_set.highlighted_id)
+
+    def restore(self, snapshot):
+        """Highlight the button from 'snapshot'."""
+        self.button_set.highlighted_id = snapshot['highlighted']
 
     @classmethod
     def create_main_menu(cls):
@@ -89,17 +239,29 @@ class MenuState(State):
         """
         w, h = sc.screen.get_width() / 8, sc.screen.get_height() / 8
         x, y = sc.screen.get_width()/2 - w/2, sc.screen.get_height() / 5
+        buttons = [('START GAME', cls.start_game),
+                   ('FULLSCREEN', cls.fullscreen),
+                   ('EXIT GAME', cls.exit_game)]
+        if (WorldState.autosave_file and exists(WorldState.autosave_file)
+                and save.load(WorldState.autosave_file) is not None):
+            buttons.insert(1, ('CONTINUE', cls.continue_game))
         button_set = ButtonSet([
-            Button(pg.Rect(x, y, w, h), 'START GAME', cls.start_game),
-            Button(pg.Rect(x, y + h*1.5, w, h), 'FULLSCREEN', cls.fullscreen),
-            Button(pg.Rect(x, y + h*3, w, h), 'EXIT GAME', cls.exit_game)])
+            Button(pg.Rect(x, y + h*1.5*n, w, h), text, strategy)
+            for n, (text, strategy) in enumerate(buttons)])
         return button_set
 
     @classmethod
     def start_game(cls):
         """Post an event to change the state."""
-        args = (WorldState.level, WorldState.player_anim,
-                WorldState.pos_1, WorldState.player_image)
+        args = WorldState.start_args()
+        event = pg.event.Event(
+            pg.USEREVENT, {'state' : WorldState, 'args' : args})
+        pg.event.post(event)
+
+    @classmethod
+    def continue_game(cls):
+        """Post an event to load the autosave."""
+        args = WorldState.start_args() + (WorldState.autosave_file,)
         event = pg.event.Event(
             pg.USEREVENT, {'state' : WorldState, 'args' : args})
         pg.event.post(event)
@@ -121,33 +283,333 @@ class WorldState(State):
     """The world state."""
 
     level = 'level_one.tmx'
-    player_anim = ['dude1.png', 'dude2.png', 'dude3.png', 'dude2.png']
+    player_anim = ('dude1.png', 'dude2.png', 'dude3.png', 'dude2.png')
     pos_1 = (100, 100)
-    player_image = ['guy.png']
-
-    def __init__(self, level_name, anim, pos, image):
-        """Set instance variables."""
+    player_image = ('guy.png',)
+    preloader = None
+    autosave_file = join(SAVE_PATH, 'autosave.sav')
+    # Milliseconds between autosaves.
+    autosave_interval = 60000
+    handlers = {pg.MOUSEBUTTONDOWN : 'on_mouse_down'}
+    autosaver = None
+    # Levels behind portals closer than this many tiles are preloaded.
+    preload_distance = 5
+    # Tiles closer to the player than this are revealed from the fog.
+    fog_radius = 3.0
+
+    def __init__(self, level_name, anim, pos, image, save_file=None):
+        """
+        Set instance variables.
+        If 'save_file' is given the world is loaded from it.
+        """
         logging.info('World is active')
-        self.level = level.Level(level_name)
-        self.player = Sprite(pos, image, anim)
+        data = self.take_preloaded(level_name, list(anim) + list(image))
+        self.level_name = level_name
+        self.level = level.Level(level_name, data['level'])
+        self.world = world.levels
+        self.world.keep = {level_name}
+        self.world.add(level_name, self.level)
+        # Tile width the sprites and nodes are scaled for.
+        self.tile_width = self.level.tile_width
+        self.texts = data['text'] or text.TextStore.load()
+        # Node progress of the levels that aren't active.
+        self.node_states = {}
+        # Fog of each level the player has been to by level name.
+        self.fogs = {}
+        self.entered_portal = None
+        # Portal the player waits at until the level behind it is built.
+        self.waiting_portal = None
+        self.sprites = Group()
+        self.player = Sprite(pos, image, anim, data['images'], [self.sprites])
+        self.set_fog()
         self.level.draw(self.scroll)
-        self.nodes = level.NodeGroup.from_level(self.level.level,
-                                                text.Text.from_json())
+        self.load_nodes()
+        self.particles = particles.ParticleSystem.from_level(self.level.level)
         self.nodes.draw(self.scroll)
         self.prev_scroll = self.scroll
         self.real_scroll = 0
         self.actual_scroll = 0
-        main_group.draw(self.level.tile_height * self.level.level.height)
+        self.sprites.draw(self.level.tile_height * self.level.level.height)
         self.redraw = False
+        self.autosave_timer = 0
+        if save_file is not None:
+            data = save.load(save_file)
+            # A new game is started if the save is corrupt.
+            if data is not None:
+                self.load(data)
+
+    def exit(self):
+        """Save and remove the sprites of the world."""
+        self.autosave()
+        self.sprites.empty()
+
+    def node_deltas(self):
+        """
+        Return a list of (id, active, text progress) for each node
+        that differs from the level file.
+        """
+        return [(node.id, node.active,
+                 node.text.progress if node.text else 0)
+                for node in self.nodes
+                if node.active != node.initial_active
+                or (node.text and node.text.progress)]
+
+    def apply_node_deltas(self, deltas):
+        """Restore the nodes from a list returned by 'node_deltas'."""
+        nodes = {node.id : node for node in self.nodes}
+        for node_id, active, progress in deltas:
+            nodes[node_id].active = active
+            nodes[node_id].restore_text(progress)
+
+    def save_data(self):
+        """
+        Return the data for 'save.write'.
+        Only nodes that differ from the level file are included.
+        """
+        return dict(level=self.level_name,
+                    player=(self.player.x_pos / self.level.tile_width,
+                            self.player.y_pos / self.level.tile_height),
+                    nodes=self.node_deltas(),
+                    fog=self.level.fog.to_bytes())
+
+    def load(self, data):
+        """Move the player and restore the nodes and fog from save data."""
+        if data['level'] != self.level_name:
+            self.change_level(data['level'])
+        self.player.stop()
+        self.move_player((data['player'][0] * self.level.tile_width,
+                          data['player'][1] * self.level.tile_height))
+        self.apply_node_deltas(data['nodes'])
+        if data.get('fog') is not None:
+            try:
+                self.level.fog.load_bytes(data['fog'])
+            except ValueError:
+                logging.warning('The saved fog doesn\'t fit %s.',
+                                self.level_name)
+            self.level.relight()
+            self.reveal()
+        self.redraw_all()
+
+    def set_fog(self):
+        """Give the level its fog and reveal the tiles around the player."""
+        level_fog = self.fogs.get(self.level_name)
+        if level_fog is None:
+            level_fog = fog.Fog(self.level.level.width,
+                                self.level.level.height, self.fog_radius)
+            self.fogs[self.level_name] = level_fog
+        self.level.fog = level_fog
+        level_fog.last = None
+        self.level.relight()
+        self.reveal()
+
+    def reveal(self):
+        """
+        Reveal the tiles around the player from the fog.
+        Return the rects of the tiles that were hidden.
+        """
+        tiles = self.level.fog.reveal(
+            (self.player.x_pos / self.level.tile_width,
+             self.player.y_pos / self.level.tile_height))
+        return self.level.reveal(tiles)
+
+    def move_player(self, pos):
+        """Put the player at 'pos' without walking there."""
+        self.player.x_pos, self.player.y_pos = pos
+        self.player.rect.center = pos
+        self.prev_scroll = self.scroll
 
+    def redraw_all(self):
+        """Clear the screen and draw everything again."""
+        sc.draw_queue.append(dict(layer=1, func=sc.screen.fill,
+                                  args=((0, 0, 0),)))
+        self.resume()
+
+    def change_level(self, level_name, target=None):
+        """
+        Make 'level_name' the active level.
+        The player is moved to the object named 'target' if given.
+        """
+        logging.info('Changing level to %s.', level_name)
+        self.node_states[self.level_name] = self.node_deltas()
+        self.level_name = level_name
+        self.world.keep = {level_name}
+        self.level = self.world.get(level_name)
+        self.fit_level()
+        if self.level.tile_width != self.level.target_width():
+            self.rebuild()
+        self.set_fog()
+        self.load_nodes()
+        self.particles = particles.ParticleSystem.from_level(self.level.level)
+        self.apply_node_deltas(self.node_states.pop(level_name, []))
+        # Progress of the other levels is kept in 'node_states'.
+        self.texts.evict(self.nodes.text_names())
+        self.player.stop()
+        for node in [n for n in self.nodes if n.name == target]:
+            self.entered_portal = node
+            self.move_player((node.x_pos, node.y_pos))
+        self.redraw_all()
+
+    def load_nodes(self):
+        """Make the nodes of the level in the scale it's built at."""
+        self.nodes = level.NodeGroup.from_level(self.level.level, self.texts)
+        multiplier = self.level.tile_width / self.level.target_width()
+        if multiplier != 1:
+            for node in self.nodes:
+                node.scale(multiplier)
+
+    def update_world(self):
+        """
+        Preload the levels behind nearby portals and enter a portal the
+        player walks into.
+        """
+        distance = self.preload_distance * self.level.tile_width
+        x, y = self.player.rect.center
+        keep = {self.level_name}
+        for node in [n for n in self.nodes if n.action == 'portal']:
+            keep.add(node.properties['level'])
+            if not node.collides((x, y)):
+                if node is self.entered_portal:
+                    self.entered_portal = None
+                if node is self.waiting_portal:
+                    self.waiting_portal = None
+                if hypot(node.x_pos - x, node.y_pos - y) <= distance:
+                    self.world.preload(node.properties['level'])
+            elif node is not self.entered_portal:
+                self.enter_portal(node)
+                return
+        self.world.keep = keep
+
+    def enter_portal(self, node):
+        """
+        Change to the level behind the portal 'node' once it's built.
+        Until then the player waits at the portal in the current level.
+        """
+        level_name = node.properties['level']
+        if not self.world.ready(level_name):
+            self.world.preload(level_name)
+            self.player.stop()
+            self.waiting_portal = node
+            return
+        self.waiting_portal = None
+        self.change_level(level_name, node.properties.get('target'))
+
+    def autosave(self):
+        """Queue the world to be saved on the autosave thread."""
+        if not self.autosave_file:
+            return
+        if WorldState.autosaver is None:
+            WorldState.autosaver = save.Autosaver(self.autosave_file)
+        WorldState.autosaver.save(self.save_data())
+
+    def suspend(self):
+        """Stop rebuilding the level, 'resume' starts again."""
+        scheduler.jobs.cancel((id(self.level), 'reload'))
+
+    def resume(self):
+        """Rebuild the level if it was released and redraw everything."""
+        if self.level.bg is None:
+            self.level.reload()
+        elif self.level.tile_width != self.level.target_width():
+            self.rebuild()
+        self.fit_level()
+        self.redraw = 3
+        self.nodes.draw(self.scroll)
+        for node in [n for n in self.nodes if n.text and n.text.active]:
+            node.text.draw()
+        self.sprites.draw(self.level.tile_height * self.level.level.height)
+
+    def release(self):
+        """Release the level surfaces."""
+        scheduler.jobs.cancel((id(self.level), 'reload'))
+        self.level.release()
+
+    def surface_bytes(self):
+        """Return the size of the level surfaces."""
+        return self.level.surface_bytes()
+
+    def snapshot(self):
+        """Return the player, scroll, fog and the progress of each node."""
+        p = self.player
+        return dict(
+            player=(p.x_pos, p.y_pos, p.x_vel, p.y_vel, p.steps, p.state,
+                    p.frames['time']),
+            scroll=(self.prev_scroll, self.real_scroll, self.actual_scroll),
+            nodes=[(node.id, node.active,
+                    node.text.progress if node.text else 0)
+                   for node in self.nodes],
+            fog=self.level.fog.to_bytes())
+
+    def restore(self, snapshot):
+        """Restore the player, scroll, fog and nodes from 'snapshot'."""
+        p = self.player
+        (p.x_pos, p.y_pos, p.x_vel, p.y_vel, p.steps, p.state,
+         p.frames['time']) = snapshot['player']
+        p.rect = p.image.get_rect(center=(p.x_pos, p.y_pos))
+        self.prev_scroll, self.real_scroll, self.actual_scroll = (
+            snapshot['scroll'])
+        nodes = {node.id : node for node in self.nodes}
+        for node_id, active, progress in snapshot['nodes']:
+            nodes[node_id].active = active
+            nodes[node_id].restore_text(progress)
+        if snapshot.get('fog') is not None:
+            self.level.fog.load_bytes(snapshot['fog'])
+            self.level.relight()
+
+    @classmethod
+    def start_args(cls):
+        """Return the arguments for starting a new game."""
+        return cls.level, cls.player_anim, cls.pos_1, cls.player_image
+
+    @classmethod
+    def preload(cls, level_name, anim, pos, image):
+        """Start loading the data for a world on a worker thread."""
+        images = list(anim) + list(image)
+        cls.preloader = Preloader(level_name, images).start()
+
+    @classmethod
+    def take_preloaded(cls, level_name, images):
+        """
+        Return the preloaded data for 'level_name' and 'images'.
+        Values are None for anything that wasn't preloaded.
+        """
+        preloader, cls.preloader = cls.preloader, None
+        data = None
+        if preloader is not None and preloader.matches(level_name, images):
+            data = preloader.finish()
+        return data or dict(level=None, images=None, text=None)
 
     def scale(self, multiplier):
-        """Scale things specific to the state."""
-        self.level.reload()
-        for sprite in main_group:
+        """
+        Scale things specific to the state.
+        Everything keeps the old scale until the level is rebuilt, then
+        it's scaled to the level by 'fit_level'.
+        """
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuild the level in the current scale over the next frames with
+        'scheduler.jobs' and redraw everything once it's done.
+        """
+        scheduler.jobs.submit(self.level.reload_steps(), priority=1,
+                              key=(id(self.level), 'reload'),
+                              callback=self.redraw_all)
+
+    def fit_level(self):
+        """Scale the sprites and nodes to the tile width of the level."""
+        multiplier = self.level.tile_width / self.tile_width
+        self.tile_width = self.level.tile_width
+        if multiplier == 1:
+            return
+        for sprite in self.sprites:
             sprite.scale(multiplier)
         self.nodes.scale(multiplier)
-        self.redraw = 3
+        level_width = self.level.tile_width * self.level.level.width
+        if self.level.zoomed:
+            y_pos = int(sc.screen.get_height() * 0.8)
+            for node in [node for node in self.nodes if node.text]:
+                node.text.pos = (level_width/2 - (
+                    node.text.surface.get_width()/2), y_pos)
 
     @property
     def scroll(self):
@@ -159,31 +621,27 @@ class WorldState(State):
             level_height - screen_height))
 
     def zoom(self):
-        """Zoom level and scale things."""
-        old_width = self.level.tile_width
-        self.level.zoomed = pg.key.get_pressed()[pg.K_z]
-        self.level.reload()
-        new_width = self.level.tile_width
-        sc.draw_queue.append(dict(layer=1, func=sc.screen.fill,
-                                  args=((0, 0, 0),)))
-        self.scale(new_width / old_width)
-        level_width = self.level.tile_width * self.level.level.width
-        if self.level.zoomed:
-            y_pos = int(sc.screen.get_height() * 0.8)
-            for node in [node for node in self.nodes if node.text]:
-                node.text.pos = (level_width/2 - (
-                    node.text.surface.get_width()/2), y_pos)
+        """Zoom level, things are scaled once it's rebuilt."""
+        self.level.zoomed = pg.K_z in self.pressed
+        self.rebuild()
 
     def update(self, time):
         """Update the state. Should be called every loop."""
         if self.redraw:
             self.level.draw(self.scroll)
             self.redraw -= 1
-        if pg.key.get_pressed()[pg.K_z] != self.level.zoomed:
+        if (pg.K_z in self.pressed) != self.level.zoomed:
             self.zoom()
+        self.world.update()
+        if self.waiting_portal is not None:
+            self.enter_portal(self.waiting_portal)
         self.update_sprites(time)
         self.update_level(time)
         self.prev_scroll = self.scroll
+        self.autosave_timer += time
+        if self.autosave_timer >= self.autosave_interval:
+            self.autosave_timer = 0
+            self.autosave()
 
     def scroll_level(self):
         """Scroll the level and update the screen."""
@@ -194,18 +652,15 @@ class WorldState(State):
         self.actual_scroll += int(scroll_diff)
         total_scroll = int(scroll_change) + int(scroll_diff)
         if total_scroll != 0:
-            # Surface.scroll has better performance than blit.
+            # The rows that came into view are lit in the level's ring
+            # buffer, the rest of the screen is blitted from it as is.
+            area = pg.Rect((0, self.scroll), sc.screen.get_size())
             sc.draw_queue.append(dict(
-                layer=1, func=sc.screen.scroll, args=(0, -total_scroll),
+                layer=1, func=self.level.blit_frame_area,
+                args=(sc.screen, area, self.scroll),
                 rect=pg.Rect((0, 0), sc.screen.get_size())))
-            if total_scroll > 0:
-                scroll_rect = pg.Rect(
-                    0, self.scroll + sc.screen.get_height() - total_scroll,
-                    sc.screen.get_width(), total_scroll)
-            elif total_scroll < 0:
-                scroll_rect = pg.Rect(
-                    0, self.scroll, sc.screen.get_width(), -total_scroll)
-            self.level.draw_area(scroll_rect, self.scroll)
+            for node in [n for n in self.nodes if n.text and n.text.active]:
+                node.text.draw()
 
     def update_level(self, time):
         """Scroll, animate level and draw nodes and text."""
@@ -215,11 +670,20 @@ class WorldState(State):
 
         # Animate level.
         if not any(node.text.active for node in self.nodes if node.text):
-            if any(
-                    tile['timer'] + time
-                    >= tile['frames'][tile['index']].duration
-                    for tile in self.level.animated_tiles):
-                main_group.draw(
+            self.particles.update(time)
+            areas = self.particles.draw(self.level, self.scroll)
+            if areas:
+                for node in [n for n in self.nodes
+                             if n.active == '1' and n.action != 'portal']:
+                    if pg.Rect(node.x_pos - node.radius,
+                               node.y_pos - node.radius, node.radius * 2,
+                               node.radius * 2).collidelist(areas) >= 0:
+                        node.draw(self.scroll)
+                self.sprites.draw(
+                    self.level.tile_height * self.level.level.height, areas)
+            if self.level.will_animate(time):
+                self.nodes.draw(self.scroll)
+                self.sprites.draw(
                     self.level.tile_height * self.level.level.height)
             self.level.animate(time, self.scroll)
 
@@ -227,24 +691,36 @@ class WorldState(State):
         """Update and draw each sprite."""
         if self.player.x_vel != 0 or self.player.y_vel != 0:
             self.nodes.check(self.player)
+            self.check_battles()
+            self.update_world()
             old_rect = self.player.rect
-            main_group.update(time)
-            clear_rect = old_rect.union(self.player.rect)
-            self.level.draw_area(clear_rect, self.scroll)
-            for node in [n for n in self.nodes
-                         if n.active == '1' or n.active is True]:
-                if self.player.rect.colliderect(
-                        (node.x_pos - node.radius, node.y_pos - node.radius,
-                         node.radius*2, node.radius*2)):
-                    node.draw(self.scroll)
-            main_group.draw(self.level.tile_height * self.level.level.height)
+            self.sprites.update(time)
+            areas = self.sprites.collide()
+            areas.append(old_rect.union(self.player.rect))
+            areas.extend(self.reveal())
+            self.clear_sprites(areas)
+            self.sprites.draw(self.level.tile_height * self.level.level.height)
         else:
-            main_group.update(time)
-
-    def on_event(self, event):
-        """Call function depending on event."""
-        if event.type == pg.MOUSEBUTTONDOWN:
-            self.on_click(event.pos)
+            self.sprites.update(time)
+            areas = self.sprites.collide()
+            if areas:
+                self.clear_sprites(areas)
+                self.sprites.draw(
+                    self.level.tile_height * self.level.level.height, areas)
+
+    def clear_sprites(self, areas):
+        """Draw the level and the nodes under 'areas' sprites moved from."""
+        for area in areas:
+            self.level.draw_area(area, self.scroll)
+        for node in [n for n in self.nodes if n.action != 'portal'
+                     and (n.active == '1' or n.active is True)]:
+            if pg.Rect(node.x_pos - node.radius, node.y_pos - node.radius,
+                       node.radius*2, node.radius*2).collidelist(areas) >= 0:
+                node.draw(self.scroll)
+
+    def on_mouse_down(self, event):
+        """Call 'on_click' with the mouse position."""
+        self.on_click(event.pos)
 
     def on_click(self, pos):
         """Move self.player to 'pos' or update text."""
@@ -261,24 +737,212 @@ class WorldState(State):
                         func=pg.draw.rect,
                         args=(sc.screen, (0, 0, 0), text_rect)))
                     self.level.draw_area(text_rect, self.scroll)
-                    self.level.draw_area(pg.Rect(
-                        node.x_pos - node.radius, node.y_pos - node.radius,
-                        node.radius*2, node.radius*2), self.scroll)
-                    node.active = False
-                    [n for n in self.nodes
-                        if str(n.id) == node.next_node][0].active = '1'
-                    main_group.draw(
+                    self.finish_node(node)
+                    self.sprites.draw(
                         self.level.tile_height * self.level.level.height)
         else:
             self.player.move(
                 pos, self.level.tile_height * self.level.level.height)
 
+    def finish_node(self, node):
+        """Deactivate and clear 'node' and activate the next node."""
+        self.level.draw_area(pg.Rect(
+            node.x_pos - node.radius, node.y_pos - node.radius,
+            node.radius*2, node.radius*2), self.scroll)
+        node.active = False
+        for next_node in [n for n in self.nodes
+                          if str(n.id) == node.next_node]:
+            next_node.active = '1'
+        self.texts.evict(self.nodes.text_names())
+        self.autosave()
+
+    def check_battles(self):
+        """Start a battle if the player reaches an active battle node."""
+        for node in self.nodes:
+            if (node.action == 'battle' and node.active == '1'
+                    and node.collides(self.player.rect.center)):
+                self.player.stop()
+                self.finish_node(node)
+                self.push_state(BattleState, (self.level_name, node.id))
+
+
+class BattleState(State):
+    """
+    State that draws a battle from 'battle.Battle'.
+    The player controls team 0 and the other teams act on their own.
+    """
+
+    enemy_delay = 300
+    handlers = {pg.MOUSEBUTTONDOWN : 'on_mouse_down'}
+    # Milliseconds the AI may think about each action.
+    ai_budget = 200
+    # Processes the AI searches in so it doesn't hold the interpreter
+    # lock of the game. With 0 it searches on a thread of the game.
+    ai_workers = max(1, (os.cpu_count() or 2) - 1)
+    ai_pool = None
+    colors = ((0, 0, 200), (200, 0, 0))
+
+    def __init__(self, level_name, seed):
+        """Create the level and the battle."""
+        logging.info('Battle is active')
+        self.level = level.Level(level_name,
+                                 world.levels.tiled_map(level_name))
+        self.rng = random.Random(seed)
+        height = min(self.level.level.height,
+                     sc.screen.get_height() // self.level.tile_height)
+        width = self.level.level.width
+        self.battle = battle.create_encounter(
+            self.rng, width, height,
+            blocked=self.level.blocked()[:width * height])
+        self.timer = 0
+        self.done = False
+        self.redraw = True
+        self.search = None
+        self.ai_cache = {}
+        self.get_ai_pool()
+
+    @classmethod
+    def get_ai_pool(cls):
+        """
+        Return the AI process pool shared by all battles, or None if
+        'ai_workers' is 0. Processes are spawned since SDL and the level
+        threads don't survive a fork.
+        """
+        if cls.ai_workers and cls.ai_pool is None:
+            cls.ai_pool = multiprocessing.get_context('spawn').Pool(
+                cls.ai_workers)
+        return cls.ai_pool
+
+    @classmethod
+    def close_ai_pool(cls):
+        """Stop the AI processes."""
+        if cls.ai_pool is not None:
+            cls.ai_pool.close()
+            cls.ai_pool.join()
+            cls.ai_pool = None
+
+    def scale(self, multiplier):
+        """Reload the level and redraw the battle."""
+        self.level.reload()
+        self.redraw = True
+
+    def resume(self):
+        """Rebuild the level if it was released and redraw the battle."""
+        if self.level.bg is None:
+            self.level.reload()
+        self.redraw = True
+
+    def reusable(self):
+        """Check if the battle isn't over."""
+        return not self.battle.finished
 
-class BattleState(WorldState):
-    """"""
+    def exit(self):
+        """Release the level."""
+        self.release()
+
+    def release(self):
+        """Release the level surfaces."""
+        self.level.release()
+
+    def surface_bytes(self):
+        """Return the size of the level surfaces."""
+        return self.level.surface_bytes()
+
+    def snapshot(self):
+        """
+        Return the units, turn and random state of the battle.
+        Enemy actions depend on search time so replays can differ.
+        """
+        b = self.battle
+        units = [list(a) for a in (b.team, b.x, b.y, b.hp, b.mp, b.speed)]
+        return dict(units=units, turn=(b.turn, b.round, b.moved, b.cast),
+                    rng=self.rng.getstate(), timer=self.timer)
+
+    def restore(self, snapshot):
+        """Restore the battle from 'snapshot'."""
+        b = self.battle
+        for array, values in zip((b.team, b.x, b.y, b.hp, b.mp, b.speed),
+                                 snapshot['units']):
+            array[:] = type(array)(array.typecode, values)
+        b.turn, b.round, b.moved, b.cast = snapshot['turn']
+        self.rng.setstate(snapshot['rng'])
+        self.timer = snapshot['timer']
+        self.search = None
+        self.redraw = True
+
+    def update(self, time):
+        """Let the enemies act and draw the battle if it has changed."""
+        if self.battle.finished:
+            if not self.done:
+                logging.info('Battle over, winner: %d', self.battle.winner)
+                self.done = True
+                self.pop_state()
+        elif self.battle.active_team != 0:
+            self.timer += time
+            if self.search is None:
+                self.search = ai.AsyncSearch(
+                    self.battle, self.ai_budget, self.rng.random(),
+                    self.get_ai_pool(), self.ai_workers, self.ai_cache)
+            if self.search.done and self.timer >= self.enemy_delay:
+                self.timer = 0
+                self.battle.apply(self.search.action)
+                self.search = None
+                self.redraw = True
+        if self.redraw:
+            self.draw()
+            self.redraw = False
+
+    def draw(self):
+        """Add the level and each living unit to the draw queue."""
+        self.level.draw(0)
+        w, h = self.level.tile_size
+        for unit, team in enumerate(self.battle.team):
+            if self.battle.hp[unit] <= 0:
+                continue
+            x, y = self.battle.x[unit] * w, self.battle.y[unit] * h
+            sc.draw_queue.append(dict(
+                layer=20, func=pg.draw.circle,
+                args=(sc.screen, self.colors[team % len(self.colors)],
+                      (x + w // 2, y + h // 2), w // 3)))
+            hp_rect = pg.Rect(x + w // 6, y, w * self.battle.hp[unit] // 15,
+                              max(1, h // 12))
+            sc.draw_queue.append(dict(
+                layer=21, func=pg.draw.rect,
+                args=(sc.screen, (0, 200, 0), hp_rect)))
+            if unit == self.battle.turn:
+                sc.draw_queue.append(dict(
+                    layer=21, func=pg.draw.rect,
+                    args=(sc.screen, (255, 255, 255),
+                          pg.Rect(x, y, w, h), 2)))
+
+    def on_mouse_down(self, event):
+        """Call 'on_click' with the mouse position."""
+        self.on_click(event.pos)
+
+    def on_click(self, pos):
+        """
+        Cast a spell on the clicked enemy or move to the clicked tile.
+        Clicking the active unit ends its turn.
+        """
+        if self.battle.finished or self.battle.active_team != 0:
+            return
+        tile = (pos[0] // self.level.tile_width,
+                pos[1] // self.level.tile_height)
+        target = self.battle.unit_at(tile)
+        actions = self.battle.legal_actions()
+        if target == self.battle.turn:
+            action = (battle.END,)
+        elif target is not None:
+            spells = [a for a in actions
+                      if a[0] == battle.SPELL and a[2] == target]
+            action = spells[-1] if spells else None
+        elif (battle.MOVE,) + tile in actions:
+            action = (battle.MOVE,) + tile
+        else:
+            action = None
+        if action is not None:
+            self.battle.apply(action)
+            self.redraw = True
 
-    def __init__(self, level_name, anim, pos, image):
-        """"""
-        super(BattleState, self).__init__(level_name, anim, pos, image)
-        text_box = pg.image.load('')
 
+STATES = {state.__name__ : state for state in State.__subclasses__()}
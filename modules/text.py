@@ -1,35 +1,42 @@
-"""Module for text."""
+"""
+Module for text.
 
+The dialogue of 'text.json' is kept in a 'TextStore'. The file is decoded
+once, and an entry only becomes a 'Text' the first time a node shows it,
+so startup doesn't grow with the script.
+"""
+
+import json
 import logging
-from json import load
 from math import hypot
 from os.path import join
 
 import pygame as pg
-pg.init()
 
+from . import memory
+from . import screen as sc
 from .path import IMAGE_PATH, TEXT_PATH
 from .screen import draw_queue
 from .button import ButtonSet
 
-text_box = pg.image.load(join(IMAGE_PATH, 'textbox.png'))
-
 
 class Text(object):
     """Class for a text pop-up."""
 
+    box_image = None
+
     @classmethod
-    def from_json(cls):
-        """Return a dict of text objects based on a json file."""
-        with open(join(TEXT_PATH, 'text.json')) as text:
-            text_dict = load(text)
-        return {
-            k : Text(v) for k, v in zip(text_dict.keys(), text_dict.values())}
+    def text_box(cls):
+        """Return the text box image, loading it on first use."""
+        if cls.box_image is None:
+            cls.box_image = memory.track(
+                pg.image.load(join(IMAGE_PATH, 'textbox.png')), 'text')
+        return cls.box_image
 
     def __init__(self, text, buttons=ButtonSet([])):
         """Initialize instance variables."""
         self.buttons = buttons
-        screen_width, screen_height = pg.display.get_surface().get_size()
+        screen_width, screen_height = sc.screen.get_size()
         self.surf_size = (int(screen_width * 0.6), int(screen_height * 0.15))
         self.pos = (int((screen_width - self.surf_size[0]) / 2),
                     int(screen_height * 0.8))
@@ -40,12 +47,13 @@ class Text(object):
 
     def scale(self, multiplier):
         """Scale buttons, font, rect and surface to the correct size."""
-        screen_width, screen_height = pg.display.get_surface().get_size()
+        screen_width, screen_height = sc.screen.get_size()
         self.surf_size = (int(self.surf_size[0] * multiplier),
                           int(self.surf_size[1] * multiplier))
         self.pos = (int(self.pos[0] * multiplier),
                     int(screen_height * 0.8))
-        self.surface = pg.transform.scale(text_box, self.surf_size)
+        self.surface = memory.track(
+            pg.transform.scale(self.text_box(), self.surf_size), 'text')
         self.rect = pg.Rect(
             self.pos, (self.surf_size[0], self.surf_size[1] + 1))
         font_size = int(max(self.rect.width / 20, self.rect.height / 5))
@@ -54,6 +62,7 @@ class Text(object):
 
     def next(self):
         """Update text surface with new text if any is available."""
+        self.progress += 1
         if self.lines and not self.active:
             self.active = True
         if not self.lines:
@@ -74,6 +83,7 @@ class Text(object):
     def split_lines(self):
         """Split lines so that they fit inside the text box."""
         self.lines = []
+        self.progress = 0
         line = ''
         for word in self.text.split():
             if (self.font.size(line + word + ' ')[0]
@@ -84,8 +94,65 @@ class Text(object):
                 line = word + ' '
         self.lines.append(line)
 
+    def restore(self, progress):
+        """Show the text as it was after 'progress' calls to 'next'."""
+        self.active = False
+        self.split_lines()
+        for _ in range(progress):
+            self.next()
+
     def draw(self):
         """Add surface to the draw queue."""
         draw_queue.append(
             dict(layer=5, surf=self.surface, pos=self.rect.topleft))
 
+
+
+class TextStore(object):
+    """
+    Dialogue by key, read from a json object.
+    'texts' holds the Text objects made so far.
+    """
+
+    @classmethod
+    def load(cls, filename=None):
+        """Return a store of the text json file. No display is needed."""
+        if filename is None:
+            filename = join(TEXT_PATH, 'text.json')
+        with open(filename, encoding='utf-8') as text_file:
+            return cls(text_file.read())
+
+    def __init__(self, raw):
+        """
+        Set instance variables and decode 'raw', a json object.
+        Raise ValueError if 'raw' isn't a json object.
+        """
+        self.entries = json.loads(raw)
+        if not isinstance(self.entries, dict):
+            raise ValueError('Text file is not an object.')
+        self.texts = {}
+
+    def __contains__(self, key):
+        """Check if there is an entry for 'key'."""
+        return key in self.entries
+
+    def entry(self, key):
+        """Return the entry for 'key'."""
+        return self.entries[key]
+
+    def get(self, key):
+        """Return the Text of 'key', making it on first use."""
+        text = self.texts.get(key)
+        if text is None:
+            text = self.texts[key] = Text(self.entry(key))
+        return text
+
+    def evict(self, keys):
+        """Forget the texts whose key isn't in 'keys'."""
+        for key in [key for key in self.texts if key not in keys]:
+            del self.texts[key]
+
+    def scale(self, multiplier):
+        """Scale the texts made so far."""
+        for text in self.texts.values():
+            text.scale(multiplier)
@@ -0,0 +1,68 @@
+"""
+Module for the ring buffer of the level rows around the screen.
+
+Only the rows of the lit level that can be on screen are kept, in a
+surface of the screen's height where level row y is at row y % height.
+Moving the viewport only renders the rows that came into view, the rest
+stay where they are. An area of the level is blitted from the buffer in
+at most two parts, split where the rows wrap around.
+"""
+
+import pygame as pg
+
+from . import memory
+
+
+class Viewport(object):
+    """Rows 'top' to 'top' + height of the level in a ring buffer."""
+
+    def __init__(self, size, like):
+        """Create a buffer of 'size' in the pixel format of 'like'."""
+        self.surface = memory.track(pg.Surface(size, 0, like), 'level')
+        self.width, self.height = size
+        self.top = None
+
+    def rect(self):
+        """Return the area of the level that is held."""
+        if self.top is None:
+            return pg.Rect(0, 0, 0, 0)
+        return pg.Rect(0, self.top, self.width, self.height)
+
+    def move(self, top):
+        """
+        Hold the rows from 'top' on.
+        Return the areas of the level that came into view.
+        """
+        if top == self.top:
+            return []
+        old, self.top = self.top, top
+        if old is None or abs(top - old) >= self.height:
+            return [self.rect()]
+        if top > old:
+            return [pg.Rect(0, old + self.height, self.width, top - old)]
+        return [pg.Rect(0, top, self.width, old - top)]
+
+    def parts(self, area):
+        """
+        Return a list of (level rect, buffer rect) for the held part of
+        'area', split where the rows wrap around.
+        """
+        area = area.clip(self.rect())
+        if not area:
+            return []
+        y = area.top % self.height
+        first = min(area.height, self.height - y)
+        parts = [(pg.Rect(area.x, area.y, area.width, first),
+                  pg.Rect(area.x, y, area.width, first))]
+        if first < area.height:
+            rest = area.height - first
+            parts.append((pg.Rect(area.x, area.y + first, area.width, rest),
+                          pg.Rect(area.x, 0, area.width, rest)))
+        return parts
+
+    def blit_to(self, surface, area, pos):
+        """Blit the held part of 'area' of the level to 'pos' on 'surface'."""
+        x, y = pos[0] - area.x, pos[1] - area.y
+        for level_rect, rect in self.parts(area):
+            surface.blit(self.surface, (level_rect.x + x, level_rect.y + y),
+                         rect)
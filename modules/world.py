@@ -0,0 +1,153 @@
+"""
+Module for worlds made of several levels.
+
+Levels are linked by portal objects in the TMX files. A portal object
+has the properties 'action' set to 'portal', 'level' set to the TMX file
+it leads to and optionally 'target' set to the name of the object in
+that level where the player appears.
+"""
+
+import logging
+from collections import OrderedDict
+
+from . import level
+from . import scheduler
+from .preload import Preloader
+
+
+class LevelBuilder(object):
+    """
+    Load a level on a worker thread, then build its surfaces on the main
+    thread a step at a time with 'scheduler.jobs'.
+    """
+
+    def __init__(self, level_name):
+        """Set instance variables and create the preloader."""
+        self.level_name = level_name
+        self.preloader = Preloader(level_name, [])
+        self.level = None
+        self.job = None
+
+    @property
+    def done(self):
+        """Return True if the level is built or building it failed."""
+        if self.job is None:
+            return self.preloader.error is not None
+        return self.job.done or self.job.failed or self.job.cancelled
+
+    def start(self):
+        """Start the worker thread and return self."""
+        self.preloader.start()
+        return self
+
+    def update(self):
+        """Start building the level once it's loaded."""
+        if self.job is not None or not self.preloader.done:
+            return
+        data = self.preloader.finish()
+        if data is not None:
+            self.level = level.Level(self.level_name, data['level'],
+                                     build=False)
+            self.job = scheduler.jobs.submit(
+                self.level.reload_steps(), priority=-1,
+                key=(self.level_name, 'build'))
+
+    def finish(self):
+        """Build the rest of the level now and return it or None."""
+        self.preloader.finish()
+        self.update()
+        if self.job is None or self.job.failed:
+            return None
+        if not self.job.done:
+            scheduler.jobs.cancel(self.job.key)
+            self.level.reload()
+        return self.level
+
+
+class World(object):
+    """
+    Cache of loaded levels.
+    Levels are built by 'LevelBuilder' and the least recently used
+    levels are unloaded when over 'budget' bytes.
+    """
+
+    def __init__(self, budget=512 * 1024 ** 2):
+        """Set instance variables."""
+        self.budget = budget
+        self.levels = OrderedDict()
+        self.builders = {}
+        self.keep = set()
+
+    def add(self, level_name, new_level):
+        """Add a loaded level as the most recently used one."""
+        self.levels[level_name] = new_level
+        self.levels.move_to_end(level_name)
+        self.trim()
+
+    def get(self, level_name):
+        """
+        Return the level 'level_name' in the scale it was built at.
+        Levels that aren't built are built now, so this only returns
+        without blocking if 'ready' is True.
+        """
+        self.keep.add(level_name)
+        if level_name not in self.levels:
+            builder = self.builders.pop(level_name, None)
+            new_level = builder.finish() if builder is not None else None
+            if new_level is None:
+                logging.info('Loading %s without preloading.', level_name)
+                new_level = level.Level(level_name)
+            self.add(level_name, new_level)
+        new_level = self.levels[level_name]
+        self.levels.move_to_end(level_name)
+        if new_level.bg is None:
+            new_level.reload()
+        return new_level
+
+    def tiled_map(self, level_name):
+        """
+        Return a copy of the parsed TMX of 'level_name' with its source
+        images for another Level, or None if the level isn't cached.
+        """
+        cached = self.levels.get(level_name)
+        if cached is None:
+            return None
+        # copy.copy doesn't work with the __getattr__ of pytmx objects.
+        tiled_map = object.__new__(type(cached.level))
+        tiled_map.__dict__.update(cached.level.__dict__)
+        tiled_map.images = list(cached.source_images)
+        return tiled_map
+
+    def ready(self, level_name):
+        """Check if 'level_name' is built."""
+        return level_name in self.levels
+
+    def preload(self, level_name):
+        """Start building 'level_name' unless it's loaded or building."""
+        if level_name not in self.levels and level_name not in self.builders:
+            logging.info('Preloading %s.', level_name)
+            self.builders[level_name] = LevelBuilder(level_name).start()
+
+    def update(self):
+        """Build the loaded levels and add the ones that are built."""
+        for level_name, builder in list(self.builders.items()):
+            builder.update()
+            if builder.done:
+                del self.builders[level_name]
+                if builder.job is not None and builder.job.done:
+                    self.add(level_name, builder.level)
+
+    def trim(self):
+        """Unload the least recently used levels not in 'keep'."""
+        total = sum(lvl.surface_bytes() for lvl in self.levels.values())
+        for level_name in list(self.levels):
+            if total <= self.budget:
+                break
+            if level_name in self.keep or len(self.levels) == 1:
+                continue
+            logging.info('Unloading %s.', level_name)
+            total -= self.levels.pop(level_name).surface_bytes()
+
+
+# The levels of the running game, shared by the states that show them.
+levels = World()
@@ -1,12 +1,135 @@
 """Script to run the game."""
 
-import pygame as pg
+import argparse
+import builtins
+import importlib.util
+import sys
+import time
 
-pg.init()
 
-from modules.game import Game
+class ImportTimer(object):
+    """
+    Record how long each new module takes to import, like
+    'python -X importtime' but only inside the 'with' block.
+    """
 
-if __name__ == '__main__':
-    Game.main_loop()
+    def __init__(self):
+        """Set instance variables."""
+        self.imports = []
+        self.depth = 0
+        self.original = None
+
+    def __enter__(self):
+        """Start timing imports."""
+        self.original = builtins.__import__
+        builtins.__import__ = self.timed_import
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop timing imports."""
+        builtins.__import__ = self.original
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(),
+                     level=0):
+        """Import 'name' and record the time if it's a new module."""
+        if level:
+            package = globals['__package__']
+            name = importlib.util.resolve_name(
+                '.' * level + name, package) if name else package
+        new = [name] if name not in sys.modules else [
+            '{}.{}'.format(name, item) for item in fromlist or ()
+            if not hasattr(sys.modules[name], item)]
+        if not new:
+            return self.original(name, globals, locals, fromlist, 0)
+        entry = [', '.join(new), self.depth, 0.0, 0.0]
+        self.imports.append(entry)
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            return self.original(name, globals, locals, fromlist, 0)
+        finally:
+            self.depth -= 1
+            entry[3] = time.perf_counter() - start
+
+    def report(self, threshold=0.001):
+        """Return the imports slower than 'threshold' seconds as lines."""
+        for num, entry in enumerate(self.imports):
+            children = 0.0
+            for child in self.imports[num + 1:]:
+                if child[1] <= entry[1]:
+                    break
+                if child[1] == entry[1] + 1:
+                    children += child[3]
+            entry[2] = entry[3] - children
+        lines = ['import time: self [us] | cumulative | imported package']
+        lines.extend('import time: {:>9.0f} | {:>10.0f} | {}{}'.format(
+            self_time * 1e6, total * 1e6, '  ' * depth, name)
+                     for name, depth, self_time, total in self.imports
+                     if total >= threshold)
+        return lines
 
 
+def memory_budget(value):
+    """Return a 'SUBSYSTEM=MIB' argument as (subsystem, bytes)."""
+    subsystem, sep, mib = value.partition('=')
+    try:
+        size = float(mib)
+    except ValueError:
+        size = -1
+    if not sep or not subsystem or not size >= 0:
+        raise argparse.ArgumentTypeError(
+            "expected SUBSYSTEM=MIB, got '{}'".format(value))
+    return subsystem, size * 1024 ** 2
+
+
+def parse_args():
+    """Return the command line arguments."""
+    parser = argparse.ArgumentParser(description='Run the game.')
+    parser.add_argument('--record', metavar='JOURNAL',
+                        help='record input to a journal file')
+    parser.add_argument('--replay', metavar='JOURNAL',
+                        help='replay input from a journal file')
+    parser.add_argument('--realtime', action='store_true',
+                        help='replay at the recorded speed')
+    parser.add_argument('--seek', type=int, default=0, metavar='FRAME',
+                        help='start the replay from this frame')
+    parser.add_argument('--capture', metavar='PATH',
+                        help='capture frames to a folder or raw video')
+    parser.add_argument('--capture-format', choices=('png', 'raw'),
+                        default='png', help='format of captured frames')
+    parser.add_argument('--memory-budget', action='append', default=[],
+                        type=memory_budget,
+                        metavar='SUBSYSTEM=MIB',
+                        help='warn when the surfaces of a subsystem or the '
+                        'total use more memory')
+    parser.add_argument('--startup-report', action='store_true',
+                        help='print the time spent importing and starting')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    start = time.perf_counter()
+    with ImportTimer() as timer:
+        from modules import memory
+        from modules import screen as sc
+        from modules.game import Game
+    imported = time.perf_counter()
+    memory.budgets.update(args.memory_budget)
+    sc.init()
+    displayed = time.perf_counter()
+    Game.init()
+    started = time.perf_counter()
+    if args.startup_report:
+        print('\n'.join(timer.report()))
+        for phase, spent in (('imports', imported - start),
+                             ('display', displayed - imported),
+                             ('first state', started - displayed)):
+            print('{:<12} {:8.1f} ms'.format(phase, spent * 1000))
+    if args.replay:
+        Game.start_replay(args.replay, args.realtime, args.seek)
+    elif args.record:
+        Game.start_recording(args.record)
+    if args.capture:
+        Game.start_capture(args.capture, args.capture_format)
+    Game.main_loop()
@@ -0,0 +1,76 @@
+"""For tests related to 'ai.py'."""
+
+import os.path
+import sys
+import unittest
+import unittest.mock
+from multiprocessing import Pool
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.ai as ai
+import modules.battle as battle
+
+
+class TestSearch(unittest.TestCase):
+    """Tests for the tree search."""
+
+    def setUp(self):
+        """Create a battle where team 0 can win with one spell."""
+        self.battle = battle.Battle(6, 6)
+        self.battle.add_unit(0, (0, 0))
+        self.battle.add_unit(1, (3, 0), hp=3)
+
+    def test_best_action(self):
+        """Assert the search finds a spell on the weak unit."""
+        cache = {}
+        action, playouts = ai.best_action(self.battle, 200, 0, cache=cache)
+        self.assertEqual(action, (battle.SPELL, 1, 1))
+        self.assertGreater(playouts, 0)
+        self.assertGreater(len(cache), 0)
+
+    def test_root_parallel(self):
+        """Assert visit counts from each worker are combined."""
+        pool = Pool(2)
+        try:
+            action, playouts = ai.best_action(self.battle, 20, 0, pool, 2)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertIn(action, self.battle.legal_actions())
+
+    def test_async_search(self):
+        """Assert the search doesn't change the battle it was given."""
+        key = self.battle.key()
+        search = ai.AsyncSearch(self.battle, 5, 0)
+        search.thread.join()
+        self.assertTrue(search.done)
+        self.assertEqual(self.battle.key(), key)
+
+    def test_async_search_error(self):
+        """Assert a failed search ends the turn."""
+        with unittest.mock.patch.object(ai, 'best_action',
+                                        side_effect=ValueError):
+            search = ai.AsyncSearch(self.battle, 5, 0)
+            search.thread.join()
+        self.assertEqual(search.action, (battle.END,))
+
+    def test_cache(self):
+        """Assert cached positions keep rollout totals per round."""
+        cache = {}
+        ai.search(self.battle, 50, 0, cache)
+        visits, totals = cache[next(iter(cache))]
+        self.assertLessEqual(visits, ai.CACHE_SAMPLES)
+        self.assertSetEqual(set(totals), {0, 1})
+        later = self.battle.copy()
+        later.round += 1
+        self.assertNotEqual(later.key(), self.battle.key())
+
+    def test_evaluate(self):
+        """Assert scores are split by remaining health."""
+        scores = ai.evaluate(self.battle)
+        self.assertAlmostEqual(scores[0] + scores[1], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
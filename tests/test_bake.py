@@ -0,0 +1,86 @@
+"""For tests related to 'bake.py'."""
+
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from pytmx import TiledMap
+from modules import bake
+from modules import screen as sc
+from modules.path import LEVEL_PATH
+
+
+class TestBake(unittest.TestCase):
+    """Tests for baking and loading scaled images."""
+
+    def setUp(self):
+        """Bake the images at one size to a temporary folder."""
+        sc.init()
+        self.folder = tempfile.mkdtemp()
+        self.count = bake.bake([30], self.folder, processes=1)
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        shutil.rmtree(self.folder)
+
+    def test_incremental(self):
+        """Assert only missing sizes are baked again."""
+        self.assertGreater(self.count, 0)
+        self.assertEqual(bake.bake([30], self.folder, processes=1), 0)
+        self.assertEqual(bake.bake([30, 45], self.folder, processes=1),
+                         self.count)
+        manifest = bake.load_manifest(self.folder)
+        for entry in manifest['files'].values():
+            self.assertListEqual(entry['sizes'], [30, 45])
+
+    def test_stale(self):
+        """Assert baked images are ignored once the source changes."""
+        manifest = bake.load_manifest(self.folder)
+        name = next(iter(manifest['files']))
+        filename = os.path.join(path, name)
+        self.assertIsNotNone(
+            bake.baked_file(filename, 30, manifest, self.folder))
+        manifest['files'][name]['sha1'] = '0' * 40
+        self.assertIsNone(bake.baked_file(filename, 30, manifest, self.folder))
+
+    def test_image_loader(self):
+        """Assert a level loaded with the baked images has scaled tiles."""
+        self.assertIsNone(bake.image_loader(31, folder=self.folder))
+        loader = bake.image_loader(30, folder=self.folder)
+        tiled_map = TiledMap(os.path.join(LEVEL_PATH, 'level_one.tmx'),
+                             image_loader=loader)
+        images = [image for image in tiled_map.images if image is not None]
+        self.assertTrue(images)
+        for image in images:
+            self.assertEqual(image.get_width(), 30)
+
+    def test_nearest(self):
+        """Assert smaller sizes are scaled down from the nearest bake."""
+        manifest = bake.load_manifest(self.folder)
+        name = next(iter(manifest['files']))
+        filename = os.path.join(path, name)
+        self.assertEqual(
+            bake.baked_file(filename, 20, manifest, self.folder)[1], 30)
+        loader = bake.image_loader(20, folder=self.folder)
+        tiled_map = TiledMap(os.path.join(LEVEL_PATH, 'level_one.tmx'),
+                             image_loader=loader)
+        for image in [image for image in tiled_map.images if image]:
+            self.assertEqual(image.get_width(), 20)
+
+    def test_sources(self):
+        """Assert only images used by the levels are baked."""
+        names = [os.path.basename(name) for name in bake.find_sources()]
+        self.assertIn('grass.png', names)
+        self.assertNotIn('textbox.png', names)
+
+
+if __name__ == '__main__':
+    unittest.main()
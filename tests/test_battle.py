@@ -0,0 +1,88 @@
+"""For tests related to 'battle.py'."""
+
+import os.path
+import random
+import sys
+import unittest
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.battle as battle
+
+
+class TestBattle(unittest.TestCase):
+    """Tests for 'Battle'."""
+
+    def setUp(self):
+        """Create a small battle with one unit per team."""
+        self.battle = battle.Battle(5, 5)
+        self.battle.add_unit(0, (0, 0), speed=2)
+        self.battle.add_unit(1, (1, 0), hp=2)
+
+    def test_reachable(self):
+        """Assert units can't move through other units or too far."""
+        reachable = self.battle.reachable(0)
+        self.assertNotIn((1, 0), reachable)
+        self.assertIn((0, 2), reachable)
+        self.assertNotIn((0, 3), reachable)
+
+    def test_spell(self):
+        """Assert a spell damages the target and ends the battle."""
+        action = (battle.SPELL, 0, 1)
+        self.assertIn(action, self.battle.legal_actions())
+        self.battle.apply(action)
+        self.assertEqual(self.battle.hp[1], 0)
+        self.assertEqual(self.battle.winner, 0)
+
+    def test_end_turn(self):
+        """Assert the turn passes to the next unit."""
+        self.battle.apply((battle.END,))
+        self.assertEqual(self.battle.active_team, 1)
+        self.battle.apply((battle.END,))
+        self.assertEqual(self.battle.round, 1)
+
+    def test_blocked(self):
+        """Assert units can't move onto or be placed on blocked tiles."""
+        self.battle.blocked[2 * 5 + 0] = 1
+        self.assertNotIn((0, 2), self.battle.reachable(0))
+        blocked = bytearray([1, 1, 0, 1] * 4)
+        encounter = battle.create_encounter(random.Random(0), 4, 4, (2, 2),
+                                            blocked)
+        self.assertEqual(len(encounter.team), 4)
+        for x, y in zip(encounter.x, encounter.y):
+            self.assertFalse(blocked[y * 4 + x])
+
+    def test_copy(self):
+        """Assert copies don't share unit data."""
+        copy = self.battle.copy()
+        copy.apply((battle.MOVE, 0, 1))
+        self.assertEqual(self.battle.y[0], 0)
+        self.assertNotEqual(copy.key(), self.battle.key())
+
+    def test_key(self):
+        """Assert positions that differ in team or speed differ in key."""
+        for name in ('team', 'speed'):
+            copy = self.battle.copy()
+            getattr(copy, name)[0] += 1
+            self.assertNotEqual(copy.key(), self.battle.key())
+
+
+class TestBatch(unittest.TestCase):
+    """Tests for simulating battles."""
+
+    def test_play_random(self):
+        """Assert random battles always finish."""
+        rng = random.Random(1)
+        encounter = battle.create_encounter(rng)
+        self.assertIsNotNone(battle.play_random(encounter, rng))
+
+    def test_run_batch(self):
+        """Assert results are the same in a process pool."""
+        encounter = dict(width=6, height=4, units=(2, 2))
+        serial = battle.run_batch(range(8), encounter, processes=1)
+        parallel = battle.run_batch(range(8), encounter, processes=2)
+        self.assertListEqual(serial, parallel)
+
+
+if __name__ == '__main__':
+    unittest.main()
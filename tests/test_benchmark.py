@@ -0,0 +1,249 @@
+"""
+Benchmarks for the paths that run every frame or on every resize.
+
+By default each benchmark only runs once so the suite keeps working.
+Set the environment variable BENCHMARK to time them:
+
+    BENCHMARK=record python -m pytest tests/test_benchmark.py
+        stores the current results as the baseline of this machine.
+    BENCHMARK=check python -m pytest tests/test_benchmark.py
+        fails when a benchmark is slower or allocates more than its
+        baseline plus BENCHMARK_MARGIN, a fraction that defaults to 0.25.
+
+Times are the best of several runs in milliseconds per call, divided
+by the time of a calibration loop measured in the same run, so a
+machine that is busy or clocked down doesn't count as a regression.
+Memory is the peak of Python allocations measured by tracemalloc, so
+pixel data allocated by SDL isn't counted.
+
+Timings only mean something on the machine they were recorded on, so
+baselines are kept out of the repository in 'benchmark_baseline.json'
+and are keyed by machine. Record one before the first check, benchmarks
+without a baseline for this machine are skipped.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.screen as sc
+from modules.button import Button
+from modules.level import Level, Node, NodeGroup
+from modules.sprite import Group, Sprite
+from modules.text import Text
+
+BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        'benchmark_baseline.json')
+MACHINE = '{} {} {} Python {}'.format(
+    platform.node(), platform.system(), platform.machine(),
+    platform.python_version())
+MODE = os.environ.get('BENCHMARK', '')
+MARGIN = float(os.environ.get('BENCHMARK_MARGIN', 0.25))
+# Timings only compare at the same resolution.
+RES = (1280, 720)
+# Differences smaller than these are never counted as a regression.
+TIME_SLACK = 0.02
+MEMORY_SLACK = 4096
+LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua. ') * 8
+
+
+def measure(func, number, repeat=5):
+    """
+    Return the best milliseconds per call of 'func' out of 'repeat'
+    runs of 'number' calls and the peak bytes allocated by one call.
+    """
+    func()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best * 1000, peak
+
+
+def calibrate():
+    """Run a fixed mix of Python code and blits."""
+    surf = pg.Surface((64, 64))
+    target = pg.Surface((256, 256))
+    total = 0
+    for n in range(200):
+        total += sum(range(n))
+        target.blit(surf, (n % 192, n % 160))
+    return total
+
+
+class TestBenchmark(unittest.TestCase):
+    """Time and memory budgets of the code run every frame."""
+
+    results = {}
+    calibration = 1.0
+
+    @classmethod
+    def setUpClass(cls):
+        """Use the benchmark resolution when timing."""
+        sc.init()
+        if MODE and sc.screen.get_size() != RES:
+            sc.res, sc.screen = sc.set_display(RES)
+        if MODE:
+            cls.calibration = measure(calibrate, 50, 10)[0]
+
+    @staticmethod
+    def load_baselines():
+        """Return the baselines of every machine by machine."""
+        if not os.path.exists(BASELINE):
+            return {}
+        with open(BASELINE) as baseline_file:
+            return json.load(baseline_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Write the baseline of this machine in record mode."""
+        if MODE == 'record' and cls.results:
+            baseline = cls.load_baselines()
+            baseline.setdefault(MACHINE, {}).update(cls.results)
+            with open(BASELINE, 'w') as baseline_file:
+                json.dump(baseline, baseline_file, indent=1, sort_keys=True)
+                baseline_file.write('\n')
+
+    def check(self, name, func, number):
+        """Run the benchmark 'name' in the current mode."""
+        if not MODE:
+            func()
+            return
+        ms, peak = measure(func, number)
+        ratio = ms / self.calibration
+        print('\n{}: {:.3f} ms, {:.2f} calibrations, {:.1f} KiB'.format(
+            name, ms, ratio, peak / 1024.0))
+        if MODE == 'record':
+            self.results[name] = {'ratio' : round(ratio, 4), 'peak' : peak}
+            return
+        baseline = self.load_baselines().get(MACHINE, {}).get(name)
+        if baseline is None:
+            self.skipTest('{} has no baseline on {}.'.format(name, MACHINE))
+        self.assertLessEqual(
+            ratio, baseline['ratio'] * (1 + MARGIN)
+            + TIME_SLACK / self.calibration,
+            '{} took {:.2f} calibrations, the baseline is {:.2f}.'.format(
+                name, ratio, baseline['ratio']))
+        self.assertLessEqual(
+            peak, baseline['peak'] * (1 + MARGIN) + MEMORY_SLACK,
+            '{} allocated {} bytes, the baseline is {} bytes.'.format(
+                name, peak, baseline['peak']))
+
+    def test_draw_from_queue(self):
+        """Draw 500 blits and function calls."""
+        surf = pg.Surface((32, 32))
+
+        def draw():
+            for n in range(500):
+                sc.draw_queue.append(dict(layer=n % 4, surf=surf,
+                                          pos=(n % 40 * 32, n // 40 * 32)))
+                sc.draw_queue.append(dict(
+                    layer=n % 4, func=pg.draw.circle,
+                    args=(sc.screen, (0, 0, 180), (n, n), 10)))
+            sc.draw_from_queue(sc.draw_queue)
+
+        self.check('draw_from_queue', draw, 20)
+
+    def test_level_reload(self):
+        """Reload the level at the screen size."""
+        level = Level(os.path.join(path, 'levels', 'level_one.tmx'))
+        self.check('level_reload', level.reload, 2)
+
+    def test_level_animate(self):
+        """Animate every tile and the light flicker at night."""
+        level = Level(os.path.join(path, 'levels', 'level_one.tmx'))
+        level.lighting.hour = 22.0
+        level.lighting.day_length = float('inf')
+        level.lighting.ambient = level.lighting.ambient_color()
+        level.relight()
+        elapsed = max(tile['frames'][tile['index']].duration
+                      for tile in level.animated_tiles)
+
+        def animate():
+            level.animate(elapsed, 0)
+            del sc.draw_queue[:]
+
+        self.check('level_animate', animate, 20)
+
+    def test_node_group_check(self):
+        """Check 200 nodes, one of them with text."""
+        text = Text(LOREM)
+        nodes = [Node(20, (n * 37 % 1200, n * 53 % 2000), str(n), n, {})
+                 for n in range(199)]
+        nodes.append(Node(20, (640, 360), 'text', 199, {}, text))
+        group = NodeGroup(nodes)
+        player = Sprite((640, 360), ['guy.png'], ['dude1.png'])
+
+        def check():
+            text.restore(0)
+            group.check(player)
+            del sc.draw_queue[:]
+
+        self.check('node_group_check', check, 50)
+
+    def test_text(self):
+        """Split a long text and show every page of it."""
+        text = Text(LOREM)
+
+        def show():
+            text.split_lines()
+            while text.lines:
+                text.next()
+
+        self.check('text', show, 20)
+
+    def test_button_render(self):
+        """Render a button."""
+        button = Button(pg.Rect(100, 100, 300, 80), 'Continue', None)
+        self.check('button_render', button.render, 200)
+
+    def test_sprite_update(self):
+        """Move 100 sprites and update them for a frame."""
+        images = {}
+        sprites = [Sprite((n * 12, n * 7), ['guy.png'],
+                          ['dude1.png', 'dude2.png', 'dude3.png', 'dude2.png'],
+                          images) for n in range(100)]
+
+        def update():
+            for sprite in sprites:
+                sprite.move((600, 400), 2000)
+                sprite.update(16)
+
+        self.check('sprite_update', update, 50)
+
+    def test_sprite_collide(self):
+        """Find the overlapping pairs of 500 moving sprites."""
+        images = {}
+        group = Group()
+        sprites = [Sprite((n * 37 % 1200, n * 53 % 2000), ['guy.png'],
+                          ['dude1.png'], images, [group]) for n in range(500)]
+
+        def collide():
+            for sprite in sprites:
+                sprite.push(1 - sprite.rect.x % 3, 0)
+            group.collide()
+
+        self.check('sprite_collide', collide, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
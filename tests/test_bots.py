@@ -0,0 +1,29 @@
+"""For tests related to 'bots.py'."""
+
+import os.path
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.bots as bots
+
+
+class TestBots(unittest.TestCase):
+    """Tests for the bot runner."""
+
+    def test_run_batch(self):
+        """Assert a bot finishes the world in a worker process."""
+        results = bots.run_batch([0], ai_budget=1, draw=False, processes=1)
+        self.assertEqual(len(results), 1)
+        self.assertIs(results[0]['finished'], True)
+        self.assertGreater(results[0]['frames'], 0)
+        self.assertGreater(results[0]['clicks'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
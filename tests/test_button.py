@@ -4,6 +4,7 @@ import os.path
 import sys
 import unittest
 
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pygame as pg
 pg.init()
 
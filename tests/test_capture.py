@@ -0,0 +1,74 @@
+"""For tests related to 'capture.py'."""
+
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules.capture import Capture
+
+
+class TestCapture(unittest.TestCase):
+    """Tests for 'Capture'."""
+
+    def setUp(self):
+        """Create a surface to capture and a temporary folder."""
+        self.dir = tempfile.mkdtemp()
+        self.surface = pg.Surface((40, 30), 0, 32)
+
+    def tearDown(self):
+        """Remove the captured files."""
+        shutil.rmtree(self.dir)
+
+    def load(self, number):
+        """Return the captured PNG of frame 'number'."""
+        return pg.image.load(os.path.join(
+            self.dir, 'frame_{:06d}.png'.format(number)))
+
+    def test_png(self):
+        """Assert frames are rebuilt from the changed areas."""
+        capture = Capture(self.dir)
+        self.surface.fill((255, 0, 0))
+        capture.add(self.surface, [])
+        rect = self.surface.fill((0, 255, 0), (10, 10, 5, 5))
+        capture.add(self.surface, [rect])
+        capture.close()
+        self.assertEqual(capture.captured, 2)
+        self.assertEqual(self.load(1).get_at((12, 12))[:3], (255, 0, 0))
+        self.assertEqual(self.load(2).get_at((12, 12))[:3], (0, 255, 0))
+        self.assertEqual(self.load(2).get_at((0, 0))[:3], (255, 0, 0))
+
+    def test_dropped(self):
+        """Assert areas of a dropped frame are copied with the next one."""
+        capture = Capture(self.dir)
+        capture.add(self.surface, [])
+        rect = self.surface.fill((0, 0, 255), (0, 0, 5, 5))
+        with mock.patch.object(capture, 'take', return_value=None):
+            capture.add(self.surface, [rect])
+        capture.add(self.surface, [])
+        capture.close()
+        self.assertEqual(capture.dropped, 1)
+        self.assertFalse(os.path.exists(os.path.join(
+            self.dir, 'frame_000002.png')))
+        self.assertEqual(self.load(3).get_at((2, 2))[:3], (0, 0, 255))
+
+    def test_raw(self):
+        """Assert raw frames are appended to one file per size."""
+        capture = Capture(os.path.join(self.dir, 'capture'), 'raw')
+        for _ in range(3):
+            capture.add(self.surface, [])
+        capture.close()
+        filename = os.path.join(self.dir, 'capture_40x30.rgb')
+        self.assertEqual(os.path.getsize(filename), 3 * 40 * 30 * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
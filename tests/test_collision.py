@@ -0,0 +1,76 @@
+"""For tests related to 'collision.py'."""
+
+import os
+import random
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules import collision
+from modules import screen as sc
+from modules.sprite import Group, Sprite
+
+
+class Box(pg.sprite.Sprite):
+    """Sprite that is only a rect."""
+
+    def __init__(self, rect):
+        """Set the rect."""
+        pg.sprite.Sprite.__init__(self)
+        self.rect = pg.Rect(rect)
+
+
+class TestSweepAndPrune(unittest.TestCase):
+    """Tests for 'SweepAndPrune'."""
+
+    def test_pairs(self):
+        """Assert the pairs are the same as checking every pair."""
+        rng = random.Random(0)
+        boxes = [Box((rng.randint(0, 500), rng.randint(0, 500), 20, 30))
+                 for _ in range(200)]
+        broad_phase = collision.SweepAndPrune(boxes)
+        for _ in range(3):
+            expected = set(frozenset((a, b)) for num, a in enumerate(boxes)
+                           for b in boxes[num + 1:]
+                           if a.rect.colliderect(b.rect))
+            self.assertSetEqual(set(frozenset(pair) for pair
+                                    in broad_phase.pairs()), expected)
+            for box in boxes:
+                box.rect.move_ip(rng.randint(-5, 5), rng.randint(-5, 5))
+
+    def test_solid(self):
+        """Assert sprites that aren't solid don't collide."""
+        first, second = Box((0, 0, 10, 10)), Box((5, 5, 10, 10))
+        second.solid = False
+        self.assertListEqual(
+            collision.SweepAndPrune([first, second]).pairs(), [])
+
+
+class TestSeparate(unittest.TestCase):
+    """Tests for pushing sprites apart."""
+
+    def setUp(self):
+        """Open a dummy display for the sprites."""
+        sc.init()
+
+    def test_group_collide(self):
+        """Assert overlapping sprites are pushed apart in a group."""
+        group = Group()
+        sprites = [Sprite((100 + n * 3, 100), ['guy.png'], ['dude1.png'],
+                          groups=[group]) for n in range(2)]
+        self.assertEqual(len(group.broad_phase.sprites), 2)
+        areas = group.collide()
+        self.assertEqual(len(areas), 4)
+        self.assertFalse(sprites[0].rect.colliderect(sprites[1].rect))
+        self.assertLess(sprites[0].x_pos, sprites[1].x_pos)
+        group.remove(sprites[0])
+        self.assertListEqual(group.broad_phase.sprites, [sprites[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""For tests related to 'fog.py'."""
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.fog as fog
+import modules.level as level
+import modules.screen as sc
+
+
+class TestFog(unittest.TestCase):
+    """Tests for 'Fog'."""
+
+    def setUp(self):
+        """Create a fog of 13x11 tiles."""
+        self.fog = fog.Fog(13, 11, 2.0)
+
+    def test_reveal(self):
+        """Assert only tiles that were hidden are returned."""
+        tiles = self.fog.reveal((5.5, 5.5))
+        self.assertEqual(len(tiles), 13)
+        self.assertIn((5, 5), tiles)
+        self.assertFalse(self.fog.hidden(5, 7))
+        self.assertTrue(self.fog.hidden(7, 7))
+        self.assertListEqual(self.fog.reveal((5.9, 5.1)), [])
+        self.assertEqual(sorted(self.fog.reveal((6, 5))),
+                         [(6, 3), (6, 7), (7, 4), (7, 6), (8, 5)])
+
+    def test_edge(self):
+        """Assert tiles outside the map aren't revealed."""
+        tiles = self.fog.reveal((0, 0))
+        self.assertEqual(sorted(tiles),
+                         [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (2, 0)])
+        self.assertListEqual(self.fog.reveal((-5, 20)), [])
+
+    def test_hidden_tiles(self):
+        """Assert hidden tiles are returned in map coordinates."""
+        self.fog.reveal((0, 0))
+        self.assertEqual(sorted(self.fog.hidden_tiles(0, 0, 3, 3)),
+                         [(1, 2), (2, 1), (2, 2)])
+
+    def test_bytes(self):
+        """Assert the bitmap is packed to a bit per tile."""
+        self.fog.reveal((3, 4))
+        data = self.fog.to_bytes()
+        self.assertEqual(len(data), (13 * 11 + 7) // 8)
+        other = fog.Fog(13, 11)
+        other.load_bytes(data)
+        self.assertTrue((other.revealed == self.fog.revealed).all())
+        self.assertRaises(ValueError, fog.Fog(14, 11).load_bytes, data)
+
+
+class TestLevelFog(unittest.TestCase):
+    """Tests for shading a level with fog."""
+
+    def setUp(self):
+        """Create a level with fog."""
+        sc.init()
+        self.level = level.Level(os.path.join(path, 'levels', 'level_one.tmx'))
+        self.level.fog = fog.Fog(self.level.level.width,
+                                 self.level.level.height)
+        self.level.relight()
+        self.level.scroll_to(0)
+
+    def test_reveal(self):
+        """Assert revealed tiles are only lit and hidden tiles darkened."""
+        lit = self.level.bg.copy()
+        self.level.lighting.multiply(lit, lit.get_rect())
+        self.level.fog.revealed[1, 2] = True
+        rect, = self.level.reveal([(2, 1)])
+        self.assertEqual(rect.topleft, (2 * self.level.tile_width,
+                                        self.level.tile_height))
+        self.assertEqual(self.level.viewport.surface.get_at(rect.center),
+                         lit.get_at(rect.center))
+        x, y = rect.right + 1, rect.centery
+        self.assertLess(sum(self.level.viewport.surface.get_at((x, y))[:3]),
+                        sum(lit.get_at((x, y))[:3]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,15 +2,21 @@
 
 import os.path
 import sys
+import tempfile
 import unittest
+import unittest.mock
 from datetime import datetime, timedelta
 
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pygame as pg
 pg.init()
 
 path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append(os.path.join(path))
-from game import Game
+import modules.screen as sc
+from modules.game import Game
+from modules.state import MenuState, State
+Game.init()
 
 
 class TestGame(unittest.TestCase):
@@ -40,6 +46,153 @@ class TestGame(unittest.TestCase):
         self.assertEqual(
             pg.RESIZABLE, pg.display.get_surface().get_flags() & 0x00000010)
 
+    def test_video_resize_burst(self):
+        """Assert a burst of resize events scales the state once."""
+        Game.pending_resize = None
+        Game.resize(res=(400, 300))
+        scales = []
+        state, Game.state = Game.state, unittest.mock.Mock()
+        Game.state.scale.side_effect = scales.append
+        for width in (500, 600, 800):
+            pg.event.post(pg.event.Event(
+                pg.VIDEORESIZE, {'size' : (width, 600)}))
+        Game.event_loop()
+        Game.update(16, [])
+        self.assertEqual(scales, [])
+        Game.state.update.assert_called_once_with(16)
+        self.assertTupleEqual((800, 600), pg.display.get_surface().get_size())
+        Game.update_resize(force=True)
+        Game.state = state
+        self.assertEqual(scales, [2.0])
+        self.assertIsNone(Game.pending_resize)
+
+    def test_resize_delay(self):
+        """Assert the state is scaled after 'resize_delay' frame time."""
+        Game.pending_resize = None
+        Game.resize(res=(400, 300))
+        state, Game.state = Game.state, unittest.mock.Mock()
+        Game.event_loop([pg.event.Event(pg.VIDEORESIZE, {'size' : (800, 600)})])
+        Game.update(Game.resize_delay - 1, [])
+        self.assertFalse(Game.state.scale.called)
+        Game.update(1, [])
+        scale = Game.state.scale
+        Game.state = state
+        scale.assert_called_once_with(2.0)
+
+    def test_track_input(self):
+        """Assert mouse and keys are tracked from events."""
+        Game.event_loop([
+            pg.event.Event(pg.MOUSEMOTION, {'pos' : (5, 6)}),
+            pg.event.Event(pg.KEYDOWN, {'key' : pg.K_z}),
+            pg.event.Event(pg.KEYDOWN, {'key' : pg.K_x}),
+            pg.event.Event(pg.KEYUP, {'key' : pg.K_x})])
+        self.assertEqual(State.mouse_pos, (5, 6))
+        self.assertIn(pg.K_z, State.pressed)
+        self.assertNotIn(pg.K_x, State.pressed)
+        Game.event_loop([pg.event.Event(pg.KEYUP, {'key' : pg.K_z})])
+
+    def test_state_stack(self):
+        """Assert pushed states are suspended and reused."""
+        menu = Game.state
+        args = (MenuState.create_main_menu(),)
+        State.push_state(MenuState, args)
+        Game.event_loop()
+        pushed = Game.state
+        self.assertIsNot(pushed, menu)
+        self.assertIs(Game.stack[-1], menu)
+        State.pop_state()
+        Game.event_loop()
+        self.assertIs(Game.state, menu)
+        State.push_state(MenuState, args)
+        Game.event_loop()
+        self.assertIs(Game.state, pushed)
+        State.pop_state()
+        Game.event_loop()
+
+    def test_pop_finished(self):
+        """Assert a state that can't be reused exits when it's popped."""
+        menu = Game.state
+        Game.change_state(MenuState, (MenuState.create_main_menu(),), 'push')
+        pushed = Game.state
+        pushed.reusable = lambda: False
+        pushed.exit = unittest.mock.Mock()
+        Game.change_state(None, (), 'pop')
+        self.assertIs(Game.state, menu)
+        self.assertNotIn(pushed.key, Game.suspended)
+        pushed.exit.assert_called_once_with()
+
+    def test_trim_suspended(self):
+        """Assert suspended states are released when over budget."""
+        state = unittest.mock.Mock()
+        state.surface_bytes.return_value = 100
+        Game.suspended[('key',)] = state
+        budget, Game.suspended_budget = Game.suspended_budget, 50
+        Game.trim_suspended()
+        Game.suspended_budget = budget
+        del Game.suspended[('key',)]
+        state.release.assert_called_once_with()
+
+    def test_max_suspended(self):
+        """Assert the oldest suspended states exit over the limit."""
+        suspended, Game.suspended = Game.suspended, type(Game.suspended)()
+        states = [unittest.mock.Mock() for _ in range(Game.max_suspended + 2)]
+        for num, state in enumerate(states):
+            state.surface_bytes.return_value = 0
+            Game.suspended[('key', num)] = state
+        Game.trim_suspended()
+        Game.suspended = suspended
+        self.assertEqual([state.exit.called for state in states],
+                         [True] * 2 + [False] * Game.max_suspended)
+
+    def test_record_replay(self):
+        """Assert recorded events are replayed with the recorded times."""
+        filename = os.path.join(tempfile.mkdtemp(), 'test.journal')
+        Game.start_recording(filename)
+        pg.event.post(pg.event.Event(pg.KEYDOWN, {'key' : pg.K_a}))
+        elapsed, events = Game.next_frame()
+        Game.recorder.close()
+        Game.recorder = None
+        Game.start_replay(filename)
+        replayed = Game.next_frame()
+        Game.player.close()
+        Game.player = None
+        self.assertEqual(replayed[0], elapsed)
+        self.assertListEqual([e.key for e in replayed[1]
+                              if e.type == pg.KEYDOWN], [pg.K_a])
+        os.remove(filename)
+
+    def test_filter_events(self):
+        """Assert event types no state handles are blocked."""
+        Game.filter_events()
+        try:
+            self.assertTrue(pg.event.get_blocked(pg.JOYAXISMOTION))
+            self.assertFalse(pg.event.get_blocked(pg.MOUSEMOTION))
+            self.assertFalse(pg.event.get_blocked(pg.MOUSEBUTTONDOWN))
+            self.assertFalse(pg.event.get_blocked(pg.QUIT))
+        finally:
+            pg.event.set_allowed(None)
+
+    def test_coalesce(self):
+        """Assert only the last motion event of a frame is kept."""
+        events = [pg.event.Event(pg.MOUSEMOTION, {'pos' : (n, n)})
+                  for n in range(100)]
+        events.insert(50, pg.event.Event(pg.MOUSEBUTTONDOWN, {'pos' : (1, 1)}))
+        coalesced = Game.coalesce(events)
+        self.assertListEqual([e.type for e in coalesced],
+                             [pg.MOUSEBUTTONDOWN, pg.MOUSEMOTION])
+        self.assertTupleEqual(coalesced[-1].pos, (99, 99))
+
+    def test_memory_report(self):
+        """Assert F3 shows the surface report until pressed again."""
+        press = pg.event.Event(pg.KEYDOWN, {'key' : pg.K_F3})
+        del sc.draw_queue[:]
+        Game.event_loop([press])
+        Game.draw_memory_report()
+        self.assertEqual(sc.draw_queue[-1]['layer'], 30)
+        Game.event_loop([press])
+        self.assertIsNone(Game.memory_overlay)
+        del sc.draw_queue[:]
+
     def test_event_queue(self):
         """Event queue should be empty after looping through it."""
         Game.event_loop()
@@ -0,0 +1,72 @@
+"""For tests related to 'journal.py'."""
+
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.journal as journal
+
+
+class TestJournal(unittest.TestCase):
+    """Tests for 'Recorder' and 'Player'."""
+
+    def setUp(self):
+        """Record a journal with a keyframe every 2 frames."""
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'test.journal')
+        self.recorder = journal.Recorder(self.filename, (800, 600), 2)
+        for frame in range(5):
+            if self.recorder.needs_keyframe:
+                self.recorder.write_keyframe({'frame' : frame})
+            self.recorder.write_frame(16 + frame, [pg.event.Event(
+                pg.MOUSEBUTTONDOWN, {'pos' : (frame, 1), 'button' : 1,
+                                     'unknown' : object()})])
+
+    def tearDown(self):
+        """Remove the journal."""
+        shutil.rmtree(self.dir)
+
+    def test_replay(self):
+        """Assert frames are read back in order."""
+        self.recorder.close()
+        player = journal.Player(self.filename)
+        self.assertTupleEqual(player.res, (800, 600))
+        frames = []
+        while True:
+            frame = player.next_frame()
+            if frame is None:
+                break
+            frames.append(frame)
+        player.close()
+        self.assertListEqual([f[0] for f in frames], [16, 17, 18, 19, 20])
+        event = frames[1][1][0]
+        self.assertEqual(event.type, pg.MOUSEBUTTONDOWN)
+        self.assertTupleEqual(event.pos, (1, 1))
+        self.assertFalse(hasattr(event, 'unknown'))
+
+    def test_seek(self):
+        """Assert seeking returns the last keyframe before the frame."""
+        self.recorder.close()
+        player = journal.Player(self.filename)
+        self.assertTupleEqual(player.seek(3), (2, {'frame' : 2}))
+        self.assertEqual(player.next_frame()[0], 18)
+        player.close()
+
+    def test_unclosed(self):
+        """Assert keyframes are found in journals that weren't closed."""
+        self.recorder.file.close()
+        player = journal.Player(self.filename)
+        self.assertListEqual([f for f, _ in player.index], [0, 2, 4])
+        player.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
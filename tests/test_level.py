@@ -1,15 +1,17 @@
 """Module for the TestLevel class."""
 
-import os.path
+import os
 import sys
 import unittest
 
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pygame as pg
 pg.init()
 
 path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append(os.path.join(path))
 import modules.level as level
+import modules.screen as sc
 
 
 class TestLevel(unittest.TestCase):
@@ -17,6 +19,7 @@ class TestLevel(unittest.TestCase):
 
     def setUp(self):
         """Create 'Level' instance."""
+        sc.init()
         self.level = level.Level(os.path.join(path, 'levels', 'level_one.tmx'))
 
     def test_tile_size(self):
@@ -30,6 +33,43 @@ class TestLevel(unittest.TestCase):
         self.level.reload()
         self.assertGreaterEqual(len(self.level.tiles), level_size)
 
+    def test_reload_steps(self):
+        """
+        Assert a reload in steps keeps the old surfaces until it's done
+        and matches a blocking reload.
+        """
+        expected = pg.image.tobytes(self.level.bg, 'RGB')
+        bg, tiles = self.level.bg, self.level.tiles
+        steps = list(zip(range(3), self.level.reload_steps()))
+        self.assertEqual(len(steps), 3)
+        self.assertIs(self.level.bg, bg)
+        self.assertIs(self.level.tiles, tiles)
+        self.level.reload()
+        self.assertIsNot(self.level.bg, bg)
+        self.assertEqual(pg.image.tobytes(self.level.bg, 'RGB'), expected)
+
+    def test_reload_steps_stop(self):
+        """Assert reload steps stop when the level is reloaded."""
+        steps = self.level.reload_steps()
+        next(steps)
+        self.level.reload()
+        self.assertListEqual(list(steps), [])
+
+    def test_animate(self):
+        """Assert each changed cell is drawn with one blit."""
+        # No lighting at noon.
+        self.level.lighting.hour = 12.0
+        self.level.lighting.ambient = self.level.lighting.ambient_color()
+        del level.sc.draw_queue[:]
+        duration = max(tile['frames'][tile['index']].duration
+                       for tile in self.level.animated_tiles)
+        self.assertTrue(self.level.will_animate(duration + 100))
+        self.level.animate(duration + 100, 0)
+        blits = [item for item in level.sc.draw_queue if item['layer'] == 11]
+        self.assertEqual(len(blits), len(self.level.cells))
+        cell = list(self.level.cells.values())[0]
+        self.assertEqual(len(cell['images']), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+"""For tests related to 'lighting.py'."""
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules import lighting
+from modules import screen as sc
+
+
+class TestLighting(unittest.TestCase):
+    """Tests for 'Lighting'."""
+
+    def setUp(self):
+        """Create lighting at midnight with one light."""
+        sc.init()
+        self.light = lighting.Light((2.5, 2.5), 2.0)
+        self.lighting = lighting.Lighting([self.light], (12, 12), hour=0.0)
+        self.lighting.reload((10, 10))
+
+    def test_ambient(self):
+        """Assert it's dark at midnight and there is no tint at noon."""
+        self.assertEqual(self.lighting.ambient, lighting.NIGHT)
+        self.lighting.hour = 12.0
+        self.assertEqual(self.lighting.ambient_color(), lighting.DAY)
+
+    def test_compose(self):
+        """Assert the light is brightest at its center."""
+        image = self.lighting.chunk_image((0, 0))
+        center = image.get_at((25, 25))
+        corner = image.get_at((39, 39))
+        self.assertGreater(sum(center[:3]), sum(corner[:3]))
+        self.assertEqual(tuple(corner[:3]), lighting.NIGHT)
+
+    def test_cache(self):
+        """Assert variants are cached until the light changes."""
+        image = self.lighting.chunk_image((0, 0))
+        self.assertIs(self.lighting.chunk_image((0, 0)), image)
+        self.lighting.set_light(self.light, False)
+        dark = self.lighting.chunk_image((0, 0))
+        self.assertEqual(tuple(dark.get_at((25, 25))[:3]), lighting.NIGHT)
+
+    def test_ambient_change(self):
+        """Assert a new ambient color reuses the glow and lightmap."""
+        image = self.lighting.chunk_image((0, 0))
+        glow = self.lighting.glows[(0, 0)][0]
+        center = tuple(image.get_at((25, 25))[:3])
+        self.lighting.hour = 6.0
+        self.assertEqual(self.lighting.update(0), 'ambient')
+        self.assertIs(self.lighting.chunk_image((0, 0)), image)
+        self.assertIs(self.lighting.glows[(0, 0)][0], glow)
+        self.assertEqual(tuple(image.get_at((39, 39))[:3]),
+                         self.lighting.ambient)
+        self.assertGreater(sum(image.get_at((25, 25))[:3]), sum(center))
+
+    def test_flicker(self):
+        """Assert the flicker cycles through the variants."""
+        self.assertEqual(
+            self.lighting.update(self.lighting.flicker_time), 'flicker')
+        self.assertEqual(self.lighting.variant, 1)
+
+    def test_multiply(self):
+        """Assert the surface is tinted and lit around the light."""
+        surface = pg.Surface((120, 40))
+        surface.fill((255, 255, 255))
+        self.lighting.multiply(surface, pg.Rect(0, 0, 120, 40))
+        self.assertEqual(tuple(surface.get_at((100, 10))[:3]), lighting.NIGHT)
+        self.assertGreater(sum(surface.get_at((25, 25))[:3]),
+                           sum(lighting.NIGHT))
+
+
+if __name__ == '__main__':
+    unittest.main()
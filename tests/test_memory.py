@@ -0,0 +1,71 @@
+"""For tests related to 'memory.py'."""
+
+import gc
+import json
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules import memory
+
+
+class TestMemory(unittest.TestCase):
+    """Tests for the surface registry."""
+
+    def setUp(self):
+        """Remember the budgets so tests can change them."""
+        self.budgets = dict(memory.budgets)
+
+    def tearDown(self):
+        """Restore the budgets."""
+        memory.budgets.clear()
+        memory.budgets.update(self.budgets)
+        memory.over_budget.clear()
+
+    def test_track(self):
+        """Assert surfaces count until they are freed."""
+        before = memory.used('test')
+        surface = memory.track(pg.Surface((10, 10), 0, 32), 'test')
+        self.assertEqual(memory.used('test') - before, 400)
+        memory.track(surface.subsurface((0, 0, 5, 5)), 'test')
+        memory.track(surface, 'test')
+        self.assertEqual(memory.used('test') - before, 400)
+        self.assertEqual(memory.report()['test']['sizes']['10x10'], 1)
+        del surface
+        gc.collect()
+        self.assertEqual(memory.used('test'), before)
+
+    def test_budget(self):
+        """Assert going over budget logs a warning once."""
+        memory.budgets['test'] = 100
+        with self.assertLogs(level='WARNING') as logs:
+            first = memory.track(pg.Surface((10, 10), 0, 32), 'test')
+            second = memory.track(pg.Surface((10, 10), 0, 32), 'test')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('test', memory.over_budget)
+
+    def test_dump(self):
+        """Assert the report is written as JSON."""
+        surface = memory.track(pg.Surface((8, 8), 0, 32), 'test')
+        folder = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(folder, 'memory.json')
+            memory.dump(filename)
+            with open(filename) as report_file:
+                report = json.load(report_file)
+        finally:
+            shutil.rmtree(folder)
+        self.assertGreaterEqual(report['test']['count'], 1)
+        self.assertIn('32 bit', report['test']['formats'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""For tests related to 'particles.py'."""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from pytmx import TiledMap
+from modules import particles
+from modules import screen as sc
+from modules.path import LEVEL_PATH
+
+
+class TestParticles(unittest.TestCase):
+    """Tests for 'ParticleSystem'."""
+
+    def setUp(self):
+        """Create a particle system with one flame."""
+        self.system = particles.ParticleSystem(capacity=100, seed=0)
+        self.system.emitters.append(particles.Emitter('flame', (2, 2)))
+
+    def test_update(self):
+        """Assert particles are emitted and removed when they expire."""
+        self.system.update(100)
+        self.assertEqual(self.system.count, 6)
+        self.system.update(1000)
+        self.assertEqual(self.system.count, 0)
+
+    def test_capacity(self):
+        """Assert the arrays never overflow."""
+        self.system.update(10000)
+        self.assertEqual(self.system.count, 0)
+        for _ in range(30):
+            self.system.update(100)
+        self.assertLessEqual(self.system.count, self.system.capacity)
+
+    def test_draw_to(self):
+        """Assert particles are written to the surface."""
+        surface = pg.Surface((200, 200), 0, 32)
+        self.system.update(100)
+        self.system.draw_to(surface, (50, 50), 0, 2)
+        area = self.system.emitters[0].area((50, 50), 0)
+        self.assertTrue(pg.mask.from_threshold(
+            surface.subsurface(area), (0, 0, 0), (1, 1, 1, 255)).count()
+                        < area.width * area.height)
+
+    def test_draw(self):
+        """Assert only the areas drawn last frame are restored."""
+        sc.init()
+        level = mock.Mock(tile_size=(50, 50), tile_width=50)
+        self.system.update(100)
+        areas = self.system.draw(level, 0)
+        self.assertEqual(len(areas), 1)
+        self.assertTrue(areas[0].colliderect(self.system.emitters[0].area(
+            level.tile_size, 0)))
+        self.assertFalse(level.draw_frame_area.called)
+        self.system.update(1000)
+        self.assertListEqual(self.system.draw(level, 0), areas)
+        level.draw_frame_area.assert_called_once_with(areas[0], 0)
+        del sc.draw_queue[:]
+
+    def test_from_level(self):
+        """Assert emitters are placed from tile properties."""
+        tiled_map = TiledMap(os.path.join(LEVEL_PATH, 'level_one.tmx'))
+        presets = set(id(emitter.preset) for emitter
+                      in particles.emitters_from_level(tiled_map))
+        self.assertSetEqual(presets, set(
+            id(particles.PRESETS[name]) for name in particles.PRESETS))
+
+    def test_benchmark(self):
+        """Assert 10000 particles take less than a 60 FPS frame."""
+        result = particles.benchmark(10000, 60)
+        self.assertGreater(result['particles'], 5000)
+        self.assertLessEqual(result['particles'], 10000)
+        self.assertLess(result['ms'], 1000 / 60.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""For tests related to 'preload.py'."""
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules.level import Level
+from modules import screen as sc
+from modules.preload import Preloader
+
+
+class TestPreloader(unittest.TestCase):
+    """Tests for 'Preloader'."""
+
+    def setUp(self):
+        """Start a preloader for the first level."""
+        sc.init()
+        self.preloader = Preloader('level_one.tmx', ['guy.png', 'dude1.png'])
+        self.preloader.start()
+
+    def test_finish(self):
+        """Assert all data is loaded and progress is complete."""
+        data = self.preloader.finish()
+        self.assertEqual(self.preloader.progress, 1.0)
+        self.assertTrue(self.preloader.done)
+        self.assertSetEqual(set(data['images']), {'guy.png', 'dude1.png'})
+        self.assertIn('spawn', data['text'])
+
+    def test_level(self):
+        """Assert a level can be built from the preloaded map."""
+        level = Level('level_one.tmx', self.preloader.finish()['level'])
+        level_size = level.level.width * level.level.height
+        self.assertGreaterEqual(len(level.tiles), level_size)
+
+    def test_matches(self):
+        """Assert the order of image names doesn't matter."""
+        self.assertTrue(
+            self.preloader.matches('level_one.tmx', ['dude1.png', 'guy.png']))
+        self.assertFalse(self.preloader.matches('level_two.tmx', []))
+        self.preloader.finish()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""For tests related to 'save.py'."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.save as save
+import modules.screen as sc
+from modules.state import WorldState
+
+
+class TestSave(unittest.TestCase):
+    """Tests for the save format and the autosaver."""
+
+    def setUp(self):
+        """Create a temporary directory and some save data."""
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'saves', 'test.sav')
+        self.data = dict(level='level_one.tmx', player=(1.5, 2.25),
+                         nodes=[(2, False, 3), (3, '1', 0)],
+                         fog=b'\x01\x80')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.dir)
+
+    def test_encode(self):
+        """Assert data is the same after encoding and decoding it."""
+        self.assertDictEqual(save.decode(save.encode(self.data)), self.data)
+
+    def test_write(self):
+        """Assert the save is written and the temporary file is gone."""
+        save.write(self.filename, self.data)
+        self.assertDictEqual(save.load(self.filename), self.data)
+        self.assertListEqual(os.listdir(os.path.dirname(self.filename)),
+                             ['test.sav'])
+
+    def test_corrupt(self):
+        """Assert truncated or corrupt saves load as None."""
+        raw = save.encode(self.data)
+        nodes_end = len(raw) - save.FOG.size - len(self.data['fog'])
+        # The last node with an unknown active code.
+        bad_node = raw[:nodes_end - 3] + b'\x09' + raw[nodes_end - 2:]
+        for corrupt in (raw[:len(raw) - 1], raw[:nodes_end - 3], raw[:2],
+                        bad_node, b'XXXX' + raw[4:]):
+            bad = os.path.join(self.dir, 'bad.sav')
+            with open(bad, 'wb') as save_file:
+                save_file.write(corrupt)
+            self.assertIsNone(save.load(bad))
+
+    def test_active_true(self):
+        """Assert nodes that are active as a bool are saved as active."""
+        data = dict(self.data, nodes=[(2, True, 0)])
+        self.assertListEqual(save.decode(save.encode(data))['nodes'],
+                             [(2, '1', 0)])
+
+    def test_version_1(self):
+        """Assert saves from before the fog load without it."""
+        data = dict(self.data, fog=None)
+        raw = save.encode(data)
+        raw = (save.HEADER.pack(save.MAGIC, 1, len(data['level']))
+               + raw[save.HEADER.size:-save.FOG.size])
+        self.assertDictEqual(save.decode(raw), data)
+
+    def test_autosaver(self):
+        """Assert the newest queued data is written."""
+        autosaver = save.Autosaver(self.filename)
+        autosaver.save(dict(self.data, nodes=[]))
+        autosaver.save(self.data)
+        self.assertTrue(autosaver.flush(5))
+        self.assertDictEqual(save.load(self.filename), self.data)
+
+
+class TestWorldSave(unittest.TestCase):
+    """Tests for saving and loading 'WorldState'."""
+
+    def setUp(self):
+        """Create an instance of WorldState."""
+        sc.init()
+        self.state = WorldState(*WorldState.start_args())
+
+    def test_save_data(self):
+        """Assert loading save data restores the player, nodes and fog."""
+        node = [n for n in self.state.nodes if n.has_text()][0]
+        node.update_text()
+        self.state.player.x_pos = self.state.level.tile_width * 3
+        self.state.reveal()
+        data = self.state.save_data()
+        self.assertListEqual(data['nodes'], [(node.id, node.active, 1)])
+        state = WorldState(*WorldState.start_args())
+        state.load(data)
+        self.assertEqual(state.save_data(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""For tests related to 'scheduler.py'."""
+
+import os.path
+import sys
+import time
+import unittest
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules.scheduler import Scheduler
+
+
+def count(log, name, steps, delay=0):
+    """Job that appends 'name' to 'log' for each of 'steps' steps."""
+    for _ in range(steps):
+        time.sleep(delay)
+        log.append(name)
+        yield
+
+
+class TestScheduler(unittest.TestCase):
+    """Tests for 'Scheduler'."""
+
+    def setUp(self):
+        """Create a scheduler and a log of the steps run."""
+        self.scheduler = Scheduler(budget=1000.0)
+        self.log = []
+
+    def test_priority(self):
+        """Assert jobs with a higher priority run first."""
+        self.scheduler.submit(count(self.log, 'low', 2))
+        self.scheduler.submit(count(self.log, 'high', 2), priority=1)
+        self.scheduler.run_all()
+        self.assertListEqual(self.log, ['high', 'high', 'low', 'low'])
+
+    def test_budget(self):
+        """Assert a frame stops after the budget but runs a step."""
+        self.scheduler.submit(count(self.log, 'slow', 10, 0.002))
+        self.assertEqual(self.scheduler.run(0), 1)
+        self.scheduler.run(5)
+        self.assertLess(len(self.log), 10)
+        self.scheduler.run_all()
+        self.assertEqual(len(self.log), 10)
+
+    def test_supersede(self):
+        """Assert a job replaces the unfinished job with its key."""
+        done = []
+        old = self.scheduler.submit(count(self.log, 'old', 3), key='resize',
+                                    callback=lambda: done.append('old'))
+        self.scheduler.run(0)
+        self.scheduler.submit(count(self.log, 'new', 3), key='resize',
+                              callback=lambda: done.append('new'))
+        self.scheduler.run_all()
+        self.assertTrue(old.cancelled)
+        self.assertListEqual(self.log, ['old', 'new', 'new', 'new'])
+        self.assertListEqual(done, ['new'])
+        self.assertFalse(self.scheduler.pending('resize'))
+
+    def test_error(self):
+        """Assert a failing job is dropped and the others keep running."""
+
+        def fail():
+            yield
+            raise ValueError('test')
+
+        job = self.scheduler.submit(fail(), priority=1)
+        self.scheduler.submit(count(self.log, 'ok', 2))
+        with self.assertLogs(level='ERROR'):
+            self.scheduler.run_all()
+        self.assertListEqual(self.log, ['ok', 'ok'])
+        self.assertTrue(job.failed)
+
+    def test_callback_error(self):
+        """Assert a failing callback is logged and the others still run."""
+
+        def fail():
+            raise ValueError('test')
+
+        self.scheduler.submit(count(self.log, 'first', 1), priority=1,
+                              callback=fail)
+        self.scheduler.submit(count(self.log, 'second', 1))
+        with self.assertLogs(level='ERROR'):
+            self.scheduler.run_all()
+        self.assertListEqual(self.log, ['first', 'second'])
+
+
+if __name__ == '__main__':
+    unittest.main()
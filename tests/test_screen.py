@@ -1,9 +1,11 @@
 """Module for the TestScreen class."""
 
-import os.path
+import os
+import subprocess
 import sys
 import unittest
 
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pygame as pg
 pg.init()
 
@@ -14,6 +16,10 @@ import modules.screen as sc
 class TestScreen(unittest.TestCase):
     """Tests for screen.py."""
 
+    def setUp(self):
+        """Open a dummy display."""
+        sc.init()
+
     def test_draw_from_queue(self):
         """Assert draw_queue is emptied."""
         for n in range(20):
@@ -24,6 +30,17 @@ class TestScreen(unittest.TestCase):
         sc.draw_from_queue(sc.draw_queue)
         self.assertEqual(len(sc.draw_queue), 0)
 
+    def test_lazy_display(self):
+        """Importing the game shouldn't open the display."""
+        code = ('import pygame as pg\n'
+                'from modules.game import Game\n'
+                'assert pg.display.get_surface() is None\n'
+                'assert Game.state is None\n'
+                'Game.init()\n'
+                'assert pg.display.get_surface() is not None\n')
+        env = dict(os.environ, SDL_VIDEODRIVER='dummy')
+        subprocess.check_call([sys.executable, '-c', code], cwd=path, env=env)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,6 +5,7 @@ import sys
 import unittest
 from math import hypot
 
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pygame as pg
 pg.init()
 
@@ -25,6 +26,14 @@ class TestSprite(unittest.TestCase):
         """Assert function returns a list."""
         self.assertIsInstance(self.sprite.load_frames([]), list)
 
+    def test_groups(self):
+        """Assert sprites are only added to the groups they are given."""
+        self.assertEqual(len(self.sprite.groups()), 0)
+        group = sprite.Group()
+        player = sprite.Sprite((0, 0), ['guy.png'], ['dude1.png'], None,
+                               [group])
+        self.assertIn(player, group)
+
     def test_move(self):
         """Assert sprite moves to the correct position."""
         self.sprite.move((200, 200), 2000)
@@ -38,6 +47,16 @@ class TestSprite(unittest.TestCase):
         self.assertEqual(
             hypot(self.sprite.x_vel, self.sprite.y_vel), self.sprite.max_speed)
 
+    def test_animate(self):
+        """Assert a frame is only scaled when it changes."""
+        image = self.sprite.image
+        self.sprite.animate(10)
+        self.assertIs(self.sprite.image, image)
+        self.sprite.animate(100)
+        self.assertIsNot(self.sprite.image, image)
+        self.assertEqual(self.sprite.image.get_size(),
+                         tuple(self.sprite.size))
+
 
 if __name__ == '__main__':
     unittest.main()
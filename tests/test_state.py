@@ -4,12 +4,14 @@ import os.path
 import sys
 import unittest
 
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pygame as pg
 pg.init()
 
 path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append(os.path.join(path))
-from modules.state import State, MenuState, WorldState
+from modules.state import State, MenuState, WorldState, BattleState
+import modules.scheduler as scheduler
 import modules.state as state
 import modules.screen as sc
 
@@ -43,6 +45,14 @@ class TestMenu(unittest.TestCase):
         self.state.on_arrow_key('left')
         self.assertEqual(self.state.button_set.highlighted_id, 0)
 
+    def test_on_event(self):
+        """Assert key events are dispatched by keycode."""
+        self.state.button_set.highlighted_id = 0
+        self.state.on_event(pg.event.Event(pg.KEYDOWN, {'key' : pg.K_DOWN}))
+        self.assertEqual(self.state.button_set.highlighted_id, 1)
+        self.state.on_event(pg.event.Event(pg.KEYDOWN, {'key' : pg.K_a}))
+        self.assertEqual(self.state.button_set.highlighted_id, 1)
+
     def test_create_main_menu(self):
         """Assert return value is an instance of ButtonSet."""
         self.assertIsInstance(MenuState.create_main_menu(), state.ButtonSet)
@@ -52,6 +62,14 @@ class TestMenu(unittest.TestCase):
         MenuState.start_game()
         self.assertGreater(len(pg.event.get(pg.USEREVENT)), 0)
     
+    def test_preload_again(self):
+        """Assert the menu preloads again after a world took the preloader."""
+        WorldState.take_preloaded(*WorldState.start_args()[:2])
+        self.assertIsNone(WorldState.preloader)
+        self.state.resume()
+        self.assertIsNotNone(WorldState.preloader)
+        WorldState.preloader.finish()
+
     def test_exit_game(self):
         """Assert a quit event is posted."""
         MenuState.exit_game()
@@ -72,6 +90,24 @@ class TestWorld(unittest.TestCase):
         self.state.scale(20.0)
         self.state.scale(1.0/40.0)
 
+    def test_snapshot(self):
+        """Assert restoring a snapshot undoes movement and progress."""
+        snapshot = self.state.snapshot()
+        self.state.player.move((500, 500), 2000)
+        self.state.player.update(100)
+        node = [n for n in self.state.nodes if n.has_text()][0]
+        node.update_text()
+        self.state.restore(snapshot)
+        self.assertEqual(self.state.snapshot(), snapshot)
+
+    def test_change_level(self):
+        """Assert node progress is kept when returning to a level."""
+        node = [n for n in self.state.nodes if n.has_text()][0]
+        node.update_text()
+        deltas = self.state.node_deltas()
+        self.state.change_level(self.state.level_name)
+        self.assertListEqual(self.state.node_deltas(), deltas)
+
     def test_scroll(self):
         """Assert scroll is positive and not too large."""
         self.assertGreaterEqual(self.state.scroll, 0)
@@ -81,6 +117,125 @@ class TestWorld(unittest.TestCase):
             self.state.scroll, level_height - state.sc.screen.get_height())
         self.assertIsInstance(self.state.scroll, (int, float))
 
+    def test_scroll_level(self):
+        """Assert scrolling redraws the screen from the level, not itself."""
+        self.state.prev_scroll = self.state.scroll - 5
+        del sc.draw_queue[:]
+        self.state.scroll_level()
+        self.assertNotIn(sc.screen.scroll,
+                         [item.get('func') for item in sc.draw_queue])
+        rects = sc.draw_from_queue(sc.draw_queue)
+        self.assertIn(sc.screen.get_rect(), rects)
+        expected = sc.screen.copy()
+        self.state.level.blit_frame_area(
+            expected, expected.get_rect(top=self.state.scroll),
+            self.state.scroll)
+        self.assertEqual(pg.image.tobytes(sc.screen, 'RGB'),
+                         pg.image.tobytes(expected, 'RGB'))
+
+    def test_portal(self):
+        """
+        Assert the player waits at a portal until the level behind it is
+        built and then appears at the target in that level.
+        """
+        self.state.world.levels.pop('level_two.tmx', None)
+        self.state.world.builders.pop('level_two.tmx', None)
+        portal, = [n for n in self.state.nodes if n.action == 'portal']
+        self.state.move_player((portal.x_pos - 3 * self.state.level.tile_width,
+                                portal.y_pos))
+        self.state.player.move((portal.x_pos, portal.y_pos - self.state.scroll),
+                               self.state.level.tile_height
+                               * self.state.level.level.height)
+        for _ in range(600):
+            self.state.update(16)
+            if self.state.waiting_portal is not None:
+                break
+        self.assertIs(self.state.waiting_portal, portal)
+        self.assertEqual(self.state.level_name, 'level_one.tmx')
+        self.state.world.builders['level_two.tmx'].preloader.finish()
+        self.state.update(16)
+        self.assertEqual(self.state.level_name, 'level_one.tmx')
+        scheduler.jobs.run_all()
+        self.state.update(16)
+        self.assertEqual(self.state.level_name, 'level_two.tmx')
+        target, = [n for n in self.state.nodes if n.action == 'portal']
+        self.assertIs(self.state.entered_portal, target)
+        self.assertEqual((self.state.player.x_pos, self.state.player.y_pos),
+                         (target.x_pos, target.y_pos))
+        self.state.update(16)
+        self.assertEqual(self.state.level_name, 'level_two.tmx')
+        del sc.draw_queue[:]
+
+    def test_rescale(self):
+        """Assert everything keeps its scale until the level is rebuilt."""
+        width = self.state.level.tile_width
+        x_pos = self.state.player.x_pos
+        self.state.level.zoomed = True
+        new_width = self.state.level.target_width()
+        self.assertNotEqual(new_width, width)
+        self.state.scale(1.0)
+        scheduler.jobs.run(0)
+        self.assertEqual(self.state.level.tile_width, width)
+        self.assertEqual(self.state.player.x_pos, x_pos)
+        scheduler.jobs.run_all()
+        self.assertEqual(self.state.level.tile_width, new_width)
+        self.assertEqual(self.state.level.bg.get_width(),
+                         new_width * self.state.level.level.width)
+        self.assertAlmostEqual(self.state.player.x_pos,
+                               x_pos * new_width / width)
+        del sc.draw_queue[:]
+
+
+class TestBattle(unittest.TestCase):
+    """Tests for state.BattleState."""
+
+    def setUp(self):
+        """Open the display and create an instance of BattleState."""
+        sc.init()
+        self.state = BattleState(WorldState.level, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the AI processes."""
+        BattleState.close_ai_pool()
+
+    def test_end_turn(self):
+        """Assert clicking the active unit ends its turn."""
+        battle = self.state.battle
+        pos = ((battle.x[0] + 0.5) * self.state.level.tile_width,
+               (battle.y[0] + 0.5) * self.state.level.tile_height)
+        self.state.on_click((int(pos[0]), int(pos[1])))
+        self.assertEqual(battle.turn, 1)
+
+    def test_blocked(self):
+        """Assert the battle is blocked where the level has collision."""
+        battle = self.state.battle
+        self.assertTrue(any(battle.blocked))
+        for x, y in zip(battle.x, battle.y):
+            self.assertFalse(battle.blocked[y * battle.width + x])
+
+    def test_cached_map(self):
+        """Assert the map of a cached level isn't parsed again."""
+        cached = state.world.levels.get(WorldState.level)
+        battle_state = BattleState(WorldState.level, 1)
+        self.assertIsNot(battle_state.level.level, cached.level)
+        self.assertIs(battle_state.level.level.layers, cached.level.layers)
+        self.assertTrue(battle_state.reusable())
+        battle_state.battle.hp[:] = type(battle_state.battle.hp)(
+            'h', [0] * len(battle_state.battle.hp))
+        self.assertFalse(battle_state.reusable())
+
+    def test_update(self):
+        """Assert enemies act after the delay."""
+        self.state.battle.turn = 3
+        self.state.ai_budget = 1
+        key = self.state.battle.key()
+        self.state.update(0)
+        self.assertIsNotNone(BattleState.ai_pool)
+        self.state.search.thread.join()
+        self.state.update(self.state.enemy_delay)
+        self.assertNotEqual(self.state.battle.key(), key)
+
 
 if __name__ == '__main__':
     unittest.main()
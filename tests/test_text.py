@@ -0,0 +1,65 @@
+"""For tests related to 'text.py'."""
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.screen as sc
+from modules.level import Node, NodeGroup
+from modules.text import TextStore
+
+RAW = '{ "spawn" : "Click the circles.",\n "road":"A \\"road\\", {}",\n' \
+      ' "castle": "The castle is empty." }'
+
+
+class TestTextStore(unittest.TestCase):
+    """Tests for 'TextStore'."""
+
+    def setUp(self):
+        """Open the display and create a store."""
+        sc.init()
+        self.store = TextStore(RAW)
+
+    def test_index(self):
+        """Assert entries are decoded without making texts."""
+        self.assertEqual(sorted(self.store.entries),
+                         ['castle', 'road', 'spawn'])
+        self.assertEqual(self.store.entry('road'), 'A "road", {}')
+        self.assertDictEqual(self.store.texts, {})
+        self.assertRaises(ValueError, TextStore, '["spawn"]')
+        self.assertRaises(ValueError, TextStore, '{"spawn" "text"}')
+
+    def test_file(self):
+        """Assert the text file is loaded."""
+        self.assertIn('spawn', TextStore.load())
+
+    def test_lazy(self):
+        """Assert texts are made when a node is first shown and evicted."""
+        nodes = NodeGroup([Node(10, (0, 0), 'spawn', 1, {}, store=self.store),
+                           Node(10, (0, 0), 'road', 2, {}, store=self.store),
+                           Node(10, (0, 0), 'tree', 3, {}, store=self.store)],
+                          self.store)
+        spawn, road, tree = nodes
+        self.assertTrue(spawn.has_text())
+        self.assertFalse(tree.has_text())
+        self.assertIsNone(spawn.text)
+        spawn.update_text()
+        self.assertTrue(spawn.text.active)
+        road.restore_text(0)
+        self.assertListEqual(list(self.store.texts), ['spawn'])
+        spawn.active = False
+        self.store.evict(nodes.text_names())
+        self.assertDictEqual(self.store.texts, {})
+        spawn.active = '1'
+        spawn.restore_text(1)
+        self.assertEqual(spawn.text.progress, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
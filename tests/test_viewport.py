@@ -0,0 +1,74 @@
+"""For tests related to 'viewport.py'."""
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+import modules.fog as fog
+import modules.level as level
+import modules.screen as sc
+from modules.viewport import Viewport
+
+
+class TestViewport(unittest.TestCase):
+    """Tests for 'Viewport'."""
+
+    def setUp(self):
+        """Create a viewport of 10x100 pixels."""
+        self.viewport = Viewport((10, 100), pg.Surface((1, 1), 0, 32))
+
+    def test_move(self):
+        """Assert only the rows that came into view are returned."""
+        self.assertEqual(self.viewport.move(50), [pg.Rect(0, 50, 10, 100)])
+        self.assertEqual(self.viewport.move(50), [])
+        self.assertEqual(self.viewport.move(70), [pg.Rect(0, 150, 10, 20)])
+        self.assertEqual(self.viewport.move(60), [pg.Rect(0, 60, 10, 10)])
+        self.assertEqual(self.viewport.move(300), [pg.Rect(0, 300, 10, 100)])
+
+    def test_parts(self):
+        """Assert areas are split where the rows wrap around."""
+        self.viewport.move(150)
+        self.assertEqual(self.viewport.parts(pg.Rect(0, 190, 10, 30)),
+                         [(pg.Rect(0, 190, 10, 10), pg.Rect(0, 90, 10, 10)),
+                          (pg.Rect(0, 200, 10, 20), pg.Rect(0, 0, 10, 20))])
+        self.assertEqual(self.viewport.parts(pg.Rect(0, 100, 10, 60)),
+                         [(pg.Rect(0, 150, 10, 10), pg.Rect(0, 50, 10, 10))])
+        self.assertEqual(self.viewport.parts(pg.Rect(0, 0, 10, 60)), [])
+
+
+class TestLevelViewport(unittest.TestCase):
+    """Tests for drawing a shaded level through its viewport."""
+
+    def setUp(self):
+        """Create a level with fog and the same level lit in full."""
+        sc.init()
+        self.level = level.Level(os.path.join(path, 'levels', 'level_one.tmx'))
+        self.level.fog = fog.Fog(self.level.level.width,
+                                 self.level.level.height)
+        self.level.fog.reveal((2, 2))
+        self.level.relight()
+        self.lit = self.level.bg.copy()
+        self.level.shade(self.lit, self.lit.get_rect())
+
+    def test_scroll(self):
+        """Assert the level matches the lit level after scrolling."""
+        width, height = self.level.bg.get_size()
+        surface = pg.Surface(
+            (width, min(height, sc.screen.get_height())), 0, sc.screen)
+        max_scroll = height - surface.get_height()
+        for scroll in (0, 7, 30, 29, max_scroll, 3, max_scroll // 2):
+            area = surface.get_rect(top=scroll)
+            self.level.blit_area(surface, area, scroll)
+            self.assertEqual(pg.image.tobytes(surface, 'RGB'),
+                             pg.image.tobytes(self.lit.subsurface(area), 'RGB'))
+        self.assertEqual(self.level.viewport.top, max_scroll // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""For tests related to 'world.py'."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+pg.init()
+
+path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(path))
+from modules.path import IMAGE_PATH, LEVEL_PATH
+from modules import scheduler
+from modules import screen as sc
+from modules.world import World
+
+
+class TestWorld(unittest.TestCase):
+    """Tests for 'World'."""
+
+    def setUp(self):
+        """Write two copies of the first level to a temporary folder."""
+        sc.init()
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(LEVEL_PATH, 'level_one.tmx')) as tmx:
+            data = tmx.read().replace('../images/', IMAGE_PATH + '/')
+        self.names = []
+        for name in ('a.tmx', 'b.tmx'):
+            self.names.append(os.path.join(self.folder, name))
+            with open(self.names[-1], 'w') as tmx:
+                tmx.write(data)
+        self.world = World()
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        shutil.rmtree(self.folder)
+
+    def test_preload(self):
+        """Assert a preloaded level is added by 'update' and reused."""
+        self.world.preload(self.names[0])
+        self.world.builders[self.names[0]].preloader.finish()
+        self.world.update()
+        self.assertFalse(self.world.ready(self.names[0]))
+        # The surfaces are built by jobs on the main thread.
+        scheduler.jobs.run_all()
+        self.world.update()
+        self.assertTrue(self.world.ready(self.names[0]))
+        level = self.world.levels[self.names[0]]
+        self.assertIsNotNone(level.bg)
+        self.assertIs(self.world.get(self.names[0]), level)
+
+    def test_get(self):
+        """Assert levels that weren't preloaded are loaded by 'get'."""
+        level = self.world.get(self.names[1])
+        self.assertIsNotNone(level.bg)
+        self.assertIn(self.names[1], self.world.keep)
+
+    def test_trim(self):
+        """Assert the least recently used level is unloaded first."""
+        self.world.budget = 1
+        self.world.keep = set(self.names)
+        for name in self.names:
+            self.world.get(name)
+        self.world.keep = {self.names[1]}
+        self.world.trim()
+        self.assertListEqual(list(self.world.levels), [self.names[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()